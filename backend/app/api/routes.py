@@ -1,10 +1,31 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Request, Header
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Request, Header
+from fastapi.responses import StreamingResponse
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from app.models.api_models import IngestRequest, IngestResponse, ResearchRequest, ResearchResponse, IngestTextRequest
-from app.services.researcher import load_data, split_text, index_documents, run_research, index_text, clear_database
-import shutil
+from app.models.api_models import IngestRequest, IngestResponse, ResearchRequest, ResearchResponse, IngestTextRequest, IngestMode, BulkIngestRequest, BulkIngestResponse, JobSubmitResponse, JobStatusResponse, CollectionsResponse, BatchResearchRequest
+from app.services.researcher import load_data, split_text, index_documents, arun_research, astream_research, abatch_research, index_text, clear_database, list_collections, research_engine, BATCH_RESEARCH_CONCURRENCY
+from app.services.collection_names import validate_collection
+from app.services.embeddings import embedding_registry
+from app.services.embedding_cache import embedding_cache
+from app.services.answer_cache import answer_cache
+from app.services.executor import blocking_executor, ExecutorSaturated
+from app.services.ingest_pipeline import ingest_pdf
+from app.services.bulk_ingest import bulk_ingest
+from app.services.fetcher import url_fetcher
+from app.services.metrics import stream_latency
+from app.services.tracing import current_request_id, trace_summary
+from app.services.hybrid_search import retrieval_latency
+from app.services.context_packing import packing_stats
+from app.services.chunking import chunking_stats
+from app.services.reranker import rerank_latency
+from app.services.jobs import job_queue, JOB_UPLOAD_DIR
+from app.services.store_maintenance import store_maintenance
+from app.services.startup import startup_profile
+from app.services.uploads import SavedUpload, UploadTooLarge, UPLOAD_DIR, save_upload, upload_registry
+from app.services.vector_storage import storage_stats
 import os
+import json
+import time
 import traceback
 import logging
 
@@ -17,6 +38,36 @@ limiter = Limiter(key_func=get_remote_address)
 
 router = APIRouter()
 
+# Queries accepted in one batch research request
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "500"))
+
+def _validated_source(body: IngestRequest) -> str:
+    """Checks the source of an ingest request"""
+    if not body.source or not body.source.strip():
+        raise HTTPException(status_code=400, detail="Source URL or file path is required")
+    
+    source = body.source.strip()
+    
+    # Validate URL or file format
+    if not (source.startswith("http://") or source.startswith("https://") or source.endswith(".pdf")):
+        raise HTTPException(
+            status_code=400,
+            detail="Source must be a valid HTTP(S) URL or PDF file path"
+        )
+    return source
+
+def _validated_collection(collection: str) -> str:
+    """Checks a collection name sent as a form field"""
+    try:
+        return validate_collection(collection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _clear_collection(collection: str):
+    """Empties one collection before a "replace" ingest"""
+    await blocking_executor.run(clear_database, collection)
+    url_fetcher.forget(namespace=collection)
+
 @router.post("/ingest", response_model=IngestResponse)
 @limiter.limit("10/minute")
 async def ingest_endpoint(request: Request, body: IngestRequest):
@@ -24,47 +75,53 @@ async def ingest_endpoint(request: Request, body: IngestRequest):
     try:
         # Local embeddings don't need API key for ingest
         
-        # Validate source
-        if not body.source or not body.source.strip():
-            raise HTTPException(status_code=400, detail="Source URL or file path is required")
-        
-        source = body.source.strip()
-        
-        # Validate URL or file format
-        if not (source.startswith("http://") or source.startswith("https://") or source.endswith(".pdf")):
-            raise HTTPException(
-                status_code=400,
-                detail="Source must be a valid HTTP(S) URL or PDF file path"
-            )
-        
-        logger.info(f"Ingesting from source: {source}")
-        
-        # 0. Clear previous data
-        clear_database()
-        
-        # 1. Load
-        docs = load_data(source)
-        if not docs:
-            raise HTTPException(
-                status_code=400,
-                detail="Could not load data from source. Please check the URL or file path."
-            )
-        
-        # 2. Split
-        chunks = split_text(docs)
-        
-        # 3. Index
-        index_documents(chunks)
+        source = _validated_source(body)
+        
+        logger.info(f"Ingesting from source: {source} into {body.collection}")
+        
+        # 0. Clear the collection (upserts keep every other source)
+        if body.mode == "replace":
+            await _clear_collection(body.collection)
+        
+        if source.endswith(".pdf") and not source.startswith("http"):
+            # PDFs stream page by page through parse -> split -> embed -> write
+            if not os.path.isfile(source):
+                raise HTTPException(
+                    status_code=400,
+                    detail="Could not load data from source. Please check the URL or file path."
+                )
+            stats = await blocking_executor.run(ingest_pdf, source, collection=body.collection)
+        else:
+            # 1. Load
+            docs = await blocking_executor.run(load_data, source)
+            if not docs:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Could not load data from source. Please check the URL or file path."
+                )
+            
+            # 2. Split
+            chunks = await blocking_executor.run(split_text, docs)
+            
+            # 3. Index
+            stats = await blocking_executor.run(index_documents, chunks, body.collection)
         
-        logger.info(f"Successfully ingested {len(chunks)} chunks from {source}")
+        logger.info(f"Successfully ingested {stats['chunks']} chunks from {source}: {stats}")
         
         return IngestResponse(
             status="success", 
             message=f"Successfully ingested {source}",
-            chunks_count=len(chunks)
+            chunks_count=stats["chunks"],
+            chunks_added=stats["added"],
+            chunks_skipped=stats["skipped"],
+            chunks_deleted=stats["deleted"],
+            chunking=stats.get("chunking")
         )
     except HTTPException:
         raise
+    except ExecutorSaturated as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail="Server is busy. Please retry shortly.")
     except Exception as e:
         logger.error(f"Error ingesting source: {str(e)}")
         traceback.print_exc()
@@ -90,20 +147,28 @@ async def ingest_text_endpoint(request: Request, body: IngestTextRequest):
                 detail="Text content too large. Maximum 100,000 characters allowed."
             )
         
-        logger.info(f"Ingesting raw text ({len(body.text)} characters)")
+        logger.info(f"Ingesting raw text ({len(body.text)} characters) into {body.collection}")
         
-        # 0. Clear previous data
-        clear_database()
+        # 0. Clear the collection (upserts keep every other source)
+        if body.mode == "replace":
+            await _clear_collection(body.collection)
         
-        index_text(body.text)
+        stats = await blocking_executor.run(index_text, body.text, body.source, body.collection)
         
         return IngestResponse(
             status="success",
             message="Successfully ingested raw text.",
-            chunks_count=1  # Approximate
+            chunks_count=stats["chunks"],
+            chunks_added=stats["added"],
+            chunks_skipped=stats["skipped"],
+            chunks_deleted=stats["deleted"],
+            chunking=stats.get("chunking")
         )
     except HTTPException:
         raise
+    except ExecutorSaturated as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail="Server is busy. Please retry shortly.")
     except Exception as e:
         logger.error(f"Error ingesting text: {str(e)}")
         traceback.print_exc()
@@ -112,68 +177,156 @@ async def ingest_text_endpoint(request: Request, body: IngestTextRequest):
             detail=f"Failed to ingest text: {str(e)}"
         )
 
-@router.post("/ingest/file", response_model=IngestResponse)
+BULK_MAX_SOURCES = int(os.getenv("BULK_MAX_SOURCES", "500"))
+
+def _validated_bulk_sources(body: BulkIngestRequest):
+    """Checks the sources of a bulk ingest request"""
+    urls = [u.strip() for u in body.urls if u and u.strip()]
+    pdf_paths = [p.strip() for p in body.pdf_paths if p and p.strip()]
+    texts = [t for t in body.texts if t and t.strip()]
+    
+    # Validate sources
+    total = len(urls) + len(pdf_paths) + len(texts)
+    if total == 0:
+        raise HTTPException(status_code=400, detail="At least one URL, PDF path or text is required")
+    if total > BULK_MAX_SOURCES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many sources. Maximum {BULK_MAX_SOURCES} per request."
+        )
+    bad_urls = [u for u in urls if not (u.startswith("http://") or u.startswith("https://"))]
+    if bad_urls:
+        raise HTTPException(status_code=400, detail=f"Not a valid HTTP(S) URL: {bad_urls[0]}")
+    bad_paths = [p for p in pdf_paths if not p.endswith(".pdf")]
+    if bad_paths:
+        raise HTTPException(status_code=400, detail=f"Not a valid PDF file path: {bad_paths[0]}")
+    if any(len(t) > 100000 for t in texts):
+        raise HTTPException(
+            status_code=400,
+            detail="Text content too large. Maximum 100,000 characters allowed."
+        )
+    return urls, pdf_paths, texts
+
+@router.post("/ingest/bulk", response_model=BulkIngestResponse)
 @limiter.limit("5/minute")
-async def ingest_file_endpoint(request: Request, file: UploadFile = File(...)):
-    """Upload and ingest a PDF file"""
-    temp_path = None
+async def ingest_bulk_endpoint(request: Request, body: BulkIngestRequest):
+    """Ingest many URLs, PDF paths and texts in one call"""
     try:
-        # Local embeddings don't need API key for ingest
-        
-        # Validate file
-        if not file.filename:
-            raise HTTPException(status_code=400, detail="No file provided")
-        
-        if not file.filename.endswith('.pdf'):
-            raise HTTPException(
-                status_code=400,
-                detail="Only PDF files are supported"
-            )
+        urls, pdf_paths, texts = _validated_bulk_sources(body)
         
-        # Check file size (10MB limit)
-        file.file.seek(0, 2)  # Seek to end
-        file_size = file.file.tell()
-        file.file.seek(0)  # Reset to beginning
+        logger.info(f"Bulk ingest into {body.collection}: {len(urls)} URLs, {len(pdf_paths)} PDFs, {len(texts)} texts")
         
-        if file_size > 10 * 1024 * 1024:  # 10MB
-            raise HTTPException(
-                status_code=400,
-                detail="File too large. Maximum size is 10MB."
-            )
+        # 0. Clear the collection (upserts keep every other source)
+        if body.mode == "replace":
+            await _clear_collection(body.collection)
         
-        logger.info(f"Uploading file: {file.filename} ({file_size} bytes)")
+        result = await bulk_ingest(urls, pdf_paths, texts, collection=body.collection)
         
-        # 0. Clear previous data
-        clear_database()
+        logger.info(f"Bulk ingest finished: {result['chunks']} chunks in {result['total_ms']}ms")
         
-        # Save temp file
-        temp_dir = "temp_uploads"
-        os.makedirs(temp_dir, exist_ok=True)
-        temp_path = os.path.join(temp_dir, file.filename)
+        return BulkIngestResponse(
+            status="success",
+            sources=result["sources"],
+            chunks_count=result["chunks"],
+            chunks_added=result["added"],
+            chunks_skipped=result["skipped"],
+            chunks_deleted=result["deleted"],
+            embed_ms=result["embed_ms"],
+            write_ms=result["write_ms"],
+            total_ms=result["total_ms"],
+            chunking=result["chunking"]
+        )
+    except HTTPException:
+        raise
+    except ExecutorSaturated as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail="Server is busy. Please retry shortly.")
+    except Exception as e:
+        logger.error(f"Error during bulk ingest: {str(e)}")
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to ingest sources: {str(e)}"
+        )
+
+def _validated_upload(file: UploadFile):
+    """Checks the name of an uploaded PDF; its size is checked while it is saved"""
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+    
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(
+            status_code=400,
+            detail="Only PDF files are supported"
+        )
+
+async def _save_upload(file: UploadFile, directory: str = UPLOAD_DIR) -> SavedUpload:
+    """Streams an upload into a uniquely named file, enforcing the size limit as it goes"""
+    try:
+        return await blocking_executor.run(save_upload, file.file, directory)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/ingest/file", response_model=IngestResponse)
+@limiter.limit("5/minute")
+async def ingest_file_endpoint(request: Request, file: UploadFile = File(...), mode: IngestMode = Form("upsert"),
+                               collection: str = Form("default")):
+    """Upload and ingest a PDF file"""
+    temp_path = None
+    try:
+        # Local embeddings don't need API key for ingest
         
-        with open(temp_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        _validated_upload(file)
+        collection = _validated_collection(collection)
+        
+        # 0. Clear the collection (upserts keep every other source)
+        if mode == "replace":
+            await _clear_collection(collection)
+        
+        # Save to a temp file of its own, so concurrent uploads of one name never collide
+        upload = await _save_upload(file)
+        temp_path = upload.path
+        logger.info(f"Uploaded file: {file.filename} ({upload.size} bytes, sha256 {upload.sha256[:12]}) into {collection}")
+        
+        # The same bytes are already indexed under this name: nothing to parse or embed
+        stats = await blocking_executor.run(upload_registry.lookup, collection, file.filename, upload.sha256)
+        if stats is not None:
+            logger.info(f"Upload {file.filename} is unchanged, kept its {stats['chunks']} chunks")
+            return IngestResponse(
+                status="success",
+                message=f"{file.filename} is already ingested",
+                chunks_count=stats["chunks"],
+                chunks_added=0,
+                chunks_skipped=stats["skipped"],
+                chunks_deleted=0
+            )
             
-        # Load and Index
-        docs = load_data(temp_path)
-        if not docs:
+        # Stream and Index. Chunks are keyed by the uploaded name, not the
+        # temp path, so a re-upload of the same file replaces its earlier chunks
+        stats = await blocking_executor.run(ingest_pdf, temp_path, file.filename, collection=collection)
+        if not stats["chunks"]:
             raise HTTPException(
                 status_code=400,
                 detail="Could not extract content from PDF"
             )
+        await blocking_executor.run(upload_registry.record, collection, file.filename, upload.sha256, stats["chunks"])
         
-        chunks = split_text(docs)
-        index_documents(chunks)
-        
-        logger.info(f"Successfully ingested {len(chunks)} chunks from {file.filename}")
+        logger.info(f"Successfully ingested {stats['chunks']} chunks from {file.filename}: {stats}")
         
         return IngestResponse(
             status="success",
             message=f"Successfully ingested {file.filename}",
-            chunks_count=len(chunks)
+            chunks_count=stats["chunks"],
+            chunks_added=stats["added"],
+            chunks_skipped=stats["skipped"],
+            chunks_deleted=stats["deleted"],
+            chunking=stats.get("chunking")
         )
     except HTTPException:
         raise
+    except ExecutorSaturated as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail="Server is busy. Please retry shortly.")
     except Exception as e:
         logger.error(f"Error ingesting file: {str(e)}")
         traceback.print_exc()
@@ -189,30 +342,79 @@ async def ingest_file_endpoint(request: Request, file: UploadFile = File(...)):
             except Exception as e:
                 logger.warning(f"Failed to cleanup temp file: {str(e)}")
 
+@router.post("/jobs/ingest", response_model=JobSubmitResponse, status_code=202)
+@limiter.limit("10/minute")
+async def ingest_job_endpoint(request: Request, body: IngestRequest):
+    """Queue ingestion of a URL or PDF file path; poll /jobs/{job_id} for progress"""
+    source = _validated_source(body)
+    payload = {"source": source, "mode": body.mode, "collection": body.collection}
+    job_id = await blocking_executor.run(job_queue.submit, "ingest_source", payload)
+    logger.info(f"Queued ingest job {job_id} for {source}")
+    return JobSubmitResponse(job_id=job_id, status="queued")
+
+@router.post("/jobs/ingest/file", response_model=JobSubmitResponse, status_code=202)
+@limiter.limit("5/minute")
+async def ingest_file_job_endpoint(request: Request, file: UploadFile = File(...), mode: IngestMode = Form("upsert"),
+                                   collection: str = Form("default")):
+    """Queue ingestion of an uploaded PDF file"""
+    _validated_upload(file)
+    collection = _validated_collection(collection)
+    
+    # Kept until the job finishes, so a restarted server can still resume it
+    upload = await _save_upload(file, JOB_UPLOAD_DIR)
+    payload = {"path": upload.path, "filename": file.filename, "content_hash": upload.sha256, "mode": mode,
+               "collection": collection}
+    job_id = await blocking_executor.run(job_queue.submit, "ingest_file", payload)
+    logger.info(f"Queued ingest job {job_id} for upload {file.filename}")
+    return JobSubmitResponse(job_id=job_id, status="queued")
+
+@router.post("/jobs/ingest/bulk", response_model=JobSubmitResponse, status_code=202)
+@limiter.limit("5/minute")
+async def ingest_bulk_job_endpoint(request: Request, body: BulkIngestRequest):
+    """Queue a bulk ingest of URLs, PDF paths and texts"""
+    urls, pdf_paths, texts = _validated_bulk_sources(body)
+    payload = {"urls": urls, "pdf_paths": pdf_paths, "texts": texts, "mode": body.mode, "collection": body.collection}
+    job_id = await blocking_executor.run(job_queue.submit, "ingest_bulk", payload)
+    logger.info(f"Queued bulk ingest job {job_id}: {len(urls) + len(pdf_paths) + len(texts)} sources")
+    return JobSubmitResponse(job_id=job_id, status="queued")
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def job_status_endpoint(job_id: str):
+    """Stage, progress, throughput and errors of an ingestion job"""
+    job = await blocking_executor.run(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatusResponse(**job)
+
+def _validated_query(body: ResearchRequest, x_groq_api_key: str) -> str:
+    """Checks the API key and query of a research request"""
+    if not x_groq_api_key:
+         raise HTTPException(status_code=401, detail="Missing x-groq-api-key header")
+
+    # Validate query
+    if not body.query or not body.query.strip():
+        raise HTTPException(status_code=400, detail="Query is required")
+    
+    query = body.query.strip()
+    
+    if len(query) > 1000:
+        raise HTTPException(
+            status_code=400,
+            detail="Query too long. Maximum 1000 characters allowed."
+        )
+    return query
+
 @router.post("/research", response_model=ResearchResponse)
 @limiter.limit("10/minute")
 async def research_endpoint(request: Request, body: ResearchRequest, x_groq_api_key: str = Header(None)):
     """Research a query using the agentic RAG workflow"""
     try:
-        if not x_groq_api_key:
-             raise HTTPException(status_code=401, detail="Missing x-groq-api-key header")
-
-        # Validate query
-        if not body.query or not body.query.strip():
-            raise HTTPException(status_code=400, detail="Query is required")
-        
-        query = body.query.strip()
-        
-        if len(query) > 1000:
-            raise HTTPException(
-                status_code=400,
-                detail="Query too long. Maximum 1000 characters allowed."
-            )
+        query = _validated_query(body, x_groq_api_key)
         
         logger.info(f"Research query: {query[:100]}...")
         
         # Run LangGraph workflow
-        result = run_research(query, x_groq_api_key)
+        result = await arun_research(query, x_groq_api_key, body.collection)
         answer_obj = result.get("answer")
         
         if not answer_obj:
@@ -221,15 +423,21 @@ async def research_endpoint(request: Request, body: ResearchRequest, x_groq_api_
                 detail="No answer found. Please ensure you have ingested relevant documents first."
             )
 
-        logger.info(f"Research completed with confidence: {answer_obj.confidence_score}")
+        logger.info(f"Research {current_request_id()} completed with confidence: {answer_obj.confidence_score}, "
+                    f"stages (ms): {trace_summary()}")
 
         return ResearchResponse(
             answer=answer_obj.answer,
             confidence_score=answer_obj.confidence_score,
-            source_chunk_ids=answer_obj.source_chunk_ids
+            source_chunk_ids=answer_obj.source_chunk_ids,
+            cached=result.get("cached"),
+            context=result.get("context_stats")
         )
     except HTTPException:
         raise
+    except ExecutorSaturated as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail="Server is busy. Please retry shortly.")
     except Exception as e:
         logger.error(f"Error during research: {str(e)}")
         traceback.print_exc()
@@ -237,3 +445,134 @@ async def research_endpoint(request: Request, body: ResearchRequest, x_groq_api_
             status_code=500,
             detail=f"Research failed: {str(e)}"
         )
+
+def _sse(event: dict) -> str:
+    payload = dict(event)
+    name = payload.pop("event")
+    return f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+
+@router.post("/research/stream")
+@limiter.limit("10/minute")
+async def research_stream_endpoint(request: Request, body: ResearchRequest, x_groq_api_key: str = Header(None)):
+    """Research a query, streaming progress as Server-Sent Events
+
+    Emits `retrieval` (chunk ids and search timings per attempt), `token` (answer text deltas),
+    `answer` (final confidence and sources) and `metrics` events.
+    """
+    query = _validated_query(body, x_groq_api_key)
+    started = time.perf_counter()
+    logger.info(f"Streaming research query: {query[:100]}...")
+
+    async def event_stream():
+        ttfb_ms = None
+        ttft_ms = None
+        try:
+            async for event in astream_research(query, x_groq_api_key, body.collection):
+                elapsed_ms = 1000 * (time.perf_counter() - started)
+                if ttfb_ms is None:
+                    ttfb_ms = elapsed_ms
+                    stream_latency.record("ttfb", ttfb_ms)
+                if ttft_ms is None and event["event"] == "token":
+                    ttft_ms = elapsed_ms
+                    stream_latency.record("ttft", ttft_ms)
+                yield _sse(event)
+        except ExecutorSaturated as e:
+            logger.warning(str(e))
+            yield _sse({"event": "error", "detail": "Server is busy. Please retry shortly."})
+        except Exception as e:
+            logger.error(f"Error during streaming research: {str(e)}")
+            traceback.print_exc()
+            yield _sse({"event": "error", "detail": f"Research failed: {str(e)}"})
+        total_ms = 1000 * (time.perf_counter() - started)
+        stream_latency.record("total", total_ms)
+        yield _sse({
+            "event": "metrics",
+            "ttfb_ms": round(ttfb_ms, 2) if ttfb_ms is not None else None,
+            "ttft_ms": round(ttft_ms, 2) if ttft_ms is not None else None,
+            "total_ms": round(total_ms, 2)
+        })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _validated_queries(body: BatchResearchRequest, x_groq_api_key: str) -> list:
+    """Checks the API key and every query of a batch research request"""
+    if not x_groq_api_key:
+        raise HTTPException(status_code=401, detail="Missing x-groq-api-key header")
+    if len(body.queries) > BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Too many queries. Maximum {BATCH_MAX_QUERIES} per batch.")
+    queries = [q.strip() if q else "" for q in body.queries]
+    for index, query in enumerate(queries):
+        if not query:
+            raise HTTPException(status_code=400, detail=f"Query {index} is empty")
+        if len(query) > 1000:
+            raise HTTPException(status_code=400, detail=f"Query {index} too long. Maximum 1000 characters allowed.")
+    return queries
+
+@router.post("/research/batch")
+@limiter.limit("5/minute")
+async def research_batch_endpoint(request: Request, body: BatchResearchRequest, x_groq_api_key: str = Header(None)):
+    """Research many queries against one collection, streaming results as Server-Sent Events
+
+    Emits one `result` event per query as soon as it is answered (in completion order,
+    with the query's `index` in the request), then a `summary` event.
+    """
+    queries = _validated_queries(body, x_groq_api_key)
+    concurrency = body.concurrency or BATCH_RESEARCH_CONCURRENCY
+    started = time.perf_counter()
+    logger.info(f"Batch research: {len(queries)} queries into {body.collection}, concurrency {concurrency}")
+
+    async def event_stream():
+        counts = {"answered": 0, "cached": 0, "failed": 0}
+        try:
+            async for event in abatch_research(queries, x_groq_api_key, body.collection, concurrency):
+                counts["failed" if event["error"] else "cached" if event["cached"] else "answered"] += 1
+                yield _sse(event)
+        except ExecutorSaturated as e:
+            logger.warning(str(e))
+            yield _sse({"event": "error", "detail": "Server is busy. Please retry shortly."})
+        except Exception as e:
+            logger.error(f"Error during batch research: {str(e)}")
+            traceback.print_exc()
+            yield _sse({"event": "error", "detail": f"Research failed: {str(e)}"})
+        total_ms = round(1000 * (time.perf_counter() - started), 2)
+        logger.info(f"Batch research finished in {total_ms}ms: {counts}")
+        yield _sse({"event": "summary", "queries": len(queries), **counts, "total_ms": total_ms})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/collections", response_model=CollectionsResponse)
+async def collections_endpoint():
+    """Collections stored in the database, with their chunk counts"""
+    return CollectionsResponse(collections=await blocking_executor.run(list_collections))
+
+@router.get("/storage")
+async def storage_endpoint():
+    """Disk footprint of every collection: bytes per chunk, fragments, versions and the last compaction"""
+    return await blocking_executor.run(storage_stats)
+
+@router.get("/stats")
+async def stats_endpoint():
+    """Runtime statistics for the shared model and storage layers"""
+    return {
+        "embeddings": embedding_registry.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "research_engine": research_engine.stats(),
+        "executor": blocking_executor.stats(),
+        "research_stream": stream_latency.summary(),
+        "retrieval": {**retrieval_latency.summary(), **rerank_latency.summary()},
+        "context_packing": packing_stats.summary(),
+        "chunking": chunking_stats.summary(),
+        "jobs": job_queue.counts(),
+        "store_maintenance": store_maintenance.stats(),
+        "uploads": upload_registry.stats(),
+        "startup": startup_profile.report()
+    }
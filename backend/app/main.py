@@ -1,20 +1,55 @@
 import os
+import time
+import logging
+from contextlib import asynccontextmanager
+from app.services.startup import startup_profile, start_warm_up
+_import_started = time.perf_counter()
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from app.api.routes import router
+from app.services.executor import blocking_executor
+from app.services.ingest_pipeline import shutdown_parse_pool
+from app.services.fetcher import url_fetcher
+from app.services.jobs import job_workers
+from app.services.store_maintenance import store_maintenance
+from app.services.metrics import prometheus
+from app.services.tracing import RequestIdMiddleware
+startup_profile.record("import_app", 1000 * (time.perf_counter() - _import_started))
+
+logger = logging.getLogger(__name__)
 
 # Rate limiter setup
 limiter = Limiter(key_func=get_remote_address)
 
+# Load the embedding model at startup instead of on the first request
+WARM_EMBEDDINGS = os.getenv("WARM_EMBEDDINGS", "true").lower() == "true"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Model, research table and graph load in the background; /ready reports when done
+    start_warm_up(WARM_EMBEDDINGS)
+    with startup_profile.phase("start_workers"):
+        # Also resumes jobs a previous process left unfinished
+        job_workers.start()
+        # Compacts written collections and expires their old versions
+        store_maintenance.start()
+    yield
+    store_maintenance.stop()
+    job_workers.stop()
+    await url_fetcher.aclose()
+    blocking_executor.shutdown()
+    shutdown_parse_pool()
+
 app = FastAPI(
     title="Reliable Researcher API",
     version="1.0.0",
-    description="Production-grade Agentic RAG application for reliable research"
+    description="Production-grade Agentic RAG application for reliable research",
+    lifespan=lifespan
 )
 
 # Add rate limiter to app state
@@ -34,8 +69,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Outermost, so every span of a request carries its id
+app.add_middleware(RequestIdMiddleware)
+
 # Include API routes
 app.include_router(router, prefix="/api")
 
@@ -50,6 +89,19 @@ async def health_check(request: Request):
         "environment": ENVIRONMENT
     }
 
+# Readiness probe: only route traffic here once the warm-up has finished
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe; 503 until the embedding model, research table and graph are warm"""
+    report = startup_profile.report()
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+# Prometheus scrape target
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Per-stage latency histograms and token, retry and chunk counters in the Prometheus text format"""
+    return PlainTextResponse(prometheus.render(), media_type="text/plain; version=0.0.4")
+
 # Serve static frontend files in production
 if ENVIRONMENT == "production" and os.path.exists("frontend/dist"):
     app.mount("/assets", StaticFiles(directory="frontend/dist/assets"), name="assets")
@@ -1,20 +1,105 @@
-from pydantic import BaseModel
+from typing import Annotated, List, Literal, Optional
+from pydantic import BaseModel, Field
+from app.services.collection_names import COLLECTION_NAME_PATTERN, DEFAULT_COLLECTION
+
+# "upsert" adds new chunks and replaces the chunks of a re-ingested source;
+# "replace" wipes the target collection first.
+IngestMode = Literal["upsert", "replace"]
+
+# Each collection is searched and cached independently of the others
+CollectionName = Annotated[str, Field(pattern=COLLECTION_NAME_PATTERN)]
 
 class IngestRequest(BaseModel):
     source: str
+    mode: IngestMode = "upsert"
+    collection: CollectionName = DEFAULT_COLLECTION
 
 class IngestTextRequest(BaseModel):
     text: str
+    source: Optional[str] = None
+    mode: IngestMode = "upsert"
+    collection: CollectionName = DEFAULT_COLLECTION
 
 class IngestResponse(BaseModel):
     status: str
     message: str
     chunks_count: int
+    chunks_added: int = 0
+    chunks_skipped: int = 0
+    chunks_deleted: int = 0
+    # Chunk count and length distribution of this ingest
+    chunking: Optional[dict] = None
+
+class BulkIngestRequest(BaseModel):
+    urls: List[str] = []
+    pdf_paths: List[str] = []
+    texts: List[str] = []
+    mode: IngestMode = "upsert"
+    collection: CollectionName = DEFAULT_COLLECTION
+
+class BulkSourceResult(BaseModel):
+    source: str
+    kind: str
+    status: str
+    chunks: int = 0
+    added: int = 0
+    skipped: int = 0
+    deleted: int = 0
+    fetch_ms: float = 0.0
+    parse_ms: float = 0.0
+    error: Optional[str] = None
+
+class BulkIngestResponse(BaseModel):
+    status: str
+    sources: List[BulkSourceResult]
+    chunks_count: int
+    chunks_added: int
+    chunks_skipped: int
+    chunks_deleted: int
+    embed_ms: float
+    write_ms: float
+    total_ms: float
+    chunking: Optional[dict] = None
 
 class ResearchRequest(BaseModel):
     query: str
+    collection: CollectionName = DEFAULT_COLLECTION
 
 class ResearchResponse(BaseModel):
     answer: str
     confidence_score: float
     source_chunk_ids: list[str]
+    # "exact" or "semantic" when served from the answer cache
+    cached: Optional[str] = None
+    # Context token counts before and after packing, for the last attempt
+    context: Optional[dict] = None
+
+class BatchResearchRequest(BaseModel):
+    queries: List[str] = Field(min_length=1)
+    collection: CollectionName = DEFAULT_COLLECTION
+    # Graph runs in flight at once; the server default when absent
+    concurrency: Optional[int] = Field(default=None, ge=1, le=32)
+
+class CollectionInfo(BaseModel):
+    name: str
+    rows: int
+
+class CollectionsResponse(BaseModel):
+    collections: List[CollectionInfo]
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+
+class JobStatusResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    stage: str
+    progress: dict
+    throughput: dict
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    attempts: int
+    created_at: float
+    updated_at: float
@@ -0,0 +1,224 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+from app.services.collection_names import DEFAULT_COLLECTION
+from app.services.embedding_cache import normalized_text_hash
+
+# --- Configuration ---
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join(os.getcwd(), "data/answer_cache.sqlite"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+# Collections whose query vectors are kept in memory for the similarity scan
+ANSWER_CACHE_MATRICES = int(os.getenv("ANSWER_CACHE_MATRICES", "64"))
+
+
+def normalized_query_hash(query: str) -> str:
+    return normalized_text_hash(query.lower())
+
+
+class AnswerCache:
+    """Research answers keyed by query, valid for one version of a collection.
+
+    A lookup tries the exact normalized query first, then the nearest cached
+    query embedding above `similarity` (cosine). Every ingest into a collection
+    bumps its corpus version, which drops the collection's earlier answers.
+    When the cache grows past `max_entries`, the least recently used tenth is
+    evicted.
+    """
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 similarity: float = ANSWER_CACHE_SIMILARITY):
+        self.path = path
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # Per collection: normalized query vectors of the current version
+        self._matrices: "OrderedDict[str, tuple]" = OrderedDict()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(answers)")]
+            if columns and "collection" not in columns:
+                # Written before collections existed; it is only a cache
+                conn.execute("DROP TABLE answers")
+                conn.execute("DROP TABLE IF EXISTS corpus")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS answers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    collection TEXT NOT NULL,
+                    corpus_version INTEGER NOT NULL,
+                    query_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    answer TEXT NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    last_used REAL NOT NULL,
+                    UNIQUE (collection, corpus_version, query_hash)
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_last_used ON answers (last_used)")
+            conn.execute("CREATE TABLE IF NOT EXISTS corpus (collection TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _version(self, conn: sqlite3.Connection, collection: str) -> int:
+        row = conn.execute("SELECT version FROM corpus WHERE collection = ?", (collection,)).fetchone()
+        return row[0] if row else 0
+
+    def corpus_version(self, collection: str = DEFAULT_COLLECTION) -> int:
+        # Read from disk every time: another process may have ingested
+        with self._lock:
+            return self._version(self._connect(), collection)
+
+    def bump_corpus_version(self, collection: str = DEFAULT_COLLECTION) -> int:
+        """Marks the collection as changed; its cached answers become stale."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO corpus (collection, version) VALUES (?, 1) "
+                "ON CONFLICT (collection) DO UPDATE SET version = version + 1",
+                (collection,),
+            )
+            version = self._version(conn, collection)
+            self.invalidations += conn.execute(
+                "DELETE FROM answers WHERE collection = ? AND corpus_version < ?", (collection, version)
+            ).rowcount
+            conn.commit()
+            return version
+
+    def _similarity_matrix(self, conn: sqlite3.Connection, collection: str, version: int):
+        # Rebuilt only when the collection's current entries changed
+        key = (version, *conn.execute(
+            "SELECT COUNT(*), COALESCE(MAX(id), 0) FROM answers WHERE collection = ? AND corpus_version = ?",
+            (collection, version),
+        ).fetchone())
+        cached = self._matrices.get(collection)
+        if cached is None or cached[0] != key:
+            rows = conn.execute(
+                "SELECT id, vector FROM answers WHERE collection = ? AND corpus_version = ?", (collection, version)
+            ).fetchall()
+            matrix = _normalized(np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])) if rows else None
+            cached = (key, [row[0] for row in rows], matrix)
+            self._matrices[collection] = cached
+        self._matrices.move_to_end(collection)
+        while len(self._matrices) > ANSWER_CACHE_MATRICES:
+            self._matrices.popitem(last=False)
+        return cached[1], cached[2]
+
+    def lookup(self, query: str, vector: Optional[List[float]], version: int,
+               collection: str = DEFAULT_COLLECTION) -> Optional[dict]:
+        """Returns the cached answer for `query` at the collection's `version`, or None.
+
+        The returned dict has "answer" (the stored payload), "match"
+        ("exact" or "semantic") and, for semantic matches, "similarity".
+        """
+        query_hash = normalized_query_hash(query)
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT id, answer, tokens FROM answers WHERE collection = ? AND corpus_version = ? AND query_hash = ?",
+                (collection, version, query_hash),
+            ).fetchone()
+            match, similarity = "exact", 1.0
+            if row is None and vector is not None and self.similarity < 1.0:
+                ids, matrix = self._similarity_matrix(conn, collection, version)
+                if matrix is not None:
+                    scores = matrix @ _normalized(np.asarray(vector, dtype=np.float32)[None, :])[0]
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity:
+                        row = conn.execute(
+                            "SELECT id, answer, tokens FROM answers WHERE id = ?", (ids[best],)
+                        ).fetchone()
+                        match, similarity = "semantic", float(scores[best])
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (time.time(), row[0]))
+            conn.commit()
+            if match == "exact":
+                self.exact_hits += 1
+            else:
+                self.semantic_hits += 1
+            self.saved_tokens += row[2]
+        return {"answer": json.loads(row[1]), "match": match, "similarity": round(similarity, 4)}
+
+    def store(self, query: str, vector: List[float], version: int, answer: dict, tokens: int = 0,
+              collection: str = DEFAULT_COLLECTION):
+        """Caches an answer computed against the collection's corpus `version`.
+
+        Answers for a version that has since been bumped are dropped.
+        """
+        with self._lock:
+            conn = self._connect()
+            if version != self._version(conn, collection):
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (collection, corpus_version, query_hash, vector, answer, tokens, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (collection, version, normalized_query_hash(query), np.asarray(vector, dtype=np.float32).tobytes(),
+                 json.dumps(answer), tokens, time.time()),
+            )
+            count = conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            if count > self.max_entries:
+                excess = count - int(self.max_entries * 0.9)
+                conn.execute(
+                    "DELETE FROM answers WHERE id IN (SELECT id FROM answers ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+            conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connect()
+            entries = conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "path": self.path,
+                "collections": conn.execute("SELECT COUNT(*) FROM corpus").fetchone()[0],
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "similarity_threshold": self.similarity,
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "saved_tokens": self.saved_tokens,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM answers")
+            self._conn.commit()
+            self._matrices.clear()
+            self.exact_hits = self.semantic_hits = self.misses = 0
+            self.saved_tokens = self.evictions = self.invalidations = 0
+
+
+def _normalized(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,290 @@
+"""Chunking engines: how documents are cut into the chunks that get embedded.
+
+CHUNKER selects one:
+
+- "recursive": LangChain's RecursiveCharacterTextSplitter with CHUNK_SIZE and
+  CHUNK_OVERLAP (the default, and what existing collections were built with)
+- "structured": one pass over each document that cuts at heading, paragraph
+  and sentence boundaries and never across a page. The length of every
+  sentence is measured in one bulk call and sentences are packed greedily
+  against their prefix sums. Chunks overlap by CHUNK_OVERLAP_SENTENCES whole
+  sentences (none by default), so a corpus yields fewer embeddings and no
+  text is stored twice.
+
+CHUNK_UNIT=tokens measures chunk sizes in tokens of the embedding model's
+tokenizer instead of characters, so every chunk fits the model's input window
+(256 word pieces for all-MiniLM-L6-v2) instead of being truncated. Switching
+engine changes chunk hashes, so the next ingest of a source re-embeds it. Run
+`python -m benchmarks.chunking` from the backend directory to compare chunk
+counts, split throughput and retrieval recall of the engines.
+"""
+import functools
+import os
+import re
+import threading
+from typing import Callable, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+
+# Default chunk size and recursive-engine overlap of each unit
+UNIT_DEFAULTS = {"chars": (1000, 200), "tokens": (256, 50)}
+
+# --- Configuration ---
+CHUNKER = os.getenv("CHUNKER", "recursive")
+CHUNK_UNIT = os.getenv("CHUNK_UNIT", "chars")  # or "tokens"
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", str(UNIT_DEFAULTS.get(CHUNK_UNIT, UNIT_DEFAULTS["chars"])[0])))
+# Recursive engine: overlap in CHUNK_UNIT
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", str(UNIT_DEFAULTS.get(CHUNK_UNIT, UNIT_DEFAULTS["chars"])[1])))
+# Structured engine: whole sentences repeated at the start of the next chunk
+CHUNK_OVERLAP_SENTENCES = int(os.getenv("CHUNK_OVERLAP_SENTENCES", "0"))
+
+DEFAULT_CHUNKER = "recursive"
+
+# Headings (markdown, numbered or all-caps lines without closing punctuation),
+# page breaks, paragraph breaks and sentence ends, in one alternation
+_BOUNDARY = re.compile(
+    r"(?P<heading>^[ \t]*(?:#{1,6}[ \t]+\S[^\n]*|(?:\d+(?:\.\d+)*\.?|[IVX]+\.)[ \t]+[A-Z][^\n]{0,80}"
+    r"|[A-Z][A-Z0-9 ,&'/()-]{3,80})(?<![.!?;:,])[ \t]*(?:\n|$))"
+    r"|(?P<page>\f)"
+    r"|(?P<paragraph>\n[ \t]*\n[^\S\f]*)"
+    r"|[.!?][\"')\]]*[^\S\f]+",
+    re.M,
+)
+_WORD = re.compile(r"\S+\s*")
+
+Lengths = Callable[[Sequence[str]], np.ndarray]
+
+
+def char_lengths(texts: Sequence[str]) -> np.ndarray:
+    return np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+
+
+class TokenLengths:
+    """Token counts of many texts in one call to a Hugging Face tokenizer."""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+
+    def __call__(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros(0, dtype=np.int64)
+        ids = self.tokenizer(list(texts), add_special_tokens=False, verbose=False)["input_ids"]
+        return np.fromiter(map(len, ids), dtype=np.int64, count=len(ids))
+
+
+def embedding_tokenizer():
+    """The tokenizer of the configured embedding model (loads the model if needed)."""
+    from app.services.embedding_backends import EMBEDDING_BACKEND, backend_key
+    from app.services.embeddings import embedding_registry
+    from app.services.researcher import EMBEDDING_MODEL
+    model = embedding_registry.get(backend_key(EMBEDDING_MODEL, EMBEDDING_BACKEND))
+    tokenizer = getattr(getattr(model, "client", None), "tokenizer", None)
+    if tokenizer is None:
+        raise ValueError("CHUNK_UNIT=tokens needs an embedding model with a Hugging Face tokenizer")
+    return tokenizer
+
+
+def pack(lengths: np.ndarray, size: int, overlap: int = 0) -> List[Tuple[int, int]]:
+    """Greedy [start, end) ranges of consecutive units whose lengths add up to at most `size`.
+
+    A unit longer than `size` gets a range of its own. Each range after the
+    first starts `overlap` units before the previous one ended.
+    """
+    ends = np.cumsum(lengths)
+    ranges = []
+    start, count = 0, len(lengths)
+    while start < count:
+        base = ends[start - 1] if start else 0
+        end = max(int(np.searchsorted(ends, base + size, side="right")), start + 1)
+        ranges.append((start, end))
+        if end >= count:
+            break
+        start = max(end - overlap, start + 1)
+    return ranges
+
+
+def chunk_summary(lengths: Sequence[int], chunker: str = CHUNKER) -> dict:
+    """Count and character-length distribution of one ingest's chunks."""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    if not len(lengths):
+        return {"chunker": chunker, "chunks": 0}
+    return {
+        "chunker": chunker,
+        "chunks": int(len(lengths)),
+        "chars_mean": round(float(lengths.mean()), 1),
+        "chars_p50": int(np.percentile(lengths, 50)),
+        "chars_p95": int(np.percentile(lengths, 95)),
+        "chars_max": int(lengths.max()),
+    }
+
+
+class RecursiveChunker:
+    """LangChain's recursive character splitter, measured in characters or tokens."""
+
+    name = "recursive"
+
+    def __init__(self, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP, length: Lengths = char_lengths):
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        self.size = size
+        self.overlap = overlap
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=size,
+            chunk_overlap=overlap,
+            add_start_index=True,
+            length_function=len if length is char_lengths else lambda text: int(length([text])[0]),
+        )
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        return self.splitter.split_documents(documents)
+
+
+class StructuredChunker:
+    """Single-pass chunker that cuts at page, heading and sentence boundaries."""
+
+    name = "structured"
+
+    def __init__(self, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP_SENTENCES, length: Lengths = char_lengths):
+        self.size = size
+        self.overlap = overlap
+        self.length = length
+
+    def units(self, text: str) -> Tuple[List[Tuple[int, int]], List[int]]:
+        """Sentence spans of `text`, and the section each one belongs to.
+
+        A heading opens a new section and a page break closes one, so no
+        chunk spans either.
+        """
+        spans: List[Tuple[int, int]] = []
+        sections: List[int] = []
+        section, pos = 0, 0
+        for match in _BOUNDARY.finditer(text):
+            kind = match.lastgroup
+            if kind == "heading":
+                if match.start() > pos:
+                    spans.append((pos, match.start()))
+                    sections.append(section)
+                section += 1
+                spans.append((match.start(), match.end()))
+            else:
+                spans.append((pos, match.end()))
+            sections.append(section)
+            pos = match.end()
+            if kind == "page":
+                section += 1
+        if pos < len(text):
+            spans.append((pos, len(text)))
+            sections.append(section)
+        return spans, sections
+
+    def _fit(self, text: str, spans: List[Tuple[int, int]], lengths: np.ndarray):
+        """Cuts spans longer than the chunk size at word boundaries."""
+        if not len(lengths) or lengths.max() <= self.size:
+            return spans, lengths
+        fitted, fitted_lengths = [], []
+        for (start, end), length in zip(spans, lengths):
+            if length <= self.size:
+                fitted.append((start, end))
+                fitted_lengths.append(length)
+                continue
+            words = [m.span() for m in _WORD.finditer(text, start, end)] or [(start, end)]
+            word_lengths = self.length([text[s:e] for s, e in words])
+            for first, last in pack(word_lengths, self.size):
+                fitted.append((words[first][0], words[last - 1][1]))
+                fitted_lengths.append(int(word_lengths[first:last].sum()))
+        return fitted, np.asarray(fitted_lengths, dtype=np.int64)
+
+    def split_text(self, text: str) -> List[Tuple[int, str]]:
+        """(start_index, chunk text) pairs of one document."""
+        spans, sections = self.units(text)
+        lengths = self.length([text[s:e] for s, e in spans])
+        chunks = []
+        bounds = np.flatnonzero(np.diff(sections)) + 1
+        for first, last in zip([0, *bounds], [*bounds, len(spans)]):
+            section, section_lengths = self._fit(text, spans[first:last], lengths[first:last])
+            for a, b in pack(section_lengths, self.size, self.overlap):
+                start, end = section[a][0], section[b - 1][1]
+                chunk = text[start:end]
+                stripped = chunk.strip()
+                if stripped:
+                    chunks.append((start + len(chunk) - len(chunk.lstrip()), stripped))
+        return chunks
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        return [
+            Document(page_content=chunk, metadata={**doc.metadata, "start_index": start})
+            for doc in documents
+            for start, chunk in self.split_text(doc.page_content)
+        ]
+
+
+CHUNKERS = {
+    "recursive": RecursiveChunker,
+    "structured": StructuredChunker,
+}
+
+
+def chunk_defaults(unit: str, size: Optional[int] = None) -> Tuple[int, int]:
+    """Chunk size and recursive-engine overlap in `unit`.
+
+    CHUNK_SIZE and CHUNK_OVERLAP are measured in CHUNK_UNIT; the other unit
+    starts from its own defaults. A different `size` scales the overlap with
+    it, so the overlap stays the same share of each chunk.
+    """
+    default_size, default_overlap = (CHUNK_SIZE, CHUNK_OVERLAP) if unit == CHUNK_UNIT else UNIT_DEFAULTS[unit]
+    size = size or default_size
+    return size, default_overlap * size // default_size
+
+
+def load_chunker(name: str = DEFAULT_CHUNKER, unit: str = "chars", size: Optional[int] = None,
+                 overlap: Optional[int] = None):
+    """A chunking engine measuring `size` and `overlap` in `unit` (defaults from chunk_defaults).
+
+    The structured engine's overlap counts whole sentences and defaults to
+    CHUNK_OVERLAP_SENTENCES.
+    """
+    if name not in CHUNKERS:
+        raise ValueError(f"Unknown chunker {name!r}; expected one of {', '.join(CHUNKERS)}")
+    if unit not in UNIT_DEFAULTS:
+        raise ValueError(f"Unknown chunk unit {unit!r}; expected chars or tokens")
+    size, unit_overlap = chunk_defaults(unit, size)
+    if overlap is None:
+        overlap = CHUNK_OVERLAP_SENTENCES if CHUNKERS[name] is StructuredChunker else unit_overlap
+    length = TokenLengths(embedding_tokenizer()) if unit == "tokens" else char_lengths
+    return CHUNKERS[name](size=size, overlap=overlap, length=length)
+
+
+@functools.lru_cache(maxsize=None)
+def default_chunker():
+    """The engine configured by CHUNKER and CHUNK_UNIT, built once."""
+    return load_chunker(CHUNKER, CHUNK_UNIT)
+
+
+class ChunkingStats:
+    """Documents and chunks produced per engine since start-up."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines = {}
+
+    def record(self, engine: str, documents: int, chunks: int, chars: int, seconds: float):
+        with self._lock:
+            totals = self._engines.setdefault(engine, {"documents": 0, "chunks": 0, "chars": 0, "seconds": 0.0})
+            totals["documents"] += documents
+            totals["chunks"] += chunks
+            totals["chars"] += chars
+            totals["seconds"] += seconds
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                engine: {
+                    "documents": t["documents"],
+                    "chunks": t["chunks"],
+                    "avg_chunk_chars": round(t["chars"] / t["chunks"], 1) if t["chunks"] else 0.0,
+                    "split_ms": round(1000 * t["seconds"], 2),
+                }
+                for engine, t in self._engines.items()
+            }
+
+
+chunking_stats = ChunkingStats()
@@ -0,0 +1,34 @@
+import re
+from typing import Optional
+
+# Collections are separate LanceDB tables under DB_URI. The default collection
+# keeps the original table name, so existing databases need no migration.
+DEFAULT_COLLECTION = "default"
+DEFAULT_TABLE = "research_docs"
+COLLECTION_NAME_PATTERN = r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$"
+_TABLE_PREFIX = "research_docs__"
+
+
+def validate_collection(name: str) -> str:
+    # fullmatch: with re.match, "$" would also accept a trailing newline
+    if not re.fullmatch(COLLECTION_NAME_PATTERN, name or ""):
+        raise ValueError(
+            f"Invalid collection name {name!r}: use up to 64 letters, digits, '-' or '_'"
+        )
+    return name
+
+
+def collection_table(name: str) -> str:
+    """LanceDB table name of a collection."""
+    if name == DEFAULT_COLLECTION:
+        return DEFAULT_TABLE
+    return _TABLE_PREFIX + validate_collection(name)
+
+
+def table_collection(table_name: str) -> Optional[str]:
+    """Collection name of a LanceDB table, or None if it is not a collection."""
+    if table_name == DEFAULT_TABLE:
+        return DEFAULT_COLLECTION
+    if table_name.startswith(_TABLE_PREFIX):
+        return table_name[len(_TABLE_PREFIX):]
+    return None
@@ -0,0 +1,161 @@
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import List, Set, Tuple
+from langchain_core.documents import Document
+
+# --- Configuration ---
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# Rough English average; Groq does not expose the Llama tokenizer locally
+CONTEXT_CHARS_PER_TOKEN = float(os.getenv("CONTEXT_CHARS_PER_TOKEN", "4"))
+# A passage whose word 3-grams are mostly in a kept passage is dropped
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.9"))
+
+SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / CONTEXT_CHARS_PER_TOKEN + 0.5)
+
+
+@dataclass
+class Passage:
+    text: str
+    rank: int  # best retrieval rank among the chunks it was built from
+    source: str = ""
+    start: int = -1
+    chunk_ids: List[str] = field(default_factory=list)
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.text)
+
+
+def merge_adjacent(docs: List[Document]) -> List[Passage]:
+    """Merges chunks of the same source whose character ranges overlap.
+
+    The splitter's 200-character overlap is kept once instead of per chunk.
+    Chunks without a start_index are passed through unchanged.
+    """
+    merged: List[Passage] = []
+    by_source = {}
+    for rank, doc in enumerate(docs):
+        start = doc.metadata.get("start_index")
+        passage = Passage(doc.page_content, rank, doc.metadata.get("source", ""),
+                          start if isinstance(start, int) else -1, [doc.id] if doc.id else [])
+        if passage.start < 0:
+            merged.append(passage)
+        else:
+            by_source.setdefault(passage.source, []).append(passage)
+
+    for passages in by_source.values():
+        passages.sort(key=lambda p: p.start)
+        current = passages[0]
+        for passage in passages[1:]:
+            if passage.start < current.end:
+                overlap = current.end - passage.start
+                if passage.end > current.end:
+                    current.text += passage.text[overlap:]
+                current.rank = min(current.rank, passage.rank)
+                current.chunk_ids.extend(passage.chunk_ids)
+            else:
+                merged.append(current)
+                current = passage
+        merged.append(current)
+    merged.sort(key=lambda p: p.rank)
+    return merged
+
+
+def _shingles(text: str, n: int = 3) -> Set[Tuple[str, ...]]:
+    words = text.lower().split()
+    if len(words) < n:
+        return {tuple(words)}
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def deduplicate(passages: List[Passage], threshold: float = CONTEXT_DEDUP_THRESHOLD) -> List[Passage]:
+    """Drops passages that are near-copies of a better-ranked passage."""
+    kept: List[Passage] = []
+    kept_shingles: List[Set[Tuple[str, ...]]] = []
+    for passage in passages:
+        shingles = _shingles(passage.text)
+        duplicate = any(len(shingles & other) >= threshold * len(shingles) for other in kept_shingles)
+        if not duplicate:
+            kept.append(passage)
+            kept_shingles.append(shingles)
+    return kept
+
+
+def pack(passages: List[Passage], budget: int = CONTEXT_TOKEN_BUDGET) -> List[Passage]:
+    """Keeps the best-ranked passages that fit in `budget` tokens.
+
+    A passage that does not fit is skipped so that smaller, lower-ranked ones
+    can still use the remaining budget. If even the best passage is too large,
+    it is truncated rather than sending an empty context.
+    """
+    packed: List[Passage] = []
+    used = 0
+    separator_tokens = estimate_tokens(SEPARATOR)
+    for passage in passages:
+        cost = estimate_tokens(passage.text) + (separator_tokens if packed else 0)
+        if used + cost <= budget:
+            packed.append(passage)
+            used += cost
+    if not packed and passages:
+        best = passages[0]
+        packed.append(Passage(best.text[:int(budget * CONTEXT_CHARS_PER_TOKEN)], best.rank, best.source,
+                              best.start, best.chunk_ids))
+    return packed
+
+
+class PackingStats:
+    """Running totals of context tokens before and after packing."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def record(self, before: int, after: int):
+        with self._lock:
+            self.requests += 1
+            self.tokens_before += before
+            self.tokens_after += after
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "tokens_before": self.tokens_before,
+                "tokens_after": self.tokens_after,
+                "tokens_saved": self.tokens_before - self.tokens_after,
+                "avg_tokens_after": round(self.tokens_after / self.requests, 1) if self.requests else 0.0,
+            }
+
+
+packing_stats = PackingStats()
+
+
+def build_context(docs: List[Document], budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, dict]:
+    """Merges, deduplicates and packs retrieved chunks into the prompt context.
+
+    Returns the context text and its token counts before and after packing.
+    """
+    naive = SEPARATOR.join(d.page_content for d in docs)
+    merged = merge_adjacent(docs)
+    unique = deduplicate(merged)
+    packed = pack(unique, budget)
+    context = SEPARATOR.join(p.text for p in packed)
+    stats = {
+        "chunks": len(docs),
+        "passages": len(packed),
+        "merged": len(docs) - len(merged),
+        "deduplicated": len(merged) - len(unique),
+        "dropped": len(unique) - len(packed),
+        "tokens_before": estimate_tokens(naive),
+        "tokens_after": estimate_tokens(context),
+        "budget": budget,
+    }
+    packing_stats.record(stats["tokens_before"], stats["tokens_after"])
+    return context, stats
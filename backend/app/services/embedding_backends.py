@@ -0,0 +1,166 @@
+"""Embedding backends: the same sentence-transformers model on different CPU runtimes.
+
+EMBEDDING_BACKEND selects one:
+
+- "torch": full-precision PyTorch (the default)
+- "torch-int8": PyTorch with every Linear layer dynamically quantized to int8;
+  needs nothing beyond torch
+- "onnx": ONNX Runtime through sentence-transformers' ONNX backend; needs
+  `pip install "optimum[onnxruntime]"`. EMBEDDING_ONNX_FILE picks a file
+  shipped in the model repo, e.g. "onnx/model_qint8_avx512_vnni.onnx" for
+  its int8-quantized export.
+
+Every backend embeds in length-bucketed batches: texts are sorted by length
+and grouped so each batch pads to a similar length, with short texts (queries)
+packed into bigger batches than long chunks. All backends produce vectors in
+the same space, so switching does not force existing collections to be
+re-embedded. Run `python -m benchmarks.embeddings` from the backend directory
+to compare their throughput and retrieval quality.
+"""
+import importlib.util
+import os
+import warnings
+from typing import List, Sequence
+from langchain_core.embeddings import Embeddings
+
+# --- Configuration ---
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Most texts per forward pass
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# Most padded tokens per forward pass (texts in the batch x longest text)
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "8192"))
+# Intra-op threads of the runtime; 0 keeps the library default (all cores)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "")
+
+DEFAULT_BACKEND = "torch"
+
+
+def length_buckets(lengths: Sequence[int], batch_size: int, batch_tokens: int) -> List[List[int]]:
+    """Groups the indices of `lengths` into batches of texts of similar length.
+
+    Longest first. A batch is closed once it holds `batch_size` texts or one
+    more text would take it past `batch_tokens` padded tokens.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: -lengths[i])
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for index in order:
+        if current and (len(current) >= batch_size or (len(current) + 1) * lengths[current[0]] > batch_tokens):
+            batches.append(current)
+            current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """LangChain embeddings over a sentence-transformers model, batched by length."""
+
+    def __init__(self, client, backend: str = DEFAULT_BACKEND, batch_size: int = EMBEDDING_BATCH_SIZE,
+                 batch_tokens: int = EMBEDDING_BATCH_TOKENS):
+        self.client = client
+        self.backend = backend
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self.max_tokens = getattr(client, "max_seq_length", None) or 512
+
+    def _tokens(self, text: str) -> int:
+        # Roughly four characters per token; the model truncates beyond max_seq_length
+        return min(len(text) // 4 + 2, self.max_tokens)
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = [[] for _ in texts]
+        for batch in length_buckets([self._tokens(t) for t in texts], self.batch_size, self.batch_tokens):
+            encoded = self.client.encode([texts[i] for i in batch], batch_size=len(batch),
+                                         convert_to_numpy=True, normalize_embeddings=False)
+            for index, vector in zip(batch, encoded):
+                vectors[index] = vector.tolist()
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts))
+
+
+def quantize_int8(model):
+    """Dynamically quantizes the Linear layers of a torch model to int8.
+
+    Weights are stored as int8 and activations are quantized per batch, which
+    roughly halves CPU inference time of MiniLM-sized encoders.
+    """
+    import torch
+    with warnings.catch_warnings():
+        # Eager-mode quantization is deprecated in favour of torchao, but still the only dependency-free option
+        warnings.simplefilter("ignore")
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _set_torch_threads():
+    if EMBEDDING_THREADS:
+        import torch
+        torch.set_num_threads(EMBEDDING_THREADS)
+
+
+def _sentence_transformer(model_name: str, **kwargs):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device="cpu", **kwargs)
+
+
+def _load_torch(model_name: str):
+    _set_torch_threads()
+    return _sentence_transformer(model_name)
+
+
+def _load_torch_int8(model_name: str):
+    _set_torch_threads()
+    return quantize_int8(_sentence_transformer(model_name))
+
+
+def _load_onnx(model_name: str):
+    if importlib.util.find_spec("optimum") is None or importlib.util.find_spec("onnxruntime") is None:
+        raise ImportError('The onnx embedding backend needs ONNX Runtime: pip install "optimum[onnxruntime]"')
+    model_kwargs = {"provider": "CPUExecutionProvider"}
+    if EMBEDDING_ONNX_FILE:
+        model_kwargs["file_name"] = EMBEDDING_ONNX_FILE
+    if EMBEDDING_THREADS:
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = EMBEDDING_THREADS
+        model_kwargs["session_options"] = options
+    return _sentence_transformer(model_name, backend="onnx", model_kwargs=model_kwargs)
+
+
+BACKENDS = {
+    "torch": _load_torch,
+    "torch-int8": _load_torch_int8,
+    "onnx": _load_onnx,
+}
+
+
+def load_embeddings(model_name: str, backend: str = DEFAULT_BACKEND) -> SentenceTransformerEmbeddings:
+    """Loads `model_name` on `backend`."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    return SentenceTransformerEmbeddings(BACKENDS[backend](model_name), backend)
+
+
+def backend_key(model_name: str, backend: str = DEFAULT_BACKEND) -> str:
+    """Registry and embedding-cache key of a model on a backend.
+
+    The default backend keeps the bare model name, so vectors cached before
+    backends existed stay valid.
+    """
+    return model_name if backend == DEFAULT_BACKEND else f"{model_name}@{backend}"
+
+
+def load_backend_key(key: str) -> SentenceTransformerEmbeddings:
+    """Loads the model a `backend_key` names."""
+    model_name, _, backend = key.partition("@")
+    return load_embeddings(model_name, backend or DEFAULT_BACKEND)
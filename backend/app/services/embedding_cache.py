@@ -0,0 +1,183 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from app.services.embeddings import embed_queries
+
+# --- Configuration ---
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join(os.getcwd(), "data/embedding_cache.sqlite")
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+
+
+def normalized_text_hash(text: str) -> str:
+    """Hash of the text with whitespace collapsed, so reflowed copies share a key."""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """On-disk embedding cache keyed by (model name, normalized text hash).
+
+    Vectors are stored as float32 blobs in SQLite. When the cache grows past
+    `max_entries`, the least recently used tenth is evicted.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """Returns the cached vectors among `hashes` and marks them as used."""
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            conn = self._connect()
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(unique), 500):
+                batch = unique[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+                conn.commit()
+            self.hits += sum(1 for h in hashes if h in found)
+            self.misses += sum(1 for h in hashes if h not in found)
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]):
+        """Stores freshly computed vectors, evicting old entries if needed."""
+        if not vectors:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(model, h, np.asarray(v, dtype=np.float32).tobytes(), now) for h, v in vectors.items()],
+            )
+            count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                excess = count - int(self.max_entries * 0.9)
+                conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+            conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "size_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._connect().execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self.hits = self.misses = self.evictions = 0
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings that consult the cache before calling the model.
+
+    The model is resolved lazily, so a fully cached ingest never loads it.
+    """
+
+    def __init__(self, model_name: str, load_model: Callable[[], Embeddings], cache: EmbeddingCache):
+        self.model_name = model_name
+        self._load_model = load_model
+        self._cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [normalized_text_hash(t) for t in texts]
+        cached = self._cache.get_many(self.model_name, hashes)
+        missing: Dict[str, str] = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in cached:
+                missing.setdefault(text_hash, text)
+        if missing:
+            vectors = self._load_model().embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self._cache.put_many(self.model_name, computed)
+            cached.update(computed)
+        return [cached[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        # Some models embed queries differently from documents, keep them apart
+        model_key = f"{self.model_name}:query"
+        text_hash = normalized_text_hash(text)
+        cached = self._cache.get_many(model_key, [text_hash])
+        if text_hash in cached:
+            return cached[text_hash]
+        vector = self._load_model().embed_query(text)
+        self._cache.put_many(model_key, {text_hash: vector})
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Batched embed_query: one cache lookup and one model pass for the misses."""
+        model_key = f"{self.model_name}:query"
+        hashes = [normalized_text_hash(t) for t in texts]
+        cached = self._cache.get_many(model_key, hashes)
+        missing: Dict[str, str] = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in cached:
+                missing.setdefault(text_hash, text)
+        if missing:
+            computed = dict(zip(missing.keys(), embed_queries(self._load_model(), list(missing.values()))))
+            self._cache.put_many(model_key, computed)
+            cached.update(computed)
+        return [cached[h] for h in hashes]
+
+
+embedding_cache = EmbeddingCache()
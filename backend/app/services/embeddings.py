@@ -0,0 +1,116 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def _rss_bytes() -> int:
+    """Returns the current resident set size of this process (0 if unknown)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _parameter_bytes(embeddings: Embeddings) -> int:
+    """Best-effort size of the model weights behind an embeddings object."""
+    client = getattr(embeddings, "_client", None) or getattr(embeddings, "client", None)
+    if client is None or not hasattr(client, "parameters"):
+        return 0
+    try:
+        return sum(p.numel() * p.element_size() for p in client.parameters())
+    except Exception:
+        return 0
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """Embeds several queries, in one forward pass where the model allows it.
+
+    HuggingFace models without query-specific encode options embed queries
+    exactly like documents, so the whole list goes through one batch.
+    """
+    batched = getattr(embeddings, "embed_queries", None)
+    if batched is not None:
+        return batched(texts)
+    if hasattr(embeddings, "query_encode_kwargs") and not embeddings.query_encode_kwargs:
+        return embeddings.embed_documents(texts)
+    return [embeddings.embed_query(text) for text in texts]
+
+
+def _load_backend(key: str) -> Embeddings:
+    # key is a model name, or "model@backend" for a non-default runtime
+    from app.services.embedding_backends import load_backend_key
+    return load_backend_key(key)
+
+
+class EmbeddingRegistry:
+    """Loads each embedding model once per process and hands out the shared instance.
+
+    Ingestion and retrieval both resolve their embeddings through the registry, so
+    the sentence-transformers weights are read from disk a single time per worker.
+    """
+
+    def __init__(self, loader=_load_backend):
+        self._loader = loader
+        self._models: Dict[str, Embeddings] = {}
+        self._stats: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str) -> Embeddings:
+        """Returns the embeddings for `model_name`, loading them on first use."""
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                model = self._load(model_name)
+        return model
+
+    def _load(self, model_name: str) -> Embeddings:
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        model = self._loader(model_name)
+        load_seconds = time.perf_counter() - start
+        self._models[model_name] = model
+        self._stats[model_name] = {
+            "load_seconds": round(load_seconds, 3),
+            "rss_delta_bytes": max(_rss_bytes() - rss_before, 0),
+            "parameter_bytes": _parameter_bytes(model),
+            "loaded_at": time.time(),
+        }
+        logger.info(f"Loaded embedding model {model_name} in {load_seconds:.2f}s")
+        return model
+
+    def warm(self, model_names: Iterable[str]):
+        """Loads the given models up front, e.g. at application startup."""
+        for name in model_names:
+            self.get(name)
+
+    def is_loaded(self, model_name: str) -> bool:
+        return model_name in self._models
+
+    def stats(self) -> dict:
+        """Load time and memory footprint of every model loaded so far."""
+        return {
+            "models": {name: dict(stats) for name, stats in self._stats.items()},
+            "process_rss_bytes": _rss_bytes(),
+        }
+
+    def clear(self, model_name: Optional[str] = None):
+        """Drops one (or every) loaded model so the next `get` reloads it."""
+        with self._lock:
+            if model_name is None:
+                self._models.clear()
+                self._stats.clear()
+            else:
+                self._models.pop(model_name, None)
+                self._stats.pop(model_name, None)
+
+
+embedding_registry = EmbeddingRegistry()
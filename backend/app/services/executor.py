@@ -0,0 +1,92 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExecutorSaturated(RuntimeError):
+    """Raised when the blocking-work queue is full and a task is rejected."""
+
+
+class BlockingExecutor:
+    """Bounded thread pool for blocking work (embedding, PDF parsing, LanceDB I/O).
+
+    Async endpoints hand synchronous calls to `run`, which keeps the event loop
+    free while the work happens on a worker thread. At most `max_workers` tasks
+    run at once and at most `max_queue` more may wait; anything beyond that is
+    rejected with `ExecutorSaturated` instead of piling up.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 32):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="blocking")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._rejected = 0
+        self._busy_seconds = 0.0
+        self._wait_seconds = 0.0
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs `fn(*args, **kwargs)` on the pool and awaits its result."""
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._rejected += 1
+                raise ExecutorSaturated(
+                    f"Blocking executor saturated ({self._active} running, {self._queued} queued)"
+                )
+            self._queued += 1
+        submitted = time.perf_counter()
+        # Context variables (e.g. the request id) follow the work onto the worker
+        context = contextvars.copy_context()
+        future = self._pool.submit(context.run, self._track, fn, args, kwargs, submitted)
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def _on_done(self, future):
+        # A task cancelled before it started never reaches `_track`
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    def _track(self, fn, args, kwargs, submitted: float):
+        started = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._wait_seconds += started - submitted
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+                self._busy_seconds += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        """Queue depth and saturation of the pool."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": self._queued,
+                "saturation": round(self._active / self.max_workers, 3),
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(1000 * self._wait_seconds / self._completed, 2) if self._completed else 0.0,
+                "avg_run_ms": round(1000 * self._busy_seconds / self._completed, 2) if self._completed else 0.0,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+blocking_executor = BlockingExecutor(
+    max_workers=int(os.getenv("EXECUTOR_WORKERS", "4")),
+    max_queue=int(os.getenv("EXECUTOR_MAX_QUEUE", "32")),
+)
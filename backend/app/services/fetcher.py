@@ -0,0 +1,165 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import httpx
+
+# --- Configuration ---
+FETCH_TIMEOUT_SECONDS = float(os.getenv("FETCH_TIMEOUT_SECONDS", "20"))
+FETCH_MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "32"))
+FETCH_PER_HOST_LIMIT = int(os.getenv("FETCH_PER_HOST_LIMIT", "4"))
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_BYTES", str(20 * 1024 * 1024)))
+USER_AGENT = os.getenv("USER_AGENT", "ReliableResearcher/1.0")
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: str  # "fetched", "not_modified" or "failed"
+    content: bytes = b""
+    content_type: str = ""
+    elapsed_ms: float = 0.0
+    error: Optional[str] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+class UrlFetcher:
+    """Pooled async HTTP client for ingesting many URLs at once.
+
+    Connections are shared through one httpx.AsyncClient. Each host gets at most
+    `per_host` requests in flight. ETag / Last-Modified validators from earlier
+    fetches are sent back, so unchanged pages come back as 304 with no body.
+    Validators are stored per `namespace` (a collection), because a page that
+    is unchanged for one collection may not be stored in another. Bodies are
+    read as a stream and a fetch fails as soon as one grows past
+    FETCH_MAX_BYTES, so an oversized page is never held in memory.
+    """
+
+    def __init__(self, per_host: int = FETCH_PER_HOST_LIMIT, max_connections: int = FETCH_MAX_CONNECTIONS,
+                 timeout: float = FETCH_TIMEOUT_SECONDS, transport: Optional[httpx.AsyncBaseTransport] = None,
+                 max_validators: int = 10000, validators: Optional["OrderedDict[str, Dict[str, str]]"] = None):
+        self.per_host = per_host
+        self._client_kwargs = {
+            "timeout": httpx.Timeout(timeout),
+            "limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            "follow_redirects": True,
+            "headers": {"User-Agent": USER_AGENT},
+            "transport": transport,
+        }
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        # Passing another fetcher's validators shares them between event loops
+        self._validators: "OrderedDict[str, Dict[str, str]]" = validators if validators is not None else OrderedDict()
+        self._max_validators = max_validators
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Connections and semaphores are tied to the loop that created them
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._client = None
+            self._host_limits.clear()
+            self._loop = loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(**self._client_kwargs)
+        return self._client
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    @staticmethod
+    def _key(url: str, namespace: str) -> str:
+        return f"{namespace}\0{url}" if namespace else url
+
+    def _remember(self, key: str, response: httpx.Response):
+        validators = {}
+        if "etag" in response.headers:
+            validators["If-None-Match"] = response.headers["etag"]
+        if "last-modified" in response.headers:
+            validators["If-Modified-Since"] = response.headers["last-modified"]
+        if validators:
+            self._validators[key] = validators
+            self._validators.move_to_end(key)
+            while len(self._validators) > self._max_validators:
+                self._validators.popitem(last=False)
+
+    def spawn(self) -> "UrlFetcher":
+        """A fetcher with its own client for another event loop, sharing validators."""
+        fetcher = UrlFetcher(self.per_host, max_validators=self._max_validators, validators=self._validators)
+        fetcher._client_kwargs = dict(self._client_kwargs)
+        return fetcher
+
+    def forget(self, url: Optional[str] = None, namespace: str = ""):
+        """Drops stored validators, e.g. after the stored content was deleted.
+
+        Without a url, drops every validator of `namespace`.
+        """
+        if url is not None:
+            self._validators.pop(self._key(url, namespace), None)
+        elif not namespace:
+            self._validators.clear()
+        else:
+            prefix = f"{namespace}\0"
+            for key in [k for k in self._validators if k.startswith(prefix)]:
+                del self._validators[key]
+
+    async def fetch(self, url: str, conditional: bool = True, namespace: str = "") -> FetchResult:
+        started = time.perf_counter()
+        key = self._key(url, namespace)
+        headers = dict(self._validators.get(key, {})) if conditional else {}
+        try:
+            client = self._get_client()
+            async with self._host_limit(url):
+                async with client.stream("GET", url, headers=headers) as response:
+                    if response.status_code == 304:
+                        return FetchResult(url, "not_modified", elapsed_ms=_ms(started))
+                    response.raise_for_status()
+                    content = await _read_limited(response, FETCH_MAX_BYTES)
+                self._remember(key, response)
+                return FetchResult(
+                    url,
+                    "fetched",
+                    content=content,
+                    content_type=response.headers.get("content-type", ""),
+                    elapsed_ms=_ms(started),
+                    headers=dict(response.headers),
+                )
+        except Exception as e:
+            return FetchResult(url, "failed", elapsed_ms=_ms(started), error=f"{type(e).__name__}: {e}")
+
+    async def fetch_all(self, urls, conditional: bool = True, namespace: str = ""):
+        """Fetches every URL concurrently, within the per-host limits."""
+        return await asyncio.gather(*(self.fetch(url, conditional, namespace) for url in urls))
+
+    async def aclose(self):
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+        self._host_limits.clear()
+
+
+async def _read_limited(response: httpx.Response, max_bytes: int) -> bytes:
+    """The (decoded) body of a streamed response; raises ValueError once it passes `max_bytes`."""
+    declared = response.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > max_bytes:
+        raise ValueError(f"Response larger than {max_bytes} bytes")
+    body = bytearray()
+    async for piece in response.aiter_bytes():
+        body += piece
+        if len(body) > max_bytes:
+            raise ValueError(f"Response larger than {max_bytes} bytes")
+    return bytes(body)
+
+
+def _ms(started: float) -> float:
+    return round(1000 * (time.perf_counter() - started), 2)
+
+
+url_fetcher = UrlFetcher()
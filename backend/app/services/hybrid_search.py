@@ -0,0 +1,102 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import pyarrow as pa
+from app.services.metrics import LatencyRegistry
+from app.services.vector_index import FullVectors, search_text, search_vectors, search_vectors_batch
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Each leg returns this many times the requested k before fusion
+HYBRID_OVERSAMPLE = int(os.getenv("HYBRID_OVERSAMPLE", "2"))
+HYBRID_SEARCH_WORKERS = int(os.getenv("HYBRID_SEARCH_WORKERS", "8"))
+
+_FUSED_COLUMNS = ["id", "text", "metadata"]
+
+# Separate from the blocking pool: retrieval already runs on one of its threads
+_leg_pool = ThreadPoolExecutor(max_workers=HYBRID_SEARCH_WORKERS, thread_name_prefix="hybrid-search")
+
+# Per-query latency of each retrieval leg
+retrieval_latency = LatencyRegistry()
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Fuses ranked id lists: each id scores the sum of 1 / (k + rank) over the lists."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, 1000 * (time.perf_counter() - started)
+
+
+def hybrid_search(table, query: str, vector: List[float], k: int,
+                  where: Optional[str] = None, full_vectors: Optional[FullVectors] = None) -> Tuple[pa.Table, dict]:
+    """Runs the vector and BM25 searches concurrently and fuses them with RRF.
+
+    Returns the top `k` rows (id, text, metadata, _relevance_score) and the
+    latency of each leg. Falls back to the vector results alone if the
+    full-text leg fails.
+    """
+    depth = k * HYBRID_OVERSAMPLE
+    vector_future = _leg_pool.submit(_timed, search_vectors, table, vector, depth, None, None, where, full_vectors)
+    text_future = _leg_pool.submit(_timed, search_text, table, query, depth, where)
+    vector_rows, vector_ms = vector_future.result()
+    text_rows, text_ms = _text_leg(text_future)
+    return _fuse(vector_rows, vector_ms, text_rows, text_ms, k)
+
+
+def hybrid_search_batch(table, queries: List[str], vectors: List[List[float]], k: int, where: Optional[str] = None,
+                        full_vectors: Optional[FullVectors] = None) -> List[Tuple[pa.Table, dict]]:
+    """hybrid_search for many queries: one batched vector search, the BM25 legs concurrently.
+
+    Returns a (rows, timings) pair per query, in order. The vector latency
+    reported for each query is that of the shared batched search.
+    """
+    depth = k * HYBRID_OVERSAMPLE
+    text_futures = [_leg_pool.submit(_timed, search_text, table, query, depth, where) for query in queries]
+    vector_legs, vector_ms = _timed(search_vectors_batch, table, vectors, depth, where, full_vectors)
+    return [_fuse(vector_rows, vector_ms, *_text_leg(future), k)
+            for vector_rows, future in zip(vector_legs, text_futures)]
+
+
+def _text_leg(future):
+    try:
+        return future.result()
+    except Exception as e:
+        logger.warning(f"Full-text leg skipped: {e}")
+        return None, None
+
+
+def _fuse(vector_rows: pa.Table, vector_ms: float, text_rows: Optional[pa.Table], text_ms: Optional[float],
+          k: int) -> Tuple[pa.Table, dict]:
+    started = time.perf_counter()
+    legs = [rows.select(_FUSED_COLUMNS) for rows in (vector_rows, text_rows) if rows is not None]
+    candidates = pa.concat_tables(legs) if len(legs) > 1 else legs[0]
+    ids = candidates["id"].to_pylist()
+    first_row = {}
+    for row, row_id in enumerate(ids):
+        first_row.setdefault(row_id, row)
+    rankings = [rows["id"].to_pylist() for rows in (vector_rows, text_rows) if rows is not None]
+    fused = reciprocal_rank_fusion(rankings)[:k]
+    result = candidates.take(pa.array([first_row[row_id] for row_id, _ in fused], pa.int64()))
+    result = result.append_column("_relevance_score", pa.array([score for _, score in fused], pa.float64()))
+    fusion_ms = 1000 * (time.perf_counter() - started)
+
+    timings = {"vector_ms": round(vector_ms, 2), "fusion_ms": round(fusion_ms, 2),
+               "fts_ms": round(text_ms, 2) if text_ms is not None else None}
+    retrieval_latency.record("vector", vector_ms)
+    retrieval_latency.record("fusion", fusion_ms)
+    if text_ms is not None:
+        retrieval_latency.record("fts", text_ms)
+    return result, timings
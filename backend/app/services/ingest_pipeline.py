@@ -0,0 +1,364 @@
+"""Streaming PDF ingestion: page parsing -> splitting -> embedding -> LanceDB appends.
+
+Pages are parsed in a process pool a few at a time, chunks are embedded in
+micro-batches and staged batch by batch in a side table, which is published
+to the collection in one append once the document is complete. A stage
+outlives an interrupted ingest, so the next run embeds only what it lacks.
+Stages run in their own threads, joined by bounded queues, so a slow stage
+holds back the ones before it and memory stays flat regardless of document
+size. The PDF is read through a memory map, so the parse workers share the
+page cache instead of each loading the whole file.
+"""
+import hashlib
+import logging
+import mmap
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, List, Optional
+from langchain_core.documents import Document
+from app.services.chunking import chunk_summary
+from app.services.tracing import in_current_context, span
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "64"))
+PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "8"))
+QUEUE_DEPTH = int(os.getenv("INGEST_QUEUE_DEPTH", "4"))
+
+# Not a collection table name, so staged batches are never listed or searched
+_STAGING_PREFIX = "ingest_staging__"
+
+_DONE = object()
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # spawn: forking a process that already holds torch threads is unsafe
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _parse_pool
+
+
+def shutdown_parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=False, cancel_futures=True)
+            _parse_pool = None
+
+
+@contextmanager
+def open_pdf(path: str):
+    """A PdfReader over a read-only memory map of `path`.
+
+    Given a path, pypdf copies the whole file into memory first; over a map
+    it reads the parts it needs straight from the page cache.
+    """
+    from pypdf import PdfReader
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # An empty file cannot be mapped; pypdf raises its usual error for it
+            yield PdfReader(f)
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield PdfReader(mapped)
+
+
+def _extract_pages(path: str, start: int, end: int) -> List[str]:
+    """Extracts the text of pages [start, end). Runs in a worker process."""
+    with open_pdf(path) as reader:
+        return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def iter_pdf_pages(path: str, source: Optional[str] = None) -> Iterator[Document]:
+    """Yields one Document per page, in order, parsing ahead in the process pool.
+
+    At most PARSE_WORKERS * 2 page ranges are in flight at once.
+    """
+    source = source or path
+    with open_pdf(path) as reader:
+        num_pages = len(reader.pages)
+    ranges = [(i, min(i + PAGES_PER_TASK, num_pages)) for i in range(0, num_pages, PAGES_PER_TASK)]
+
+    if len(ranges) <= 1:
+        # Not worth a round-trip to the pool
+        batches = (_extract_pages(path, start, end) for start, end in ranges)
+    else:
+        batches = _parallel_batches(path, ranges)
+
+    page = 0
+    batches = iter(batches)
+    while True:
+        with span("load"):
+            texts = next(batches, None)
+        if texts is None:
+            break
+        for text in texts:
+            yield Document(page_content=text, metadata={"source": source, "page": page})
+            page += 1
+
+
+def split_pages(pages: Iterable[Document]) -> Iterator[Document]:
+    """Splits pages one at a time, with start_index relative to the whole document."""
+    from app.services import researcher
+    offset = 0
+    for page in pages:
+        for chunk in researcher.split_text([page]):
+            chunk.metadata["start_index"] = chunk.metadata.get("start_index", 0) + offset
+            yield chunk
+        offset += len(page.page_content)
+
+
+def _parallel_batches(path: str, ranges):
+    pool = _get_parse_pool()
+    pending = []
+    ranges = iter(ranges)
+    for start, end in ranges:
+        pending.append(pool.submit(_extract_pages, path, start, end))
+        if len(pending) >= PARSE_WORKERS * 2:
+            break
+    while pending:
+        texts = pending.pop(0).result()
+        next_range = next(ranges, None)
+        if next_range is not None:
+            pending.append(pool.submit(_extract_pages, path, *next_range))
+        yield texts
+
+
+def _put(q: queue.Queue, item, abort: threading.Event):
+    # Blocks while the queue is full (backpressure), but gives up if a stage failed
+    while not abort.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def _get(q: queue.Queue, abort: threading.Event):
+    while not abort.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def ingest_pdf(path: str, source: Optional[str] = None, batch_size: int = EMBED_BATCH_SIZE,
+               on_progress: Optional[Callable[[str, dict], None]] = None, collection: Optional[str] = None) -> dict:
+    """Streams a PDF into a collection's table with the same upsert rules as index_documents.
+
+    `on_progress(stage, stats)` is called after every staged batch and when
+    the final publish and clean-up stages start. The new chunks reach the
+    collection in a single table version, so readers never see part of a
+    document and cached answers are invalidated once per ingest rather than
+    once per batch. An interrupted ingest leaves the collection as it was
+    and keeps its staged batches, so running it again embeds only the
+    chunks that were not staged yet. Parsing and embedding hold a lock of
+    their own per source, so two ingests of one source never share a stage;
+    the collection's write lock is only taken to publish, and other writers
+    of the collection are not held up while a document streams in.
+    """
+    from app.services import researcher
+    from app.services.store_maintenance import write_lock
+
+    collection = collection or researcher.DEFAULT_COLLECTION
+    source = source or path
+    # "\0" never occurs in a collection name, so this lock is no collection's
+    with write_lock(researcher.DB_URI, f"{collection}\0{source}"):
+        return _stream_pdf(path, source, batch_size, on_progress, collection)
+
+
+def staging_table(collection: str, source: str) -> str:
+    """Name of the side table a streamed ingest of `source` stages its batches in."""
+    return _STAGING_PREFIX + hashlib.sha256(f"{collection}\0{source}".encode("utf-8")).hexdigest()[:32]
+
+
+def _open_staging(db, name: str):
+    """The stage left by an interrupted ingest, and the chunk hashes it holds (None and empty if there is none)."""
+    from app.services import researcher
+    if not os.path.isdir(os.path.join(researcher.DB_URI, f"{name}.lance")):
+        return None, set()
+    try:
+        staging = db.open_table(name)
+        staged = staging.search().select(["metadata"]).limit(None).to_arrow()["metadata"].to_pylist()
+    except Exception as e:
+        # Only copies of vectors being ingested live here, so an unreadable stage is started again
+        logger.warning(f"Discarding unreadable ingest stage {name}: {e}")
+        db.drop_table(name, ignore_missing=True)
+        return None, set()
+    if any(m["embedding_model"] != researcher.EMBEDDING_MODEL for m in staged):
+        # Staged under another embedding model; none of it can be published
+        db.drop_table(name, ignore_missing=True)
+        return None, set()
+    return staging, {m["chunk_hash"] for m in staged}
+
+
+def _staged_rows(staging, hashes: set, batch_size: int):
+    """Staged rows whose chunk hash is in `hashes`, as an Arrow batch reader."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    wanted = pa.array(sorted(hashes), pa.string())
+    reader = staging.search().limit(None).to_batches(batch_size)
+
+    def batches():
+        for batch in reader:
+            keep = pc.is_in(pc.struct_field(batch.column("metadata"), "chunk_hash"), value_set=wanted)
+            yield batch.filter(keep)
+    return pa.RecordBatchReader.from_batches(reader.schema, batches())
+
+
+def _current_hashes(table, source: str, stored: Optional[List[dict]] = None) -> set:
+    """Chunk hashes of `source` stored in `table` under the current embedding model."""
+    from app.services import researcher
+    if stored is None:
+        stored = researcher.stored_chunks(table, source) if table is not None else []
+    return {m["chunk_hash"] for m in stored if m["embedding_model"] == researcher.EMBEDDING_MODEL}
+
+
+def _stream_pdf(path: str, source: str, batch_size: int, on_progress, collection: str) -> dict:
+    from app.services import researcher
+    from app.services.store_maintenance import write_lock
+    from app.services.vector_index import ensure_indexes
+
+    started = time.perf_counter()
+    db = researcher.get_vector_store()
+    staging_name = staging_table(collection, source)
+    # Batches staged by an earlier, interrupted run of this ingest
+    staging, staged = _open_staging(db, staging_name)
+    # What is stored already is not embedded again; checked once more before publishing
+    with write_lock(researcher.DB_URI, collection):
+        current = _current_hashes(researcher.open_write_table(collection), source)
+    seen = set()
+    chunk_lengths: List[int] = []
+    stats = {"pages": 0, "chunks": 0, "added": 0, "skipped": 0, "deleted": 0, "batches": 0, "resumed": 0}
+
+    to_embed: queue.Queue = queue.Queue(maxsize=QUEUE_DEPTH)
+    to_write: queue.Queue = queue.Queue(maxsize=QUEUE_DEPTH)
+    abort = threading.Event()
+    errors: List[BaseException] = []
+
+    def counted(pages):
+        for page in pages:
+            stats["pages"] += 1
+            yield page
+
+    def parse_and_split():
+        try:
+            batch = []
+            for chunk in split_pages(counted(iter_pdf_pages(path, source))):
+                if abort.is_set():
+                    return
+                digest = researcher.prepare_chunk(chunk)
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                stats["chunks"] += 1
+                chunk_lengths.append(len(chunk.page_content))
+                if digest in current:
+                    stats["skipped"] += 1
+                    continue
+                if digest in staged:
+                    stats["resumed"] += 1
+                    continue
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    _put(to_embed, batch, abort)
+                    batch = []
+            if batch:
+                _put(to_embed, batch, abort)
+        except BaseException as e:
+            errors.append(e)
+            abort.set()
+        finally:
+            _put(to_embed, _DONE, abort)
+
+    def embed():
+        try:
+            embeddings = researcher._get_embeddings()
+            while (batch := _get(to_embed, abort)) is not _DONE:
+                with span("embed"):
+                    vectors = embeddings.embed_documents([c.page_content for c in batch])
+                _put(to_write, (batch, vectors), abort)
+        except BaseException as e:
+            errors.append(e)
+            abort.set()
+        finally:
+            _put(to_write, _DONE, abort)
+
+    # Each stage runs in the caller's context, so its spans carry the request id
+    stages = [
+        threading.Thread(target=in_current_context(parse_and_split), name="ingest-parse", daemon=True),
+        threading.Thread(target=in_current_context(embed), name="ingest-embed", daemon=True),
+    ]
+    for stage in stages:
+        stage.start()
+    try:
+        # Writes stay on the calling thread
+        while (item := _get(to_write, abort)) is not _DONE:
+            batch, vectors = item
+            rows = researcher.chunk_rows(batch, vectors)
+            with span("stage"):
+                if staging is None:
+                    staging = db.create_table(staging_name, data=rows)
+                else:
+                    staging.add(rows)
+            staged.update(c.metadata["chunk_hash"] for c in batch)
+            stats["added"] += len(batch)
+            stats["batches"] += 1
+            if on_progress:
+                on_progress("embedding", dict(stats))
+    except BaseException:
+        abort.set()
+        raise
+    finally:
+        for stage in stages:
+            stage.join()
+    if errors:
+        raise errors[0]
+
+    if on_progress:
+        on_progress("indexing", dict(stats))
+    with write_lock(researcher.DB_URI, collection):
+        # Other writers may have changed the source since it was read
+        table = researcher.open_write_table(collection)
+        stored = researcher.stored_chunks(table, source) if table is not None else []
+        current = _current_hashes(table, source, stored)
+        # Staged chunks the document still produces and the collection does not hold yet
+        publish = (seen & staged) - current
+        if publish:
+            # The whole document in one version, read back from the stage in batches
+            with span("write"):
+                table = researcher.write_rows(table, _staged_rows(staging, publish, batch_size), collection)
+        # Only a published stage is dropped; an interrupted one is resumed
+        if staging is not None:
+            db.drop_table(staging_name, ignore_missing=True)
+
+        stats["deleted"] = researcher.delete_stale_chunks(table, source, stored, seen, collection)
+        if publish or stats["deleted"]:
+            with span("index"):
+                ensure_indexes(table)
+    missing = seen - current - staged
+    if missing:
+        logger.warning(f"{len(missing)} chunks of {source} were deleted while it was ingested; ingest it again")
+    stats["added"], stats["skipped"] = len(publish), len(seen & current)
+    stats["chunking"] = chunk_summary(chunk_lengths)
+    researcher.record_ingest(stats)
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 3)
+    stats["pages_per_second"] = round(stats["pages"] / elapsed, 2) if elapsed else 0.0
+    stats["chunks_per_second"] = round(stats["chunks"] / elapsed, 2) if elapsed else 0.0
+    logger.info(f"Streamed {source}: {stats}")
+    return stats
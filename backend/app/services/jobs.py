@@ -0,0 +1,364 @@
+"""Background ingestion jobs backed by a persistent SQLite queue.
+
+Routes submit a job and return its id straight away; worker threads claim
+queued jobs and record their stage and progress as they go. Jobs that were
+running when the process stopped are put back in the queue at startup, and
+because ingestion skips chunks whose hash is already stored or staged, a
+resumed job picks up after the last batch it embedded. A job that has
+already been started JOB_MAX_ATTEMPTS times (e.g. one that keeps crashing
+the process) is marked failed instead.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+from app.services.tracing import request_context
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(os.getcwd(), "data/jobs.sqlite"))
+JOB_UPLOAD_DIR = os.getenv("JOB_UPLOAD_DIR", os.path.join(os.getcwd(), "data/job_uploads"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Starts (the first run plus resumes) before an interrupted job is given up
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+
+class JobQueue:
+    """Durable job records: submit, claim, progress, finish."""
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.available = threading.Event()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    progress TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            self._conn = conn
+        return self._conn
+
+    def submit(self, kind: str, payload: dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, stage, progress, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', 'queued', '{}', ?, ?)",
+                (job_id, kind, json.dumps(payload), now, now),
+            )
+            conn.commit()
+        self.available.set()
+        return job_id
+
+    def claim_next(self) -> Optional[dict]:
+        """Marks the oldest queued job as running and returns it."""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                self.available.clear()
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, "
+                "started_at = COALESCE(started_at, ?), updated_at = ? WHERE id = ?",
+                (now, now, row["id"]),
+            )
+            conn.commit()
+        return self.get(row["id"])
+
+    def update(self, job_id: str, stage: str, progress: dict):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE jobs SET stage = ?, progress = ?, updated_at = ? WHERE id = ?",
+                (stage, json.dumps(progress), time.time(), job_id),
+            )
+            conn.commit()
+
+    def finish(self, job_id: str, result: dict):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE jobs SET status = 'succeeded', stage = 'done', result = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(result), time.time(), job_id),
+            )
+            conn.commit()
+
+    def fail(self, job_id: str, error: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+                (error, time.time(), job_id),
+            )
+            conn.commit()
+
+    def fail_exhausted(self, max_attempts: int = JOB_MAX_ATTEMPTS) -> List[dict]:
+        """Marks jobs left running after `max_attempts` starts as failed and returns them."""
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'running' AND attempts >= ?", (max_attempts,)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+                [(f"Interrupted after {row['attempts']} attempts", time.time(), row["id"]) for row in rows],
+            )
+            conn.commit()
+        return [_row_to_job(row) for row in rows]
+
+    def requeue_interrupted(self) -> int:
+        """Puts jobs left running by a previous process back in the queue."""
+        with self._lock:
+            conn = self._connect()
+            count = conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'", (time.time(),)
+            ).rowcount
+            conn.commit()
+        if count:
+            self.available.set()
+        return count
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+
+def _row_to_job(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["progress"] = json.loads(job["progress"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    # Throughput since the job first started, across resumes
+    if job["started_at"]:
+        elapsed = max(job["updated_at"] - job["started_at"], 1e-6)
+        progress = job["progress"]
+        job["throughput"] = {
+            "pages_per_second": round(progress.get("pages", 0) / elapsed, 2),
+            "chunks_per_second": round(progress.get("added", 0) / elapsed, 2),
+        }
+    else:
+        job["throughput"] = {"pages_per_second": 0.0, "chunks_per_second": 0.0}
+    return job
+
+
+class JobWorkers:
+    """In-process worker threads that run queued jobs."""
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, Callable], workers: int = JOB_WORKERS,
+                 cleanups: Optional[Dict[str, Callable]] = None, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.max_attempts = max_attempts
+        # Per kind: releases what a job's payload holds (e.g. its upload) once the job is over for good
+        self.cleanups = cleanups if cleanups is not None else JOB_CLEANUPS
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+
+    def start(self):
+        if self._threads:
+            return
+        for job in self.queue.fail_exhausted(self.max_attempts):
+            logger.error(f"Job {job['id']} interrupted after {job['attempts']} attempts, giving up")
+            self._cleanup(job)
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            logger.info(f"Resuming {requeued} interrupted ingestion job(s)")
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stopping.set()
+        self.queue.available.set()
+        self._threads = []
+
+    def _run(self):
+        while not self._stopping.is_set():
+            job = self.queue.claim_next()
+            if job is None:
+                self.queue.available.wait(timeout=1.0)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job: dict):
+        job_id = job["id"]
+        handler = self.handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job kind: {job['kind']}")
+            report = lambda stage, progress: self.queue.update(job_id, stage, progress)
+            # The job's spans are traced under its id
+            with request_context(f"job-{job_id}"):
+                result = handler(job["payload"], job["progress"], report)
+            self.queue.finish(job_id, result or {})
+        except Exception as e:
+            if self._stopping.is_set():
+                # Interrupted by shutdown: left "running", with its inputs, so the next start resumes it
+                logger.warning(f"Job {job_id} interrupted by shutdown: {e}")
+                return
+            logger.error(f"Job {job_id} failed: {e}")
+            self.queue.fail(job_id, f"{type(e).__name__}: {e}")
+        self._cleanup(job)
+
+    def _cleanup(self, job: dict):
+        cleanup = self.cleanups.get(job["kind"])
+        if cleanup is None:
+            return
+        try:
+            cleanup(job["payload"])
+        except Exception as e:
+            logger.warning(f"Clean-up of job {job['id']} failed: {e}")
+
+
+# --- Handlers ---
+# Each handler gets the job payload, the progress saved by an earlier attempt
+# (empty on the first run) and a `report(stage, progress)` callback. Payloads
+# queued before collections existed have no "collection" and use the default.
+
+def _collection(payload: dict) -> str:
+    from app.services.collection_names import DEFAULT_COLLECTION
+    return payload.get("collection") or DEFAULT_COLLECTION
+
+def _clear_once(payload: dict, progress: dict, report) -> dict:
+    """Clears the job's collection for "replace" on the first attempt, never on a resume."""
+    from app.services.fetcher import url_fetcher
+    from app.services.researcher import clear_database
+    if payload.get("mode") == "replace" and not progress.get("cleared"):
+        report("clearing", progress)
+        clear_database(_collection(payload))
+        url_fetcher.forget(namespace=_collection(payload))
+        progress = {**progress, "cleared": True}
+        report("clearing", progress)
+    return progress
+
+
+def _ingest_pdf_job(path: str, source: str, collection: str, progress: dict, report) -> dict:
+    from app.services.ingest_pipeline import ingest_pdf
+    base = {"cleared": progress.get("cleared", False)}
+    report("parsing", {**progress, **base})
+    stats = ingest_pdf(path, source, on_progress=lambda stage, s: report(stage, {**base, **s}),
+                       collection=collection)
+    if not stats["chunks"]:
+        raise ValueError("Could not extract content from PDF")
+    return stats
+
+
+def run_ingest_source(payload: dict, progress: dict, report) -> dict:
+    from app.services.researcher import index_documents, load_data, split_text
+    progress = _clear_once(payload, progress, report)
+    source = payload["source"]
+    if source.endswith(".pdf") and not source.startswith("http"):
+        if not os.path.isfile(source):
+            raise FileNotFoundError(source)
+        return _ingest_pdf_job(source, source, _collection(payload), progress, report)
+
+    report("loading", progress)
+    docs = load_data(source)
+    if not docs:
+        raise ValueError("Could not load data from source")
+    progress = {**progress, "pages": len(docs)}
+    report("splitting", progress)
+    chunks = split_text(docs)
+    report("embedding", {**progress, "chunks": len(chunks)})
+    stats = index_documents(chunks, _collection(payload))
+    stats.pop("sources", None)
+    report("indexing", {**progress, **stats})
+    return stats
+
+
+def run_ingest_file(payload: dict, progress: dict, report) -> dict:
+    # The upload is kept until the job succeeds or fails (see remove_upload),
+    # so a job interrupted by shutdown can resume from it
+    from app.services.uploads import upload_registry
+    path, source, collection = payload["path"], payload["filename"], _collection(payload)
+    content_hash = payload.get("content_hash")
+    progress = _clear_once(payload, progress, report)
+    if content_hash:
+        # The same bytes are already indexed under this name: nothing to parse or embed
+        unchanged = upload_registry.lookup(collection, source, content_hash)
+        if unchanged is not None:
+            return unchanged
+    stats = _ingest_pdf_job(path, source, collection, progress, report)
+    if content_hash:
+        upload_registry.record(collection, source, content_hash, stats["chunks"])
+    return stats
+
+
+def remove_upload(payload: dict):
+    """Deletes a file job's upload once the job has finished or failed."""
+    if os.path.exists(payload["path"]):
+        os.remove(payload["path"])
+
+
+def run_ingest_bulk(payload: dict, progress: dict, report) -> dict:
+    import asyncio
+    from app.services.bulk_ingest import bulk_ingest
+    from app.services.fetcher import url_fetcher
+    progress = _clear_once(payload, progress, report)
+    report("fetching", progress)
+
+    async def run():
+        # Worker threads run their own event loop, so they need their own client
+        fetcher = url_fetcher.spawn()
+        try:
+            return await bulk_ingest(payload["urls"], payload["pdf_paths"], payload["texts"], fetcher=fetcher,
+                                     collection=_collection(payload))
+        finally:
+            await fetcher.aclose()
+
+    return asyncio.run(run())
+
+
+JOB_HANDLERS: Dict[str, Callable] = {
+    "ingest_source": run_ingest_source,
+    "ingest_file": run_ingest_file,
+    "ingest_bulk": run_ingest_bulk,
+}
+
+JOB_CLEANUPS: Dict[str, Callable] = {
+    "ingest_file": remove_upload,
+}
+
+job_queue = JobQueue()
+job_workers = JobWorkers(job_queue, JOB_HANDLERS)
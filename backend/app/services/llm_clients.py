@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List
+from app.services.tracing import span
+
+# --- Configuration ---
+LLM_POOL_MAX_CLIENTS = int(os.getenv("LLM_POOL_MAX_CLIENTS", "64"))
+# Tokens per minute each API key may spend (the provider's TPM limit); 0 means unlimited
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+
+
+def _key_hash(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class LLMClientPool:
+    """Chat clients per API key, reused across requests.
+
+    Each key's clients keep their HTTP connections alive between requests.
+    The least recently used key is dropped once `max_clients` keys are held.
+    Keys are stored hashed.
+    """
+
+    def __init__(self, factory: Callable[[str], Any], max_clients: int = LLM_POOL_MAX_CLIENTS):
+        self._factory = factory
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, api_key: str) -> Any:
+        key = _key_hash(api_key)
+        with self._lock:
+            if key in self._clients:
+                self._clients.move_to_end(key)
+                self.hits += 1
+                return self._clients[key]
+        # Built outside the lock; a concurrent first request may build twice
+        clients = self._factory(api_key)
+        with self._lock:
+            if key in self._clients:
+                self.hits += 1
+                return self._clients[key]
+            self.misses += 1
+            self._clients[key] = clients
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+            return clients
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "max_clients": self.max_clients,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+
+class TokenRateLimiter:
+    """Paces LLM calls so each API key stays under its tokens-per-minute limit.
+
+    A token bucket per key, refilled continuously and holding at most one
+    minute of tokens. A call reserves its estimated tokens up front and is
+    told how long to wait before sending; reservations queue in arrival
+    order, so a burst of calls on one key is spread out instead of running
+    into the provider's 429s. Keys are stored hashed.
+    """
+
+    def __init__(self, tokens_per_minute: int = LLM_TOKENS_PER_MINUTE):
+        self.tokens_per_minute = tokens_per_minute
+        # key -> [tokens available (negative once reserved ahead), last refill]
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self.reservations = 0
+        self.delayed = 0
+        self.wait_seconds = 0.0
+
+    def reserve(self, api_key: str, tokens: int) -> float:
+        """Reserves `tokens` for a call on `api_key`; returns the seconds to wait before sending it."""
+        if self.tokens_per_minute <= 0:
+            return 0.0
+        rate = self.tokens_per_minute / 60.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.setdefault(_key_hash(api_key), [float(self.tokens_per_minute), now])
+            bucket[0] = min(float(self.tokens_per_minute), bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            bucket[0] -= tokens
+            delay = -bucket[0] / rate if bucket[0] < 0 else 0.0
+            self.reservations += 1
+            if delay:
+                self.delayed += 1
+                self.wait_seconds += delay
+        return delay
+
+    async def acquire(self, api_key: str, tokens: int):
+        delay = self.reserve(api_key, tokens)
+        if delay:
+            with span("llm_wait"):
+                await asyncio.sleep(delay)
+
+    def acquire_sync(self, api_key: str, tokens: int):
+        delay = self.reserve(api_key, tokens)
+        if delay:
+            with span("llm_wait"):
+                time.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tokens_per_minute": self.tokens_per_minute,
+                "keys": len(self._buckets),
+                "reservations": self.reservations,
+                "delayed": self.delayed,
+                "wait_seconds": round(self.wait_seconds, 3),
+            }
@@ -0,0 +1,202 @@
+import bisect
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+
+class LatencyStats:
+    """Rolling window of latency samples with percentile summaries."""
+
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, value_ms: float):
+        with self._lock:
+            self._samples.append(value_ms)
+            self._count += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self._count
+        if not samples:
+            return {"count": count}
+
+        def percentile(p: float) -> float:
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 2)
+
+        return {
+            "count": count,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(samples[-1], 2),
+        }
+
+
+class LatencyRegistry:
+    """Named latency series, created on first use."""
+
+    def __init__(self):
+        self._series: Dict[str, LatencyStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, value_ms: float):
+        with self._lock:
+            series = self._series.setdefault(name, LatencyStats())
+        series.record(value_ms)
+
+    def summary(self) -> dict:
+        with self._lock:
+            series = dict(self._series)
+        return {name: stats.summary() for name, stats in series.items()}
+
+
+# Server-side latencies of /api/research/stream
+stream_latency = LatencyRegistry()
+
+
+# Prometheus default buckets, extended for slow LLM calls and large ingests
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CHUNK_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic counter, one series per combination of label values."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[n]) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(tuple(str(labels[n]) for n in self.labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_label_text(self.labels, key)} {_number(value)}" for key, value in values]
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per combination of label values."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = SECONDS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, sum, count)
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[n]) for n in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(tuple(str(labels[n]) for n in self.labels))
+            return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        lines = []
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_label_text(self.labels, key, le)} {count}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {count}")
+        return lines
+
+
+class PrometheusRegistry:
+    """Metrics exported in the Prometheus text format on /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = (),
+                  buckets: Iterable[float] = SECONDS_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+prometheus = PrometheusRegistry()
+
+stage_seconds = prometheus.histogram(
+    "researcher_stage_seconds", "Time spent in each ingest and research stage.", ["stage"])
+llm_tokens = prometheus.counter(
+    "researcher_llm_tokens_total", "LLM tokens sent (in) and generated (out).", ["direction"])
+research_requests = prometheus.counter(
+    "researcher_research_requests_total", "Research requests, by whether the graph ran.", ["result"])
+research_attempts = prometheus.histogram(
+    "researcher_research_attempts", "Generate attempts per research request that ran the graph.",
+    buckets=(1, 2, 3, 4, 5))
+research_retries = prometheus.counter(
+    "researcher_research_retries_total", "Generate attempts beyond the first.")
+ingest_chunks = prometheus.histogram(
+    "researcher_ingest_chunks", "Chunks produced per ingest call.", buckets=CHUNK_BUCKETS)
+ingest_chunks_total = prometheus.counter(
+    "researcher_ingest_chunks_total", "Ingested chunks, by what happened to them.", ["result"])
+rescore_candidates = prometheus.counter(
+    "researcher_rescore_candidates_total",
+    "Compact-table search candidates rescored, by the precision of the vector used.", ["vector"])
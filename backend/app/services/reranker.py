@@ -0,0 +1,49 @@
+import os
+import time
+from typing import List, Tuple
+from langchain_core.documents import Document
+from app.services.embeddings import EmbeddingRegistry
+from app.services.metrics import LatencyRegistry
+
+# --- Configuration ---
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Candidates fetched from LanceDB for the cross-encoder to reorder
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "24"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+# Scoring stops after the batch that crosses the budget
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "250"))
+
+
+def _load_cross_encoder(model_name: str):
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name, device="cpu")
+
+
+# Same load-once-per-process registry as the embedding models
+reranker_registry = EmbeddingRegistry(loader=_load_cross_encoder)
+
+rerank_latency = LatencyRegistry()
+
+
+def rerank(query: str, docs: List[Document], model=None, batch_size: int = RERANK_BATCH_SIZE,
+           budget_ms: float = RERANK_BUDGET_MS) -> Tuple[List[Document], dict]:
+    """Reorders `docs` by cross-encoder relevance to `query`.
+
+    Candidates are scored in batches, best retrieval rank first. Once the
+    budget is spent the remaining candidates keep their retrieval order after
+    the scored ones, so a slow CPU never stalls the request for long.
+    """
+    model = model or reranker_registry.get(RERANK_MODEL)
+    started = time.perf_counter()
+    scores: List[float] = []
+    for i in range(0, len(docs), batch_size):
+        if scores and 1000 * (time.perf_counter() - started) >= budget_ms:
+            break
+        pairs = [(query, d.page_content) for d in docs[i:i + batch_size]]
+        scores.extend(float(s) for s in model.predict(pairs, batch_size=batch_size, show_progress_bar=False))
+    order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+    reranked = [docs[i] for i in order] + docs[len(scores):]
+    elapsed_ms = 1000 * (time.perf_counter() - started)
+    rerank_latency.record("rerank", elapsed_ms)
+    return reranked, {"rerank_ms": round(elapsed_ms, 2), "reranked": len(scores), "rerank_candidates": len(docs)}
@@ -1,25 +1,62 @@
 import os
-import lancedb
-import shutil
-from typing import List, TypedDict, Optional
+import json
+import asyncio
+import logging
+import time
+import hashlib
+import functools
+import threading
+import contextvars
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, List, TypedDict, Optional
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
-from langchain_community.document_loaders import PyPDFLoader, WebBaseLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_groq import ChatGroq
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
-from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableLambda
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+from langchain_core.utils.json import parse_partial_json
+from app.services.embeddings import embed_queries, embedding_registry
+from app.services.embedding_backends import EMBEDDING_BACKEND, backend_key
+from app.services.embedding_cache import CachedEmbeddings, embedding_cache, EMBEDDING_CACHE_ENABLED
+from app.services.executor import blocking_executor
+from app.services.vector_index import ensure_indexes, is_compact, search_vectors, search_vectors_batch
+from app.services.vector_storage import (
+    COMPACT_STORAGE, compact_rows, delete_full_vectors, full_precision_vectors, store_full_vectors, with_storage,
+)
+from app.services.hybrid_search import hybrid_search, hybrid_search_batch, HYBRID_SEARCH_ENABLED
+from app.services.context_packing import build_context
+from app.services.chunking import chunk_summary, chunking_stats, default_chunker
+from app.services.reranker import rerank, reranker_registry, RERANK_ENABLED, RERANK_MODEL, RERANK_CANDIDATES
+from app.services.answer_cache import answer_cache, ANSWER_CACHE_ENABLED
+from app.services.llm_clients import LLMClientPool, TokenRateLimiter
+from app.services.collection_names import DEFAULT_COLLECTION, collection_table, table_collection
+from app.services.metrics import (
+    LatencyRegistry, ingest_chunks, ingest_chunks_total, research_attempts, research_requests, research_retries,
+)
+from app.services.tracing import llm_token_counter, span
+from app.services.store_maintenance import store_maintenance, write_lock
 
 # Load env variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # --- Configuration & Setup ---
 # We use an absolute path or relative to the running container/app for data
 DB_URI = os.path.join(os.getcwd(), "data/lancedb")
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 LLM_MODEL = "llama-3.3-70b-versatile"
+# How stale a warm read handle may be before it re-checks the table for new writes
+READ_CONSISTENCY_SECONDS = float(os.getenv("LANCE_READ_CONSISTENCY_SECONDS", "0"))
+# Warm read handles kept per collection; idle ones are closed after a while
+COLLECTION_CACHE_SIZE = int(os.getenv("COLLECTION_CACHE_SIZE", "256"))
+COLLECTION_IDLE_SECONDS = float(os.getenv("COLLECTION_IDLE_SECONDS", "600"))
+# Graph runs in flight at once for one batch research request
+BATCH_RESEARCH_CONCURRENCY = int(os.getenv("BATCH_RESEARCH_CONCURRENCY", "8"))
+# Tokens an LLM call spends beyond its packed context (prompt template and answer)
+LLM_TOKEN_OVERHEAD = int(os.getenv("LLM_TOKEN_OVERHEAD", "400"))
 
 class Answer(BaseModel):
     answer: str = Field(description="The answer to the user's question.")
@@ -32,109 +69,435 @@ class ResearchState(TypedDict):
     answer: Optional[Answer]
     try_count: int
     api_key: str
+    # Retrieval is done once per run and reused by every retry
+    query_vector: Optional[List[float]]
+    retrieval_cache: Dict[str, List[Document]]
+    previous_answer: Optional[str]
+    # Set by astream_research to stream answer tokens as they are generated
+    stream: bool
+    # Token counts of the last attempt's context, before and after packing
+    context_stats: Optional[dict]
+    # Collection to search; DEFAULT_COLLECTION when absent
+    collection: str
+
+# Each retry widens the context instead of replaying the same prompt against
+# a temperature=0 model: first the top hits, then more hits, then the hits
+# plus the chunks around them in their source document.
+RETRY_STRATEGIES = [
+    {"k": 4, "neighbours": False},
+    {"k": 8, "neighbours": False},
+    {"k": 8, "neighbours": True},
+]
+MAX_TRIES = len(RETRY_STRATEGIES)
+NEIGHBOUR_WINDOW = 1000  # characters either side of a hit's start_index
 
 # --- Ingestion ---
 def load_data(source: str) -> List[Document]:
     """Loads data from a URL or local PDF."""
     documents = []
-    if source.startswith("http"):
-        print(f"Loading URL: {source}")
-        loader = WebBaseLoader(source)
-        documents.extend(loader.load())
-    elif source.endswith(".pdf"):
-        print(f"Loading PDF: {source}")
-        loader = PyPDFLoader(source)
-        documents.extend(loader.load())
+    with span("load"):
+        if source.startswith("http"):
+            from langchain_community.document_loaders import WebBaseLoader
+            logger.info(f"Loading URL: {source}")
+            loader = WebBaseLoader(source)
+            documents.extend(loader.load())
+        elif source.endswith(".pdf"):
+            from langchain_community.document_loaders import PyPDFLoader
+            logger.info(f"Loading PDF: {source}")
+            loader = PyPDFLoader(source)
+            documents.extend(loader.load())
     return documents
 
-def split_text(documents: List[Document]) -> List[Document]:
-    """Splits documents into chunks."""
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        add_start_index=True
-    )
-    chunks = text_splitter.split_documents(documents)
+def split_text(documents: List[Document], chunker=None) -> List[Document]:
+    """Splits documents into chunks with the configured chunking engine."""
+    chunker = chunker or default_chunker()
+    started = time.perf_counter()
+    with span("split", chunker=chunker.name):
+        chunks = chunker.split_documents(documents)
+    chunking_stats.record(chunker.name, len(documents), len(chunks), sum(len(c.page_content) for c in chunks),
+                          time.perf_counter() - started)
     return chunks
 
-def index_text(text: str):
+def index_text(text: str, source: Optional[str] = None, collection: str = DEFAULT_COLLECTION):
     """Indexes raw text directly."""
-    docs = [Document(page_content=text, metadata={"source": "raw_text"})]
+    # Distinct texts are distinct sources unless the caller names one
+    source = source or f"raw_text:{chunk_hash(text)[:12]}"
+    docs = [Document(page_content=text, metadata={"source": source})]
     chunks = split_text(docs)
     # Embedding is local now, so no API key needed for indexing
-    return index_documents(chunks)
+    return index_documents(chunks, collection)
 
 # --- Vector Store (LanceDB) ---
-def clear_database():
-    """Clears the LanceDB data directory."""
-    if os.path.exists(DB_URI):
+def clear_database(collection: str = DEFAULT_COLLECTION):
+    """Empties one collection; other collections are untouched.
+
+    The rows are deleted in a new table version instead of removing the
+    files, so research runs still reading an earlier version are unaffected.
+    Background maintenance reclaims the space once no run can need it.
+    """
+    with write_lock(DB_URI, collection):
         try:
-            shutil.rmtree(DB_URI)
-            os.makedirs(DB_URI, exist_ok=True)
-            print("Database cleared successfully.")
+            table = open_write_table(collection)
+            if table is not None:
+                table.delete("true")
+                delete_full_vectors(collection, "true")
+                store_maintenance.mark(collection)
+            answer_cache.bump_corpus_version(collection)
+            logger.info(f"Collection {collection} cleared successfully.")
         except Exception as e:
-            print(f"Error clearing database: {e}")
+            logger.error(f"Error clearing collection {collection}: {e}")
+
+def list_collections() -> List[dict]:
+    """Names and row counts of the collections stored under DB_URI."""
+    collections = []
+    db = get_vector_store()
+    for entry in os.listdir(DB_URI):
+        name = table_collection(entry[:-len(".lance")]) if entry.endswith(".lance") else None
+        if name is None:
+            continue
+        try:
+            rows = db.open_table(collection_table(name)).count_rows()
+        except Exception:
+            continue
+        collections.append({"name": name, "rows": rows})
+    return sorted(collections, key=lambda c: c["name"])
 
 def get_vector_store():
     # Ensure directory exists
     os.makedirs(DB_URI, exist_ok=True)
+    import lancedb
     db = lancedb.connect(DB_URI)
     return db
 
 def _get_embeddings():
-    # Local embeddings - no API key required
-    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    # Local embeddings - no API key required. The registry loads the model
+    # once per process and shares it between ingestion and retrieval.
+    key = backend_key(EMBEDDING_MODEL, EMBEDDING_BACKEND)
+    if not EMBEDDING_CACHE_ENABLED:
+        return embedding_registry.get(key)
+    # Vectors already computed for the same text (on the same backend) are read from the on-disk cache
+    return CachedEmbeddings(key, lambda: embedding_registry.get(key), embedding_cache)
+
+def warm_up():
+    """Loads the embedding (and reranking) model ahead of the first request."""
+    embedding_registry.warm([backend_key(EMBEDDING_MODEL, EMBEDDING_BACKEND)])
+    if RERANK_ENABLED:
+        reranker_registry.warm([RERANK_MODEL])
 
-def index_documents(chunks: List[Document]):
-    """Indexes documents into LanceDB."""
+def chunk_hash(text: str) -> str:
+    """Content hash used to recognise chunks that are already stored."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _is_legacy_table(table) -> bool:
+    # Tables written before ingestion became incremental have no chunk hashes
+    return table.schema.field("metadata").type.get_field_index("chunk_hash") < 0
+
+def stored_chunks(table, source: str) -> List[dict]:
+    """Returns the metadata of every stored chunk of `source`."""
+    total = table.count_rows()
+    if not total:
+        return []
+    rows = (
+        table.search()
+        .where(f"metadata.source = {_lance_literal(source)}")
+        .select(["metadata"])
+        .limit(total)
+        .to_arrow()
+    )
+    return rows["metadata"].to_pylist()
+
+def prepare_chunk(chunk: Document) -> str:
+    """Reduces chunk metadata to the stored schema and returns the chunk hash."""
     # sanitize metadata to avoid schema conflicts (e.g. PDF author field)
+    digest = chunk_hash(chunk.page_content)
+    chunk.metadata = {
+        "source": chunk.metadata.get("source", "unknown"),
+        "start_index": chunk.metadata.get("start_index", -1),
+        "chunk_hash": digest,
+        "embedding_model": EMBEDDING_MODEL,
+    }
+    return digest
+
+def open_write_table(collection: str = DEFAULT_COLLECTION):
+    """Opens a collection's table for writing, or returns None if it does not exist.
+
+    A table that exists but cannot be opened raises; its files are left
+    alone so they can be inspected or restored.
+    """
+    db = get_vector_store()
+    table_name = collection_table(collection)
+    # table_names() pages its results, the directory listing does not
+    if not os.path.isdir(os.path.join(DB_URI, f"{table_name}.lance")):
+        return None
+    try:
+        table = db.open_table(table_name)
+    except Exception as e:
+        logger.error(f"Cannot open table {table_name} of collection {collection}: {e}")
+        raise
+    if _is_legacy_table(table):
+        logger.warning("Existing table has no chunk hashes, rebuilding it.")
+        db.drop_table(table_name)
+        return None
+    return table
+
+def delete_stale_chunks(table, source: str, stored: List[dict], keep, collection: str = DEFAULT_COLLECTION) -> int:
+    """Deletes the stored chunks of `source` that are not in `keep` or use another model."""
+    if table is None:
+        return 0
+    stale = [m for m in stored if m["embedding_model"] != EMBEDDING_MODEL or m["chunk_hash"] not in keep]
+    stale_hashes = sorted({m["chunk_hash"] for m in stale if m["embedding_model"] == EMBEDDING_MODEL})
+    source_clause = f"metadata.source = {_lance_literal(source)}"
+    if len(stale_hashes) < len(stale):
+        table.delete(f"{source_clause} AND metadata.embedding_model != {_lance_literal(EMBEDDING_MODEL)}")
+    for i in range(0, len(stale_hashes), 500):
+        hashes = ", ".join(_lance_literal(h) for h in stale_hashes[i:i + 500])
+        table.delete(f"{source_clause} AND metadata.chunk_hash IN ({hashes})")
+    # The float32 copies of a compact collection go with their chunks
+    stale_ids = sorted({(_chunk_id(source, m["chunk_hash"]), m["embedding_model"]) for m in stale})
+    for i in range(0, len(stale_ids), 500):
+        delete_full_vectors(collection, " OR ".join(
+            f"(id = {_lance_literal(chunk_id)} AND embedding_model = {_lance_literal(model)})"
+            for chunk_id, model in stale_ids[i:i + 500]))
+    if stale:
+        answer_cache.bump_corpus_version(collection)
+        store_maintenance.mark(collection)
+    return len(stale)
+
+def _chunk_id(source: str, digest: str) -> str:
+    return chunk_hash(f"{source}\0{digest}")[:32]
+
+def chunk_rows(chunks: List[Document], vectors: List[List[float]]) -> List[dict]:
+    """Table rows of prepared chunks and their vectors."""
+    return [
+        {
+            "vector": vector,
+            "id": _chunk_id(chunk.metadata["source"], chunk.metadata["chunk_hash"]),
+            "text": chunk.page_content,
+            "metadata": chunk.metadata,
+        }
+        for chunk, vector in zip(chunks, vectors)
+    ]
+
+def write_rows(table, rows, collection: str = DEFAULT_COLLECTION):
+    """Appends chunk rows (dicts, or an Arrow batch reader) in one table version; creates the table if needed.
+
+    New tables use compact storage when COMPACT_STORAGE is set; appends take
+    the storage of the table they go to. The float32 vectors of rows written
+    in compact storage are kept in the collection's side table.
+    """
+    if COMPACT_STORAGE if table is None else is_compact(table):
+        rows = _keep_full_vectors(rows, collection)
+    if table is None:
+        if isinstance(rows, list):
+            data, schema = (compact_rows(rows) if COMPACT_STORAGE else rows), None
+        else:
+            data, schema = rows, with_storage(rows.schema, COMPACT_STORAGE)
+        table = get_vector_store().create_table(collection_table(collection), data=data, schema=schema)
+    else:
+        table.add(rows)
+    # Answers cached against the old corpus must not be served any more
+    answer_cache.bump_corpus_version(collection)
+    store_maintenance.mark(collection)
+    return table
+
+def _keep_full_vectors(rows, collection: str):
+    """`rows` unchanged, storing the float32 vectors of each batch on the way."""
+    import pyarrow as pa
+    if isinstance(rows, list):
+        store_full_vectors(collection, pa.Table.from_pylist(rows))
+        return rows
+
+    def batches():
+        for batch in rows:
+            store_full_vectors(collection, batch)
+            yield batch
+    return pa.RecordBatchReader.from_batches(rows.schema, batches())
+
+def write_chunks(table, chunks: List[Document], vectors: List[List[float]], collection: str = DEFAULT_COLLECTION):
+    """Appends prepared chunks with their vectors; creates the table if needed."""
+    return write_rows(table, chunk_rows(chunks, vectors), collection)
+
+def index_documents(chunks: List[Document], collection: str = DEFAULT_COLLECTION) -> dict:
+    """Upserts chunks into a collection, embedding only what is not stored yet.
+
+    Chunks are grouped by source. Chunks whose hash is already stored for the
+    source under the current embedding model are skipped, and stored chunks of
+    the source that the new ingest no longer produces are deleted. Other
+    sources are left untouched. New chunks are written before stale ones are
+    deleted, so no table version ever lacks a source being re-ingested.
+    """
+    by_source: Dict[str, Dict[str, Document]] = {}
     for chunk in chunks:
-        # Only keep 'source' in metadata, remove everything else
-        source = chunk.metadata.get("source", "unknown")
-        chunk.metadata = {"source": source}
+        digest = prepare_chunk(chunk)
+        by_source.setdefault(chunk.metadata["source"], {}).setdefault(digest, chunk)
 
-    embeddings = _get_embeddings()
-    from langchain_community.vectorstores import LanceDB
-    
-    vector_store = LanceDB.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        uri=DB_URI,
-        table_name="research_docs"
-    )
-    return vector_store
+    with write_lock(DB_URI, collection):
+        table = open_write_table(collection)
+        stats = {"chunks": 0, "added": 0, "skipped": 0, "deleted": 0, "embed_ms": 0.0, "write_ms": 0.0, "sources": {},
+                 "chunking": chunk_summary([len(c.page_content) for c in chunks])}
+        new_chunks = []
+        stored_by_source = {}
+        for source, hashed in by_source.items():
+            stored = stored_by_source[source] = stored_chunks(table, source) if table is not None else []
+            current = {m["chunk_hash"] for m in stored if m["embedding_model"] == EMBEDDING_MODEL}
+            source_stats = {"chunks": len(hashed), "added": 0, "skipped": 0, "deleted": 0}
+            for digest, chunk in hashed.items():
+                if digest in current:
+                    source_stats["skipped"] += 1
+                else:
+                    source_stats["added"] += 1
+                    new_chunks.append(chunk)
+            stats["sources"][source] = source_stats
 
+        if new_chunks:
+            # One embedding pass and one write for every source in the call
+            started = time.perf_counter()
+            with span("embed"):
+                vectors = _get_embeddings().embed_documents([c.page_content for c in new_chunks])
+            stats["embed_ms"] = round(1000 * (time.perf_counter() - started), 2)
+            started = time.perf_counter()
+            with span("write"):
+                table = write_chunks(table, new_chunks, vectors, collection)
+            stats["write_ms"] = round(1000 * (time.perf_counter() - started), 2)
 
-def get_retriever():
-    embeddings = _get_embeddings()
-    from langchain_community.vectorstores import LanceDB
-    vector_store = LanceDB(
-        uri=DB_URI,
-        embedding=embeddings,
-        table_name="research_docs"
-    )
-    return vector_store.as_retriever()
+        for source, hashed in by_source.items():
+            source_stats = stats["sources"][source]
+            source_stats["deleted"] = delete_stale_chunks(table, source, stored_by_source[source], hashed, collection)
+            for key in ("chunks", "added", "skipped", "deleted"):
+                stats[key] += source_stats[key]
 
+        if new_chunks or stats["deleted"]:
+            # Build the ANN and full-text indexes, or fold the new rows into them
+            with span("index"):
+                ensure_indexes(table)
+    record_ingest(stats)
+    logger.info(f"Indexed {stats['chunks']} chunks: {stats['added']} added, {stats['skipped']} unchanged, {stats['deleted']} deleted")
+    return stats
 
-# --- Logic (Graph Nodes) ---
-def node_retrieve_and_generate(state: ResearchState):
-    query = state["query"]
-    api_key = state.get("api_key")
-    print(f"--- Retrieve & Generate for: {query} ---")
-    
-    if not api_key:
-        raise ValueError("API Key is missing in state")
+def record_ingest(stats: dict):
+    """Exports the chunk counts of one ingest call."""
+    ingest_chunks.observe(stats["chunks"])
+    for result in ("added", "skipped", "deleted"):
+        ingest_chunks_total.inc(stats[result], result=result)
 
-    retriever = get_retriever()
-    docs = retriever.invoke(query)
-    
-    # Use ChatGroq
-    llm = ChatGroq(model=LLM_MODEL, temperature=0, api_key=api_key)
-    structured_llm = llm.with_structured_output(Answer)
-    
-    context_text = "\n\n".join([d.page_content for d in docs])
-    prompt = ChatPromptTemplate.from_template(
-        """You are a reliable researcher. Answer the question based ONLY on the following context.
+def _lance_literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+def _fetch_neighbours(store, table, docs: List[Document]) -> List[Document]:
+    """Returns the chunks stored around each hit in its source document."""
+    seen = {(d.metadata.get("source"), d.metadata.get("start_index")) for d in docs}
+    neighbours = []
+    for doc in docs:
+        start = doc.metadata.get("start_index", -1)
+        if start is None or start < 0:
+            continue
+        where = (
+            f"metadata.source = {_lance_literal(doc.metadata.get('source'))} "
+            f"AND metadata.start_index BETWEEN {start - NEIGHBOUR_WINDOW} AND {start + NEIGHBOUR_WINDOW}"
+        )
+        try:
+            rows = table.search().where(where).limit(4).to_arrow()
+        except Exception as e:
+            # Tables written before start_index was stored cannot be filtered
+            logger.warning(f"Neighbour lookup skipped: {e}")
+            return neighbours
+        for neighbour in _results_to_docs(store, rows):
+            key = (neighbour.metadata.get("source"), neighbour.metadata.get("start_index"))
+            if key not in seen:
+                seen.add(key)
+                neighbours.append(neighbour)
+    neighbours.sort(key=lambda d: (d.metadata.get("source"), d.metadata.get("start_index")))
+    return neighbours
+
+def _results_to_docs(store, rows) -> List[Document]:
+    # The LangChain store drops the row id; keep it so chunks can be referenced
+    docs = store.results_to_docs(rows)
+    if "id" in rows.column_names:
+        for doc, doc_id in zip(docs, rows["id"].to_pylist()):
+            doc.id = doc_id
+    return docs
+
+def _candidate_depth() -> int:
+    max_k = max(s["k"] for s in RETRY_STRATEGIES)
+    if RERANK_ENABLED:
+        # Over-fetch so the cross-encoder has something to reorder
+        max_k = max(max_k, RERANK_CANDIDATES)
+    return max_k
+
+def retrieve_for_attempt(state: ResearchState) -> dict:
+    """Retrieves the context for the current attempt, reusing earlier work.
+
+    The query is embedded and searched once per run; later attempts only take a
+    larger slice of the cached candidates or add the cached neighbours.
+    """
+    attempt = state.get("try_count", 0)
+    strategy = RETRY_STRATEGIES[min(attempt, MAX_TRIES - 1)]
+    cache = dict(state.get("retrieval_cache") or {})
+    vector = state.get("query_vector")
+    collection = state.get("collection") or DEFAULT_COLLECTION
+
+    if "candidates" not in cache:
+        if vector is None:
+            with span("query_embed"):
+                vector = _get_embeddings().embed_query(state["query"])
+        store, table = research_engine.reader(collection)
+        if table is not None:
+            # Later attempts read the same snapshot, whatever is ingested meanwhile
+            cache["table_version"] = table.version
+        max_k = _candidate_depth()
+        full_vectors = _full_vectors(collection)
+        if table is None:
+            # Nothing has been ingested into this collection yet
+            cache["candidates"] = []
+        elif HYBRID_SEARCH_ENABLED:
+            # Keyword matches catch identifiers and rare terms the embedding misses
+            with span("search"):
+                rows, cache["timings"] = hybrid_search(table, state["query"], vector, max_k, full_vectors=full_vectors)
+                cache["candidates"] = _results_to_docs(store, rows)
+        else:
+            with span("search"):
+                cache["candidates"] = _results_to_docs(store, search_vectors(table, vector, max_k, full_vectors=full_vectors))
+
+    docs = cache["candidates"][:strategy["k"]]
+    if strategy["neighbours"] and docs:
+        if "neighbours" not in cache:
+            with span("search", neighbours=True):
+                cache["neighbours"] = _fetch_neighbours(*research_engine.reader(collection, cache.get("table_version")), docs)
+        docs = docs + cache["neighbours"]
+
+    return {"documents": docs, "query_vector": vector, "retrieval_cache": cache}
+
+def _full_vectors(collection: str):
+    """Looks up the float32 vectors a compact collection's searches rescore with."""
+    return functools.partial(full_precision_vectors, collection, EMBEDDING_MODEL)
+
+def retrieve_batch(queries: List[str], vectors: List[List[float]], collection: str = DEFAULT_COLLECTION) -> List[dict]:
+    """Searches many queries together on one snapshot of a collection.
+
+    Returns, per query and in order, the retrieval cache retrieve_for_attempt
+    would have built on the first attempt, so the graph starts from it.
+    """
+    store, table = research_engine.reader(collection)
+    if table is None:
+        return [{"candidates": []} for _ in queries]
+    full_vectors = _full_vectors(collection)
+    with span("search", queries=len(queries)):
+        if HYBRID_SEARCH_ENABLED:
+            searched = hybrid_search_batch(table, queries, vectors, _candidate_depth(), full_vectors=full_vectors)
+        else:
+            searched = [(rows, None) for rows in
+                        search_vectors_batch(table, vectors, _candidate_depth(), full_vectors=full_vectors)]
+        caches = []
+        for rows, timings in searched:
+            cache = {"candidates": _results_to_docs(store, rows), "table_version": table.version}
+            if timings is not None:
+                cache["timings"] = timings
+            caches.append(cache)
+    return caches
+
+
+# --- Logic (Graph Nodes) ---
+RESEARCH_PROMPT = """You are a reliable researcher. Answer the question based ONLY on the following context.
         If you cannot find the answer in the context, set output confidence_score to 0.0.
         
         Context:
@@ -142,37 +505,501 @@ def node_retrieve_and_generate(state: ResearchState):
         
         Question: {question}
         """
-    )
-    chain = prompt | structured_llm
-    response = chain.invoke({"context": context_text, "question": query})
+
+def _build_llm_clients(api_key: str) -> dict:
+    # Built once per API key and kept in the engine's client pool
+    from langchain_groq import ChatGroq
+    llm = ChatGroq(model=LLM_MODEL, temperature=0, api_key=api_key)
+    prompt = ChatPromptTemplate.from_template(RESEARCH_PROMPT)
+    return {
+        "chain": prompt | llm.with_structured_output(Answer),
+        # Same structured Answer, but as a forced tool call whose argument
+        # fragments arrive incrementally when streamed
+        "streaming_chain": prompt | llm.bind_tools([Answer], tool_choice="Answer"),
+    }
+
+def _get_chain(api_key: str):
+    return research_engine.llm(api_key)["chain"]
+
+def _get_streaming_chain(api_key: str):
+    return research_engine.llm(api_key)["streaming_chain"]
+
+async def _astream_answer(api_key: str, context_text: str, query: str, attempt: int) -> Answer:
+    """Generates the answer, emitting the answer text as it streams in."""
+    from langgraph.config import get_stream_writer
+    writer = get_stream_writer()
+    chain = _get_streaming_chain(api_key)
+    args = ""
+    sent = ""
+    async for chunk in chain.astream({"context": context_text, "question": query}):
+        for tool_chunk in chunk.tool_call_chunks:
+            args += tool_chunk.get("args") or ""
+        partial = parse_partial_json(args) if args else None
+        text = partial.get("answer") if isinstance(partial, dict) else None
+        if isinstance(text, str) and len(text) > len(sent) and text.startswith(sent):
+            writer({"event": "token", "attempt": attempt, "text": text[len(sent):]})
+            sent = text
+    return Answer.model_validate(json.loads(args))
+
+def _require_api_key(state: ResearchState) -> str:
+    api_key = state.get("api_key")
+    if not api_key:
+        raise ValueError("API Key is missing in state")
+    return api_key
+
+def node_retrieve(state: ResearchState):
+    logger.info(f"Retrieve for: {state['query']}")
+    _require_api_key(state)
+    return retrieve_for_attempt(state)
+
+async def anode_retrieve(state: ResearchState):
+    """Async variant: query embedding and the LanceDB search run on the blocking pool."""
+    logger.info(f"Retrieve (async) for: {state['query']}")
+    _require_api_key(state)
+    if _retrieval_cached(state):
+        # Only slices the cached candidates, no need for a worker thread
+        return retrieve_for_attempt(state)
+    return await _run_blocking(retrieve_for_attempt, state)
+
+def _retrieval_cached(state: ResearchState) -> bool:
+    """Whether retrieve_for_attempt can serve the attempt from the retrieval cache alone."""
+    cache = state.get("retrieval_cache") or {}
+    if "candidates" not in cache:
+        return False
+    strategy = RETRY_STRATEGIES[min(state.get("try_count", 0), MAX_TRIES - 1)]
+    return not (strategy["neighbours"] and cache["candidates"][:strategy["k"]]) or "neighbours" in cache
+
+# Set in each run of a batch: the batch's share of the blocking executor
+_executor_slots: contextvars.ContextVar[Optional[asyncio.Semaphore]] = contextvars.ContextVar(
+    "executor_slots", default=None)
+
+async def _run_blocking(fn, *args):
+    """blocking_executor.run, holding one of the current batch's executor slots if there is one."""
+    slots = _executor_slots.get()
+    if slots is None:
+        return await blocking_executor.run(fn, *args)
+    async with slots:
+        return await blocking_executor.run(fn, *args)
+
+def node_rerank(state: ResearchState):
+    """Reorders the candidates with the cross-encoder, once per run."""
+    cache = dict(state["retrieval_cache"])
+    if cache.get("reranked"):
+        return {}
+    with span("rerank"):
+        candidates, stats = rerank(state["query"], cache["candidates"])
+    cache.update(candidates=candidates, reranked=True, timings={**(cache.get("timings") or {}), **stats})
+    # Re-slice the attempt's documents from the new order; nothing is searched again
+    return retrieve_for_attempt({**state, "retrieval_cache": cache})
+
+async def anode_rerank(state: ResearchState):
+    # CPU-bound model inference
+    return await _run_blocking(node_rerank, state)
+
+def node_generate(state: ResearchState):
+    query = state["query"]
+    api_key = _require_api_key(state)
+    logger.info(f"Generate for: {query}")
+
+    # Overlapping chunks are merged and the context is capped to the token budget
+    context_text, context_stats = build_context(state["documents"])
+    chain = _get_chain(api_key)
+    research_engine.llm_rate.acquire_sync(api_key, _estimated_tokens(context_stats, query))
+    with span("llm", attempt=state.get("try_count", 0) + 1):
+        response = chain.invoke({"context": context_text, "question": query})
     
-    return {"answer": response, "documents": docs, "try_count": state.get("try_count", 0) + 1}
+    return _attempt_result(state, response, context_stats)
+
+async def anode_generate(state: ResearchState):
+    """Async variant: the LLM call is awaited, and streamed under astream_research."""
+    query = state["query"]
+    api_key = _require_api_key(state)
+    logger.info(f"Generate (async) for: {query}")
+
+    docs = state["documents"]
+    attempt = state.get("try_count", 0) + 1
+    context_text, context_stats = build_context(docs)
+    # No-op unless the graph is run through astream_research
+    from langgraph.config import get_stream_writer
+    get_stream_writer()({
+        "event": "retrieval",
+        "attempt": attempt,
+        "chunk_ids": [d.id for d in docs],
+        "timings": (state.get("retrieval_cache") or {}).get("timings"),
+        "context": context_stats,
+    })
+
+    await research_engine.llm_rate.acquire(api_key, _estimated_tokens(context_stats, query))
+    with span("llm", attempt=attempt):
+        if state.get("stream"):
+            response = await _astream_answer(api_key, context_text, query, attempt)
+        else:
+            chain = _get_chain(api_key)
+            response = await chain.ainvoke({"context": context_text, "question": query})
+
+    return _attempt_result(state, response, context_stats)
+
+def _estimated_tokens(context_stats: dict, query: str) -> int:
+    # Reserved against the key's tokens-per-minute budget before the call is sent
+    return context_stats["tokens_after"] + len(query) // 4 + LLM_TOKEN_OVERHEAD
+
+def _attempt_result(state: ResearchState, response: Answer, context_stats: dict) -> dict:
+    previous = state.get("answer")
+    logger.info(f"Context tokens: {context_stats['tokens_before']} -> {context_stats['tokens_after']}")
+    return {
+        "answer": response,
+        "context_stats": context_stats,
+        "previous_answer": previous.answer if previous else None,
+        "try_count": state.get("try_count", 0) + 1,
+    }
+
+def _normalize_answer(text: Optional[str]) -> str:
+    return " ".join((text or "").lower().split())
 
 def node_grade(state: ResearchState):
+    with span("grade"):
+        return _grade(state)
+
+def _grade(state: ResearchState) -> str:
     answer = state["answer"]
     if answer.confidence_score > 0.7:
         return "end"
-    if state["try_count"] >= 3:
+    if state["try_count"] >= MAX_TRIES:
+        return "end"
+    # Widening the context did not change the answer; another try will not either
+    previous = state.get("previous_answer")
+    if previous is not None and _normalize_answer(previous) == _normalize_answer(answer.answer):
         return "end"
     return "retry"
 
-def build_graph():
+def build_graph(rerank_enabled: Optional[bool] = None):
+    """retrieve -> (rerank) -> generate, looping back to retrieve on a weak answer."""
+    from langgraph.graph import StateGraph, END
+    rerank_enabled = RERANK_ENABLED if rerank_enabled is None else rerank_enabled
     builder = StateGraph(ResearchState)
-    builder.add_node("retrieve_and_generate", node_retrieve_and_generate)
-    builder.set_entry_point("retrieve_and_generate")
+    # Each node has one implementation for graph.invoke and one for graph.ainvoke
+    builder.add_node("retrieve", RunnableLambda(node_retrieve, afunc=anode_retrieve, name="retrieve"))
+    builder.add_node("generate", RunnableLambda(node_generate, afunc=anode_generate, name="generate"))
+    builder.set_entry_point("retrieve")
+    if rerank_enabled:
+        builder.add_node("rerank", RunnableLambda(node_rerank, afunc=anode_rerank, name="rerank"))
+        builder.add_edge("retrieve", "rerank")
+        builder.add_edge("rerank", "generate")
+    else:
+        builder.add_edge("retrieve", "generate")
     
     builder.add_conditional_edges(
-        "retrieve_and_generate",
+        "generate",
         node_grade,
         {
             "end": END,
-            "retry": "retrieve_and_generate"
+            "retry": "retrieve"
         }
     )
     return builder.compile()
 
-# Helper for async execution if needed, but synchronous invoke is fine for first pass
-def run_research(query: str, api_key: str):
-    graph = build_graph()
-    result = graph.invoke({"query": query, "try_count": 0, "api_key": api_key})
+def _cached_research(query: str, collection: str = DEFAULT_COLLECTION):
+    """Looks the query up in the collection's answer cache.
+
+    Returns (corpus version, query vector, research result or None). The
+    vector is handed to the graph on a miss, so the query is embedded once.
+    """
+    version = answer_cache.corpus_version(collection)
+    with span("query_embed"):
+        vector = _get_embeddings().embed_query(query)
+    hit = answer_cache.lookup(query, vector, version, collection)
+    return version, vector, _cached_result(query, hit, collection)
+
+def _cached_result(query: str, hit: Optional[dict], collection: str) -> Optional[dict]:
+    if hit is None:
+        return None
+    return {"query": query, "answer": Answer.model_validate(hit["answer"]), "try_count": 0,
+            "cached": hit["match"], "collection": collection}
+
+def _store_research(query: str, vector, version: int, result: dict, usage: UsageMetadataCallbackHandler,
+                    collection: str = DEFAULT_COLLECTION):
+    answer = result.get("answer")
+    if answer is None:
+        return
+    tokens = sum(u.get("total_tokens", 0) for u in usage.usage_metadata.values())
+    answer_cache.store(query, vector, version, answer.model_dump(), tokens, collection)
+
+def _record_research(result: dict) -> dict:
+    """Exports whether a research run was answered from the cache, and its retries."""
+    if result.get("cached"):
+        research_requests.inc(result="cached")
+        return result
+    attempts = result.get("try_count", 0)
+    research_requests.inc(result="answered")
+    research_attempts.observe(attempts)
+    research_retries.inc(max(attempts - 1, 0))
     return result
+
+def _pinned(table, version: Optional[int] = None):
+    # A checked-out table keeps reading its version while writers commit new ones
+    if table is not None:
+        table.checkout(table.version if version is None else version)
+    return table
+
+class ResearchEngine:
+    """Long-lived research state shared by every request.
+
+    Holds the compiled graph, a pool of LLM clients per API key and warm
+    LanceDB read handles per collection, each reopened only when its
+    collection changes. A handle is pinned to the table version that was
+    current when it was opened, so concurrent ingests never change what an
+    in-flight run reads. The handles share one connection; the least recently
+    used are closed past `COLLECTION_CACHE_SIZE` or after
+    `COLLECTION_IDLE_SECONDS` unused. How long each piece takes to set up is
+    recorded per request.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._graph = None
+        self._connection = None
+        # collection -> (key, store, table, last used)
+        self._readers: "OrderedDict[str, tuple]" = OrderedDict()
+        self.reader_evictions = 0
+        self.llm_clients = LLMClientPool(_build_llm_clients)
+        self.llm_rate = TokenRateLimiter()
+        self.setup_latency = LatencyRegistry()
+
+    def graph(self):
+        started = time.perf_counter()
+        if self._graph is None:
+            with self._lock:
+                if self._graph is None:
+                    self._graph = build_graph()
+        self.setup_latency.record("graph", 1000 * (time.perf_counter() - started))
+        return self._graph
+
+    def llm(self, api_key: str) -> dict:
+        started = time.perf_counter()
+        clients = self.llm_clients.get(api_key)
+        self.setup_latency.record("llm_client", 1000 * (time.perf_counter() - started))
+        return clients
+
+    def _connect(self):
+        if self._connection is None or self._connection[0] != DB_URI:
+            import lancedb
+            os.makedirs(DB_URI, exist_ok=True)
+            connection = lancedb.connect(DB_URI, read_consistency_interval=timedelta(seconds=READ_CONSISTENCY_SECONDS))
+            self._connection = (DB_URI, connection)
+            self._readers.clear()
+        return self._connection[1]
+
+    def reader(self, collection: str = DEFAULT_COLLECTION, version: Optional[int] = None):
+        """Returns the LangChain store and a snapshot of the collection's table (None if absent).
+
+        Pass the `version` of a snapshot returned earlier to read that same
+        snapshot again, even if the collection has changed since.
+        """
+        started = time.perf_counter()
+        # A new corpus version means rows were written or the collection was cleared
+        key = (DB_URI, answer_cache.corpus_version(collection))
+        now = time.monotonic()
+        with self._lock:
+            connection = self._connect()
+            reader = self._readers.get(collection)
+            if reader is None or reader[0] != key:
+                from langchain_community.vectorstores import LanceDB
+                store = LanceDB(connection=connection, embedding=_get_embeddings(),
+                                table_name=collection_table(collection))
+                reader = (key, store, _pinned(store.get_table()))
+            self._readers[collection] = (*reader[:3], now)
+            self._readers.move_to_end(collection)
+            self._evict_readers(now)
+        store, table = reader[1], reader[2]
+        if version is not None and table is not None and table.version != version:
+            # An older snapshot, still readable until maintenance expires it
+            table = _pinned(store.get_table(), version)
+        self.setup_latency.record("vector_store", 1000 * (time.perf_counter() - started))
+        return store, table
+
+    def _evict_readers(self, now: float):
+        # Oldest first, so stop at the first handle that is recent enough
+        while self._readers:
+            collection, reader = next(iter(self._readers.items()))
+            if len(self._readers) <= COLLECTION_CACHE_SIZE and now - reader[3] < COLLECTION_IDLE_SECONDS:
+                break
+            del self._readers[collection]
+            self.reader_evictions += 1
+
+    def warm(self):
+        """Compiles the graph and opens the default collection ahead of the first request."""
+        self.graph()
+        self.reader()
+
+    def reset(self):
+        with self._lock:
+            self._graph = None
+            self._connection = None
+            self._readers.clear()
+        self.llm_clients.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            readers = {"open": len(self._readers), "max": COLLECTION_CACHE_SIZE, "evictions": self.reader_evictions}
+        return {"llm_clients": self.llm_clients.stats(), "llm_rate_limit": self.llm_rate.stats(), "readers": readers,
+                "setup": self.setup_latency.summary()}
+
+research_engine = ResearchEngine()
+
+def run_research(query: str, api_key: str, collection: str = DEFAULT_COLLECTION):
+    inputs = {"query": query, "try_count": 0, "api_key": api_key, "collection": collection}
+    if not ANSWER_CACHE_ENABLED:
+        return _record_research(research_engine.graph().invoke(inputs, config={"callbacks": [llm_token_counter]}))
+    version, vector, cached = _cached_research(query, collection)
+    if cached:
+        return _record_research(cached)
+    usage = UsageMetadataCallbackHandler()
+    graph = research_engine.graph()
+    result = graph.invoke({**inputs, "query_vector": vector}, config={"callbacks": [usage, llm_token_counter]})
+    _store_research(query, vector, version, result, usage, collection)
+    return _record_research(result)
+
+async def arun_research(query: str, api_key: str, collection: str = DEFAULT_COLLECTION):
+    """Runs the research graph without blocking the event loop.
+
+    Answers already computed for the same (or a near-identical) query
+    against the current corpus are returned without running the graph.
+    """
+    inputs = {"query": query, "try_count": 0, "api_key": api_key, "collection": collection}
+    if not ANSWER_CACHE_ENABLED:
+        return _record_research(await research_engine.graph().ainvoke(inputs, config={"callbacks": [llm_token_counter]}))
+    version, vector, cached = await blocking_executor.run(_cached_research, query, collection)
+    if cached:
+        return _record_research(cached)
+    usage = UsageMetadataCallbackHandler()
+    graph = research_engine.graph()
+    result = await graph.ainvoke({**inputs, "query_vector": vector}, config={"callbacks": [usage, llm_token_counter]})
+    await blocking_executor.run(_store_research, query, vector, version, result, usage, collection)
+    return _record_research(result)
+
+async def astream_research(query: str, api_key: str, collection: str = DEFAULT_COLLECTION):
+    """Runs the research graph and yields progress events as they happen.
+
+    Yields "retrieval" events with the chunk ids of each attempt, "token"
+    events with answer text deltas, and a final "answer" event. A cached
+    answer is yielded straight away as the "answer" event.
+    """
+    inputs = {"query": query, "try_count": 0, "api_key": api_key, "stream": True, "collection": collection}
+    usage = UsageMetadataCallbackHandler()
+    final = None
+    if ANSWER_CACHE_ENABLED:
+        version, vector, final = await blocking_executor.run(_cached_research, query, collection)
+        inputs["query_vector"] = vector
+    if final is None:
+        graph = research_engine.graph()
+        config = {"callbacks": [usage, llm_token_counter]}
+        async for mode, payload in graph.astream(inputs, stream_mode=["custom", "values"], config=config):
+            if mode == "custom":
+                yield payload
+            else:
+                final = payload
+        if ANSWER_CACHE_ENABLED and final:
+            await blocking_executor.run(_store_research, query, vector, version, final, usage, collection)
+    if final:
+        _record_research(final)
+    answer = final.get("answer") if final else None
+    yield {
+        "event": "answer",
+        "answer": answer.answer if answer else None,
+        "confidence_score": answer.confidence_score if answer else None,
+        "source_chunk_ids": answer.source_chunk_ids if answer else [],
+        "attempts": final.get("try_count", 0) if final else 0,
+        "cached": final.get("cached") if final else None,
+        "context": final.get("context_stats") if final else None,
+    }
+
+def _embed_queries(queries: List[str]) -> List[List[float]]:
+    with span("query_embed", queries=len(queries)):
+        return embed_queries(_get_embeddings(), queries)
+
+def _cached_batch(queries: List[str], vectors: List[List[float]], collection: str):
+    version = answer_cache.corpus_version(collection)
+    if not ANSWER_CACHE_ENABLED:
+        return version, [None] * len(queries)
+    hits = [answer_cache.lookup(q, v, version, collection) for q, v in zip(queries, vectors)]
+    return version, [_cached_result(q, hit, collection) for q, hit in zip(queries, hits)]
+
+def _batch_event(index: int, query: str, result: Optional[dict] = None, error: Optional[str] = None) -> dict:
+    answer = result.get("answer") if result else None
+    return {
+        "event": "result",
+        "index": index,
+        "query": query,
+        "answer": answer.answer if answer else None,
+        "confidence_score": answer.confidence_score if answer else None,
+        "source_chunk_ids": answer.source_chunk_ids if answer else [],
+        "attempts": result.get("try_count", 0) if result else 0,
+        "cached": result.get("cached") if result else None,
+        "error": error,
+    }
+
+async def abatch_research(queries: List[str], api_key: str, collection: str = DEFAULT_COLLECTION,
+                          concurrency: int = BATCH_RESEARCH_CONCURRENCY):
+    """Researches many queries against one collection, yielding results as they complete.
+
+    The distinct queries are embedded in one model pass and searched together
+    on one snapshot of the collection; answers already cached are yielded
+    straight away. The graph then runs for the rest, at most `concurrency` at
+    once, each starting from its precomputed retrieval, so what remains is
+    mostly LLM calls, paced per API key by the engine's token rate limiter.
+    The runs' remaining hops onto the blocking executor (reranking, neighbour
+    fetches, storing answers) are bounded separately by its worker count, so
+    one batch cannot fill its queue.
+    Yields a "result" event per query, in completion order, carrying the
+    query's `index` in `queries`.
+    """
+    positions: Dict[str, List[int]] = {}
+    for index, query in enumerate(queries):
+        # A query repeated within the batch is answered once
+        positions.setdefault(query, []).append(index)
+    unique = list(positions)
+
+    vectors = await blocking_executor.run(_embed_queries, unique)
+    version, cached = await blocking_executor.run(_cached_batch, unique, vectors, collection)
+    for query, result in zip(unique, cached):
+        if result is not None:
+            _record_research(result)
+            for index in positions[query]:
+                yield _batch_event(index, query, result)
+    pending = [i for i, result in enumerate(cached) if result is None]
+    if not pending:
+        return
+    caches = await blocking_executor.run(
+        retrieve_batch, [unique[i] for i in pending], [vectors[i] for i in pending], collection)
+
+    graph = research_engine.graph()
+    slots = asyncio.Semaphore(max(1, concurrency))
+    executor_slots = asyncio.Semaphore(blocking_executor.max_workers)
+
+    async def run(i: int, retrieval_cache: dict):
+        query = unique[i]
+        inputs = {"query": query, "try_count": 0, "api_key": api_key, "collection": collection,
+                  "query_vector": vectors[i], "retrieval_cache": retrieval_cache}
+        # Each task has its own copy of the context, the setting stays with this run
+        _executor_slots.set(executor_slots)
+        async with slots:
+            usage = UsageMetadataCallbackHandler()
+            try:
+                result = await graph.ainvoke(inputs, config={"callbacks": [usage, llm_token_counter]})
+                if ANSWER_CACHE_ENABLED:
+                    await _run_blocking(_store_research, query, vectors[i], version, result, usage, collection)
+            except Exception as e:
+                logger.warning(f"Batch query {query[:100]!r} failed: {e}")
+                return query, None, f"{type(e).__name__}: {e}"
+        return query, _record_research(result), None
+
+    tasks = [asyncio.ensure_future(run(i, cache)) for i, cache in zip(pending, caches)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            query, result, error = await finished
+            for index in positions[query]:
+                yield _batch_event(index, query, result, error)
+    finally:
+        # The client went away: drop the queries not answered yet
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,183 @@
+"""Startup profiling and readiness.
+
+The server accepts connections as soon as the app is imported; the embedding
+model, the research table and the compiled graph are warmed in a background
+thread. /health answers while that happens, /ready only once it is done.
+Failed steps are retried with exponential backoff, so a model download that
+failed on a network blip does not leave the server unready for good.
+
+Run `python -m app.services.startup profile` from the backend directory to see
+which imports dominate a cold start, or `prefetch` (e.g. in a Docker build
+step) to download the models into the local cache ahead of time.
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WARM_STEPS = ("embeddings", "vector_store", "graph")
+# Rounds of retries for failed warm-up steps; the delay doubles each round up to the cap
+WARM_RETRIES = int(os.getenv("WARM_RETRIES", "8"))
+WARM_RETRY_DELAY_SECONDS = float(os.getenv("WARM_RETRY_DELAY_SECONDS", "2"))
+WARM_RETRY_MAX_DELAY_SECONDS = float(os.getenv("WARM_RETRY_MAX_DELAY_SECONDS", "60"))
+
+
+class StartupProfile:
+    """How long each startup phase took, and which warm-up steps are done."""
+
+    def __init__(self, steps: Iterable[str] = WARM_STEPS):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._phases: Dict[str, float] = {}
+        self._pending = list(steps)
+        self._skipped: List[str] = []
+        self._failed: Dict[str, str] = {}
+        self.ready_at: Optional[float] = None
+
+    def record(self, phase: str, elapsed_ms: float):
+        with self._lock:
+            self._phases[phase] = round(elapsed_ms, 2)
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, 1000 * (time.perf_counter() - started))
+
+    def _done(self, step: str):
+        if step in self._pending:
+            self._pending.remove(step)
+        if not self._pending and self.ready_at is None:
+            self.ready_at = time.perf_counter()
+
+    def mark_ready(self, step: str):
+        with self._lock:
+            self._failed.pop(step, None)
+            self._done(step)
+
+    def mark_skipped(self, step: str):
+        """The step is left to the first request that needs it."""
+        with self._lock:
+            self._skipped.append(step)
+            self._done(step)
+
+    def mark_failed(self, step: str, error: str):
+        with self._lock:
+            self._failed[step] = error
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return not self._pending
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "ready": not self._pending,
+                "pending": list(self._pending),
+                "skipped": list(self._skipped),
+                "failed": dict(self._failed),
+                "phases_ms": dict(self._phases),
+                "ready_after_ms": round(1000 * (self.ready_at - self.started), 2) if self.ready_at else None,
+            }
+
+
+startup_profile = StartupProfile()
+
+
+def warm(warm_embeddings: bool = True, profile: StartupProfile = startup_profile, retries: int = WARM_RETRIES,
+         delay: float = WARM_RETRY_DELAY_SECONDS):
+    """Runs every warm-up step, recording how long each took.
+
+    The steps that failed are run again after `delay` seconds, doubling up
+    to WARM_RETRY_MAX_DELAY_SECONDS, at most `retries` more times. A step
+    still failing after that stays pending, so /ready keeps reporting not
+    ready, and is logged as an error.
+    """
+    from app.services.researcher import research_engine, warm_up
+    steps = [
+        ("embeddings", warm_up if warm_embeddings else None),
+        ("vector_store", research_engine.reader),
+        ("graph", research_engine.graph),
+    ]
+    for step, fn in steps:
+        if fn is None:
+            profile.mark_skipped(step)
+    pending = [(step, fn) for step, fn in steps if fn is not None]
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(min(delay * 2 ** (attempt - 1), WARM_RETRY_MAX_DELAY_SECONDS))
+        pending = [(step, fn) for step, fn in pending if not _warm_step(profile, step, fn, attempt)]
+        if not pending:
+            return
+    for step, _ in pending:
+        logger.error(f"Warm-up step {step} failed {retries + 1} times, giving up; /ready stays unavailable")
+
+
+def _warm_step(profile: StartupProfile, step: str, fn, attempt: int) -> bool:
+    try:
+        with profile.phase(f"warm_{step}"):
+            fn()
+    except Exception as e:
+        logger.warning(f"Warm-up step {step} failed (attempt {attempt + 1}): {e}")
+        profile.mark_failed(step, f"{type(e).__name__}: {e}")
+        return False
+    profile.mark_ready(step)
+    return True
+
+
+def start_warm_up(warm_embeddings: bool = True, profile: StartupProfile = startup_profile) -> threading.Thread:
+    """Warms up in a background thread so the server starts answering at once."""
+    thread = threading.Thread(target=warm, args=(warm_embeddings, profile), name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def import_profile(module: str = "app.main", top: int = 15) -> List[dict]:
+    """Cumulative import time of the slowest modules, measured in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.getcwd(),
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if not parts[1].isdigit():
+            continue
+        rows.append({"module": parts[2], "self_ms": int(parts[0]) / 1000, "cumulative_ms": int(parts[1]) / 1000})
+    rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+    return rows[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup profiling and model prefetch")
+    parser.add_argument("command", choices=["profile", "prefetch"])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    if args.command == "prefetch":
+        from app.services.researcher import warm_up
+        started = time.perf_counter()
+        warm_up()
+        print(f"Models cached in {time.perf_counter() - started:.2f}s")
+        return
+
+    print(f"{'cumulative_ms':>14} {'self_ms':>9}  module")
+    for row in import_profile(args.module, args.top):
+        print(f"{row['cumulative_ms']:>14.1f} {row['self_ms']:>9.1f}  {row['module']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("STORE_MAINTENANCE_INTERVAL_SECONDS", "300"))
+# Versions newer than this are kept, so research runs pinned to them can finish
+VERSION_RETENTION_SECONDS = float(os.getenv("STORE_VERSION_RETENTION_SECONDS", "600"))
+
+_write_locks: Dict[Tuple[str, str], threading.RLock] = {}
+_write_locks_guard = threading.Lock()
+
+
+def write_lock(db_uri: str, collection: str) -> threading.RLock:
+    """The lock that serializes writers of one collection.
+
+    Reentrant, so a write path may call another one (index_text ->
+    index_documents) without deadlocking. Readers never take it: they read
+    the table version they pinned, which writers do not modify.
+    """
+    with _write_locks_guard:
+        return _write_locks.setdefault((db_uri, collection), threading.RLock())
+
+
+class StoreMaintenance:
+    """Background compaction and version clean-up of written collections.
+
+    Every LanceDB write adds a table version and at least one data fragment.
+    Collections written since the last pass are compacted into fewer
+    fragments, their indexes are brought up to date, and versions older than
+    `retention` are deleted, so disk usage stays bounded under steady ingest.
+    A pass holds the collection's write lock, so it never races an ingest.
+    """
+
+    def __init__(self, interval: float = MAINTENANCE_INTERVAL_SECONDS,
+                 retention: float = VERSION_RETENTION_SECONDS):
+        self.interval = interval
+        self.retention = retention
+        self._dirty: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.passes = 0
+        self.compacted = 0
+        self.failures = 0
+        self.last_run: Dict[str, dict] = {}
+
+    def mark(self, collection: str):
+        """Records that a collection was written and needs a maintenance pass."""
+        with self._lock:
+            self._dirty.add(collection)
+
+    @staticmethod
+    def _footprint(table, collection: str) -> Tuple[int, int, int]:
+        from app.services.vector_storage import table_disk_bytes
+        return (table.stats()["fragment_stats"]["num_fragments"], len(table.list_versions()),
+                table_disk_bytes(collection)["total"])
+
+    def maintain(self, collection: str) -> Optional[dict]:
+        """Compacts one collection (and its float32 side table) and removes their expired versions."""
+        from app.services import researcher
+        from app.services.vector_storage import open_full_vectors
+        with write_lock(researcher.DB_URI, collection):
+            table = researcher.open_write_table(collection)
+            if table is None:
+                return None
+            started = time.perf_counter()
+            before = self._footprint(table, collection)
+            table.optimize(cleanup_older_than=timedelta(seconds=self.retention))
+            side = open_full_vectors(collection)
+            if side is not None:
+                side.optimize(cleanup_older_than=timedelta(seconds=self.retention))
+            after = self._footprint(table, collection)
+        result = {
+            "fragments_before": before[0],
+            "fragments_after": after[0],
+            "versions_before": before[1],
+            "versions_after": after[1],
+            "bytes_before": before[2],
+            "bytes_after": after[2],
+            "elapsed_ms": round(1000 * (time.perf_counter() - started), 2),
+        }
+        with self._lock:
+            self.compacted += 1
+            self.last_run[collection] = result
+        return result
+
+    def run_once(self) -> Dict[str, Optional[dict]]:
+        """Maintains every collection written since the previous pass."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            self.passes += 1
+        results = {}
+        for collection in sorted(dirty):
+            try:
+                results[collection] = self.maintain(collection)
+            except Exception as e:
+                logger.error(f"Maintenance of collection {collection} failed: {e}")
+                with self._lock:
+                    self.failures += 1
+                    # Try again next pass
+                    self._dirty.add(collection)
+        return results
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="store-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._thread = None
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.run_once()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "interval_seconds": self.interval,
+                "version_retention_seconds": self.retention,
+                "pending": sorted(self._dirty),
+                "passes": self.passes,
+                "compacted": self.compacted,
+                "failures": self.failures,
+                "last_run": dict(self.last_run),
+            }
+
+
+store_maintenance = StoreMaintenance()
@@ -0,0 +1,130 @@
+"""Per-stage timing spans tagged with the request that caused them.
+
+Every HTTP request gets a request id (the client's X-Request-ID if it sent a
+sane one, otherwise a new one), held in a context variable so it follows the
+work onto the blocking pool, the ingest pipeline threads and the graph nodes.
+`span(stage)` times one stage (load, split, embed, write, query_embed,
+search, rerank, llm, grade), observes it in the `researcher_stage_seconds`
+histogram and appends it to the current request's trace. With
+TRACE_LOG_SPANS=true each span is also logged as a JSON line.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from langchain_core.callbacks import BaseCallbackHandler
+from app.services.metrics import llm_tokens, stage_seconds
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+LOG_SPANS = os.getenv("TRACE_LOG_SPANS", "false").lower() == "true"
+REQUEST_ID_HEADER = "X-Request-ID"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+_trace: contextvars.ContextVar[Optional[List[dict]]] = contextvars.ContextVar("trace", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def current_trace() -> List[dict]:
+    """The spans recorded so far for the current request."""
+    return list(_trace.get() or [])
+
+
+def trace_summary() -> Dict[str, float]:
+    """Total milliseconds per stage for the current request."""
+    totals: Dict[str, float] = {}
+    for entry in current_trace():
+        totals[entry["stage"]] = round(totals.get(entry["stage"], 0.0) + entry["ms"], 2)
+    return totals
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None):
+    """Starts a new trace; spans recorded inside it carry `request_id`."""
+    request_id = request_id or uuid.uuid4().hex
+    id_token = _request_id.set(request_id)
+    trace_token = _trace.set([])
+    try:
+        yield request_id
+    finally:
+        _trace.reset(trace_token)
+        _request_id.reset(id_token)
+
+
+@contextmanager
+def span(stage: str, **fields):
+    """Times one stage of the current request."""
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage=stage)
+        entry = {"request_id": _request_id.get(), "stage": stage, "ms": round(1000 * elapsed, 2),
+                 "status": status, **fields}
+        trace = _trace.get()
+        if trace is not None:
+            # list.append is atomic, so spans from worker threads can share the trace
+            trace.append(entry)
+        if LOG_SPANS:
+            logger.info(json.dumps(entry))
+
+
+def in_current_context(fn):
+    """Wraps `fn` to run in a copy of the caller's context, e.g. as a thread target."""
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+class LLMTokenCounter(BaseCallbackHandler):
+    """Counts the prompt and completion tokens of every LLM call it sees."""
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    llm_tokens.inc(usage.get("input_tokens", 0), direction="in")
+                    llm_tokens.inc(usage.get("output_tokens", 0), direction="out")
+
+
+llm_token_counter = LLMTokenCounter()
+
+
+class RequestIdMiddleware:
+    """ASGI middleware that runs each HTTP request in its own trace.
+
+    The id is echoed back in the X-Request-ID response header. Plain ASGI
+    rather than BaseHTTPMiddleware, so streamed responses stay in the trace.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        incoming = dict(scope.get("headers") or []).get(REQUEST_ID_HEADER.lower().encode(), b"").decode("latin-1")
+        with request_context(incoming if _VALID_REQUEST_ID.match(incoming) else None) as request_id:
+            async def send_with_id(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers") or [])
+                    headers.append((REQUEST_ID_HEADER.lower().encode(), request_id.encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_id)
@@ -0,0 +1,152 @@
+"""Streaming receipt of uploaded files, and the registry of uploads already indexed.
+
+An upload is copied in UPLOAD_CHUNK_BYTES pieces into a uniquely named file,
+its size checked and its SHA-256 updated as each piece arrives, so memory
+stays flat, concurrent uploads of the same name never share a file, and an
+oversized upload is refused as soon as it crosses UPLOAD_MAX_BYTES. The ingest
+pipeline then parses the saved file in place through a memory map.
+
+The registry remembers the content hash of the last indexed upload of each
+source. When the same bytes are uploaded again under the same name into the
+same collection, and the collection still holds exactly the chunks that ingest
+produced, the earlier result is returned without parsing or embedding.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Optional
+
+# --- Configuration ---
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(os.getcwd(), "temp_uploads"))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+UPLOAD_REGISTRY_PATH = os.getenv("UPLOAD_REGISTRY_PATH", os.path.join(os.getcwd(), "data/uploads.sqlite"))
+
+
+class UploadTooLarge(ValueError):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File too large. Maximum size is {max_bytes // (1024 * 1024)}MB.")
+        self.max_bytes = max_bytes
+
+
+@dataclass
+class SavedUpload:
+    path: str
+    size: int
+    sha256: str
+
+
+def save_upload(stream: BinaryIO, directory: str = UPLOAD_DIR, suffix: str = ".pdf",
+                max_bytes: int = UPLOAD_MAX_BYTES, chunk_bytes: int = UPLOAD_CHUNK_BYTES) -> SavedUpload:
+    """Copies `stream` into a new uniquely named file, hashing it on the way.
+
+    Raises UploadTooLarge, and leaves no file behind, once more than
+    `max_bytes` have been read.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{uuid.uuid4().hex}{suffix}")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "wb") as out:
+            while piece := stream.read(chunk_bytes):
+                size += len(piece)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(piece)
+                out.write(piece)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SavedUpload(path, size, digest.hexdigest())
+
+
+def chunk_fingerprint(chunks: Iterable[dict]) -> str:
+    """Digest of the set of stored chunks (metadata rows) of one source."""
+    keys = sorted(f"{m['embedding_model']}:{m['chunk_hash']}" for m in chunks)
+    return hashlib.sha256("\n".join(keys).encode("utf-8")).hexdigest()
+
+
+def _stored_fingerprint(collection: str, source: str) -> Optional[str]:
+    from app.services import researcher
+    from app.services.collection_names import collection_table
+    try:
+        table = researcher.get_vector_store().open_table(collection_table(collection))
+    except Exception:
+        return None
+    stored = researcher.stored_chunks(table, source)
+    return chunk_fingerprint(stored) if stored else None
+
+
+class UploadRegistry:
+    """Content hashes of indexed uploads, with the chunks each one produced."""
+
+    def __init__(self, path: str = UPLOAD_REGISTRY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS uploads (
+                    collection TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    chunks INTEGER NOT NULL,
+                    indexed_at REAL NOT NULL,
+                    PRIMARY KEY (collection, source)
+                )"""
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, collection: str, source: str, content_hash: str) -> Optional[dict]:
+        """Ingest stats for an upload whose chunks are all still stored, or None."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT fingerprint, chunks FROM uploads WHERE collection = ? AND source = ? AND content_hash = ?",
+                (collection, source, content_hash),
+            ).fetchone()
+        # The source may have been cleared or re-ingested from other content since
+        if row is None or _stored_fingerprint(collection, source) != row[0]:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return {"chunks": row[1], "added": 0, "skipped": row[1], "deleted": 0, "unchanged_upload": True}
+
+    def record(self, collection: str, source: str, content_hash: str, chunks: int):
+        """Remembers an indexed upload, fingerprinting the chunks now stored for it."""
+        fingerprint = _stored_fingerprint(collection, source)
+        if fingerprint is None:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO uploads (collection, source, content_hash, fingerprint, chunks, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (collection, source, content_hash, fingerprint, chunks, time.time()),
+            )
+            conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM uploads").fetchone()[0]
+            return {"entries": entries, "hits": self.hits, "misses": self.misses}
+
+
+upload_registry = UploadRegistry()
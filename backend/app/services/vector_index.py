@@ -0,0 +1,304 @@
+"""ANN index management for the LanceDB research tables.
+
+Small tables are searched with a flat scan, which is exact and fast enough.
+Once a table crosses ANN_INDEX_MIN_ROWS an IVF-PQ (or HNSW) index is built,
+and appends are folded into it incrementally with `table.optimize()`.
+The chunk text also gets a full-text (BM25) index, maintained the same way,
+for the keyword leg of hybrid retrieval.
+
+Run `python -m app.services.vector_index report` from the backend directory to
+measure recall and latency for different nprobes / refine_factor settings.
+"""
+import argparse
+import logging
+import math
+import os
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+VECTOR_COLUMN = "vector"
+TEXT_COLUMN = "text"
+DISTANCE = "l2"  # must match the LangChain LanceDB store's default metric
+ANN_INDEX_MIN_ROWS = int(os.getenv("ANN_INDEX_MIN_ROWS", "10000"))
+ANN_INDEX_TYPE = os.getenv("ANN_INDEX_TYPE", "IVF_PQ")  # or IVF_HNSW_SQ
+# Re-optimize once this fraction of rows has been appended since the last build
+ANN_REINDEX_FRACTION = float(os.getenv("ANN_REINDEX_FRACTION", "0.1"))
+SEARCH_NPROBES = int(os.getenv("SEARCH_NPROBES", "20"))
+SEARCH_REFINE_FACTOR = int(os.getenv("SEARCH_REFINE_FACTOR", "0"))
+# Tables with reduced-precision vectors over-fetch this many times k and rescore
+RESCORE_FACTOR = int(os.getenv("VECTOR_RESCORE_FACTOR", "4"))
+
+# Chunk ids -> their float32 vectors, for rescoring a compact table
+FullVectors = Callable[[Sequence[str]], Dict[str, "object"]]
+
+
+def _vector_index_name(table) -> Optional[str]:
+    for index in table.list_indices():
+        if VECTOR_COLUMN in index.columns:
+            return index.name
+    return None
+
+
+def vector_index_stats(table) -> Optional[dict]:
+    """Indexed/unindexed row counts of the table's vector index, or None."""
+    name = _vector_index_name(table)
+    if name is None:
+        return None
+    stats = table.index_stats(name)
+    return {
+        "name": name,
+        "index_type": stats.index_type,
+        "num_indexed_rows": stats.num_indexed_rows,
+        "num_unindexed_rows": stats.num_unindexed_rows,
+    }
+
+
+def _num_sub_vectors(dim: int) -> int:
+    # PQ needs a divisor of the dimension; aim for 8 dimensions per sub-vector
+    for size in (8, 4, 16, 2, 1):
+        if dim % size == 0:
+            return dim // size
+    return 1
+
+
+def build_vector_index(table, index_type: str = ANN_INDEX_TYPE):
+    """(Re)builds the ANN index over the table's vectors."""
+    rows = table.count_rows()
+    dim = table.schema.field(VECTOR_COLUMN).type.list_size
+    num_partitions = max(1, int(math.sqrt(rows)))
+    kwargs = {}
+    if index_type == "IVF_PQ":
+        kwargs["num_sub_vectors"] = _num_sub_vectors(dim)
+    table.create_index(
+        metric=DISTANCE,
+        vector_column_name=VECTOR_COLUMN,
+        num_partitions=num_partitions,
+        index_type=index_type,
+        replace=True,
+        **kwargs
+    )
+    logger.info(f"Built {index_type} index over {rows} rows ({num_partitions} partitions)")
+
+
+def ensure_vector_index(table, min_rows: Optional[int] = None) -> str:
+    """Creates or refreshes the ANN index as the table grows.
+
+    Returns the action taken: "created", "optimized" or "none".
+    """
+    min_rows = ANN_INDEX_MIN_ROWS if min_rows is None else min_rows
+    stats = vector_index_stats(table)
+    if stats is None:
+        if table.count_rows() < min_rows:
+            return "none"
+        build_vector_index(table)
+        return "created"
+
+    indexed = stats["num_indexed_rows"]
+    unindexed = stats["num_unindexed_rows"]
+    if unindexed and unindexed >= ANN_REINDEX_FRACTION * max(indexed, 1):
+        # Adds the new rows to the existing partitions without retraining
+        table.optimize()
+        return "optimized"
+    return "none"
+
+
+def _fts_index_name(table) -> Optional[str]:
+    for index in table.list_indices():
+        if index.index_type == "FTS" and TEXT_COLUMN in index.columns:
+            return index.name
+    return None
+
+
+def ensure_fts_index(table) -> str:
+    """Creates the full-text index, or folds appended rows into it.
+
+    Rows appended since the last build are still searched, by a slower scan,
+    until the next optimize. Returns "created", "optimized" or "none".
+    """
+    from lancedb.index import FTS
+    name = _fts_index_name(table)
+    if name is None:
+        if table.count_rows() == 0:
+            return "none"
+        table.create_index(TEXT_COLUMN, config=FTS(with_position=False), replace=True)
+        return "created"
+    stats = table.index_stats(name)
+    if stats.num_unindexed_rows and stats.num_unindexed_rows >= ANN_REINDEX_FRACTION * max(stats.num_indexed_rows, 1):
+        table.optimize()
+        return "optimized"
+    return "none"
+
+
+def ensure_indexes(table) -> dict:
+    """Maintains both the vector and the full-text index after a write."""
+    return {"vector": ensure_vector_index(table), "fts": ensure_fts_index(table)}
+
+
+def search_text(table, query: str, k: int, where: Optional[str] = None):
+    """BM25 search over the chunk text; a flat scan until the index exists."""
+    from lancedb.query import MatchQuery
+    search = table.search(MatchQuery(query, TEXT_COLUMN), query_type="fts").limit(k)
+    if where:
+        search = search.where(where)
+    return search.to_arrow()
+
+
+def search_vectors(table, vector: List[float], k: int, nprobes: Optional[int] = None,
+                   refine_factor: Optional[int] = None, where: Optional[str] = None,
+                   full_vectors: Optional[FullVectors] = None):
+    """Nearest-neighbour search honouring the configured ANN settings.
+
+    nprobes and refine_factor only take effect once the table has an index.
+    On a table with float16 vectors the top candidates are rescored with
+    the float32 vectors `full_vectors` returns before the best k are kept.
+    """
+    compact = is_compact(table)
+    query = table.search(vector, vector_column_name=VECTOR_COLUMN).limit(k * RESCORE_FACTOR if compact else k)
+    query = query.nprobes(nprobes or SEARCH_NPROBES)
+    refine_factor = SEARCH_REFINE_FACTOR if refine_factor is None else refine_factor
+    if refine_factor:
+        query = query.refine_factor(refine_factor)
+    if where:
+        query = query.where(where)
+    rows = query.to_arrow()
+    return rescore(rows, vector, k, full_vectors) if compact else rows
+
+
+def is_compact(table) -> bool:
+    """Whether the table stores its vectors in reduced precision."""
+    import pyarrow as pa
+    return table.schema.field(VECTOR_COLUMN).type.value_type == pa.float16()
+
+
+def rescore(rows, vectors, k: int, full_vectors: Optional[FullVectors] = None):
+    """Reorders over-fetched candidates by full-precision distance and keeps the best k.
+
+    `full_vectors` maps candidate ids to their float32 vectors (the
+    collection's side table); a candidate it has no vector for is scored
+    with its stored float16 vector instead. Both outcomes are counted, and
+    the storage report shows the share that fell back. `vectors` is one
+    query vector, or one per query for a batched search (rows then carry
+    a query_index column).
+    """
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from app.services.metrics import rescore_candidates
+    if rows.num_rows == 0:
+        return rows
+    ids = rows["id"].to_pylist()
+    full = full_vectors(list(dict.fromkeys(ids))) if full_vectors is not None else {}
+    dim = rows.schema.field(VECTOR_COLUMN).type.list_size
+    stored = pc.list_flatten(rows[VECTOR_COLUMN]).to_numpy().astype(np.float32).reshape(-1, dim)
+    candidates = np.stack([np.asarray(full[i], dtype=np.float32) if i in full else stored[row]
+                           for row, i in enumerate(ids)])
+    found = sum(i in full for i in ids)
+    rescore_candidates.inc(found, vector="float32")
+    rescore_candidates.inc(len(ids) - found, vector="float16")
+    if "query_index" in rows.column_names:
+        groups = rows["query_index"].to_numpy()
+        queries = np.asarray(vectors, dtype=np.float32)[groups]
+    else:
+        groups = np.zeros(rows.num_rows, dtype=np.int64)
+        queries = np.asarray(vectors, dtype=np.float32)[None, :]
+    # Squared L2, the same distance LanceDB reports
+    distances = ((candidates - queries) ** 2).sum(axis=1)
+    order = np.lexsort((distances, groups))
+    rank = np.arange(len(order)) - np.searchsorted(groups[order], groups[order])
+    keep = order[rank < k]
+    rows = rows.set_column(rows.schema.get_field_index("_distance"), "_distance",
+                           pa.array(distances, pa.float32()))
+    return rows.take(pa.array(keep, pa.int64()))
+
+
+def search_vectors_batch(table, vectors: List[List[float]], k: int, where: Optional[str] = None,
+                         full_vectors: Optional[FullVectors] = None) -> list:
+    """Nearest-neighbour search for several query vectors in one LanceDB query.
+
+    Returns one result table per vector, in the order given.
+    """
+    import pyarrow.compute as pc
+    if not vectors:
+        return []
+    rows = search_vectors(table, vectors if len(vectors) > 1 else vectors[0], k, where=where,
+                          full_vectors=full_vectors)
+    if "query_index" not in rows.column_names:
+        return [rows]
+    query_index = rows["query_index"]
+    rows = rows.drop_columns(["query_index"])
+    return [rows.filter(pc.equal(query_index, i)) for i in range(len(vectors))]
+
+
+def recall_latency_report(table, num_queries: int = 50, k: int = 8,
+                          nprobes_grid=(1, 5, 10, 20, 50), refine_grid=(0, 5, 10)) -> List[dict]:
+    """Measures recall@k against an exact scan for each nprobes/refine setting.
+
+    Stored vectors are sampled as queries, so no embedding model is needed.
+    """
+    if _vector_index_name(table) is None:
+        raise ValueError("Table has no vector index; build one first")
+    sample = table.search().select([VECTOR_COLUMN]).limit(num_queries).to_arrow()
+    queries = sample[VECTOR_COLUMN].to_pylist()
+
+    exact = []
+    start = time.perf_counter()
+    for vector in queries:
+        rows = table.search(vector).limit(k).bypass_vector_index().with_row_id(True).to_arrow()
+        exact.append(set(rows["_rowid"].to_pylist()))
+    flat_ms = 1000 * (time.perf_counter() - start) / len(queries)
+
+    report = [{"nprobes": None, "refine_factor": None, "recall": 1.0, "avg_latency_ms": round(flat_ms, 3)}]
+    for nprobes in nprobes_grid:
+        for refine in refine_grid:
+            hits = 0
+            start = time.perf_counter()
+            for vector, truth in zip(queries, exact):
+                query = table.search(vector).limit(k).nprobes(nprobes).with_row_id(True)
+                if refine:
+                    query = query.refine_factor(refine)
+                rows = query.to_arrow()
+                hits += len(truth & set(rows["_rowid"].to_pylist()))
+            elapsed_ms = 1000 * (time.perf_counter() - start) / len(queries)
+            report.append({
+                "nprobes": nprobes,
+                "refine_factor": refine,
+                "recall": round(hits / (k * len(queries)), 4),
+                "avg_latency_ms": round(elapsed_ms, 3),
+            })
+    return report
+
+
+def main(argv=None):
+    import lancedb
+    from app.services.researcher import DB_URI
+
+    parser = argparse.ArgumentParser(description="Manage the research_docs vector index")
+    parser.add_argument("command", choices=["status", "build", "report"])
+    parser.add_argument("--table", default="research_docs")
+    parser.add_argument("--index-type", default=ANN_INDEX_TYPE)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    table = lancedb.connect(DB_URI).open_table(args.table)
+    if args.command == "status":
+        print({"rows": table.count_rows(), "index": vector_index_stats(table), "fts_index": _fts_index_name(table)})
+    elif args.command == "build":
+        build_vector_index(table, args.index_type)
+        ensure_fts_index(table)
+        print({"rows": table.count_rows(), "index": vector_index_stats(table), "fts_index": _fts_index_name(table)})
+    else:
+        if _vector_index_name(table) is None:
+            build_vector_index(table, args.index_type)
+        print(f"{'nprobes':>8} {'refine':>7} {'recall':>8} {'latency_ms':>11}")
+        for row in recall_latency_report(table, num_queries=args.queries, k=args.k):
+            nprobes = "flat" if row["nprobes"] is None else row["nprobes"]
+            refine = "-" if row["refine_factor"] is None else row["refine_factor"]
+            print(f"{nprobes:>8} {refine:>7} {row['recall']:>8.4f} {row['avg_latency_ms']:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
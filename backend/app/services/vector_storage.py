@@ -0,0 +1,294 @@
+"""Compact storage of the research tables, and where their disk space goes.
+
+With COMPACT_STORAGE=true new collections are created with float16 vectors
+and zstd-compressed chunk text, so vector search scans half the vector bytes.
+The float32 vectors are kept next to the collection, in a side table keyed by
+chunk id that searches never scan. Vector search on a compact table
+over-fetches VECTOR_RESCORE_FACTOR times k candidates and rescores them with
+their float32 vectors, so the ranking matches a full-precision table. A
+candidate without a float32 vector (e.g. a collection made compact before
+the side table existed) is scored in float16; the report counts those. The
+side table is part of every footprint reported here: compact storage trades
+disk (float16 plus float32 copies) for cheaper scans. LanceDB cannot search
+int8 vector columns; int8 is available one level down, as the
+scalar-quantized ANN index (ANN_INDEX_TYPE=IVF_HNSW_SQ).
+
+Run `python -m app.services.vector_storage report` from the backend directory
+for the disk footprint of every collection, or `convert <collection>
+[--full]` to rewrite an existing one in compact (or full) precision.
+"""
+import argparse
+import json
+import os
+from typing import Dict, List, Optional, Sequence
+
+from app.services.collection_names import collection_table, table_collection
+from app.services.vector_index import TEXT_COLUMN, VECTOR_COLUMN, ensure_indexes, is_compact
+
+# --- Configuration ---
+COMPACT_STORAGE = os.getenv("COMPACT_STORAGE", "false").lower() == "true"
+# Not a collection table name, so the side tables are never listed or searched
+FULL_VECTORS_PREFIX = "full_vectors__"
+TEXT_COMPRESSION = {"lance-encoding:compression": "zstd"}
+# Subdirectories of a .lance table, reported separately
+DISK_AREAS = ("data", "_indices", "_versions", "_deletions", "_transactions")
+
+
+def with_storage(schema, compact: bool):
+    """`schema` with the vector and text columns stored in compact or full precision."""
+    import pyarrow as pa
+    fields = []
+    for field in schema:
+        if field.name == VECTOR_COLUMN:
+            dim = field.type.list_size if pa.types.is_fixed_size_list(field.type) else -1
+            field = pa.field(VECTOR_COLUMN, pa.list_(pa.float16() if compact else pa.float32(), dim))
+        elif field.name == TEXT_COLUMN:
+            field = field.with_metadata(TEXT_COMPRESSION if compact else None)
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def compact_rows(rows: List[dict]):
+    """Chunk rows as an Arrow table in compact storage, ready for `create_table`."""
+    import pyarrow as pa
+    dim = len(rows[0][VECTOR_COLUMN])
+    table = pa.Table.from_pylist(rows)
+    vector_type = pa.list_(pa.float32(), dim)
+    table = table.set_column(table.schema.get_field_index(VECTOR_COLUMN), VECTOR_COLUMN,
+                             table[VECTOR_COLUMN].cast(vector_type))
+    return table.cast(with_storage(table.schema, compact=True))
+
+
+def full_vectors_table(collection: str) -> str:
+    """Name of the side table holding the float32 vectors of a compact collection."""
+    return FULL_VECTORS_PREFIX + collection_table(collection)
+
+
+def open_full_vectors(collection: str):
+    """The collection's float32 side table, or None if it has none."""
+    from app.services.researcher import DB_URI, get_vector_store
+    name = full_vectors_table(collection)
+    if not os.path.isdir(os.path.join(DB_URI, f"{name}.lance")):
+        return None
+    return get_vector_store().open_table(name)
+
+
+def _full_vector_rows(data):
+    """id, embedding model and float32 vector of chunk rows (an Arrow table or batch)."""
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    flat = pc.list_flatten(data.column(VECTOR_COLUMN)).to_numpy(zero_copy_only=False).astype(np.float32)
+    return pa.table({
+        "id": data.column("id"),
+        "embedding_model": pc.struct_field(data.column("metadata"), "embedding_model"),
+        VECTOR_COLUMN: pa.FixedSizeListArray.from_arrays(pa.array(flat), len(flat) // data.num_rows),
+    })
+
+
+def store_full_vectors(collection: str, data):
+    """Keeps the float32 vectors of chunk rows written to a compact collection.
+
+    Chunks that already have one keep it. Call under the collection's write
+    lock, before the rows themselves are written.
+    """
+    from app.services.researcher import get_vector_store
+    if not data.num_rows:
+        return
+    rows = _full_vector_rows(data)
+    side = open_full_vectors(collection)
+    if side is None:
+        get_vector_store().create_table(full_vectors_table(collection), data=rows)
+    else:
+        side.merge_insert(["id", "embedding_model"]).when_not_matched_insert_all().execute(rows)
+
+
+def delete_full_vectors(collection: str, where: str):
+    """Deletes the side-table vectors matching `where` (a filter on id and embedding_model)."""
+    side = open_full_vectors(collection)
+    if side is not None:
+        side.delete(where)
+
+
+def full_precision_vectors(collection: str, model: str, ids: Sequence[str]) -> dict:
+    """The float32 vectors of the chunks `ids` embedded with `model`, keyed by id."""
+    import numpy as np
+    import pyarrow.compute as pc
+    from app.services.researcher import _lance_literal
+    side = open_full_vectors(collection)
+    if side is None or not ids:
+        return {}
+    rows = (
+        side.search()
+        .where(f"embedding_model = {_lance_literal(model)} AND id IN ({', '.join(map(_lance_literal, ids))})")
+        .select(["id", VECTOR_COLUMN])
+        .limit(len(ids))
+        .to_arrow()
+    )
+    if not rows.num_rows:
+        return {}
+    vectors = pc.list_flatten(rows[VECTOR_COLUMN]).to_numpy().reshape(rows.num_rows, -1)
+    return dict(zip(rows["id"].to_pylist(), np.asarray(vectors, dtype=np.float32)))
+
+
+def _restore_full_vectors(data, collection: str):
+    """`data` with the vectors that have a float32 copy in the side table replaced by it."""
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    side = open_full_vectors(collection)
+    if side is None or not data.num_rows:
+        return data
+    full = side.to_arrow()
+    index = {key: i for i, key in enumerate(zip(full["id"].to_pylist(), full["embedding_model"].to_pylist()))}
+    full_vectors = pc.list_flatten(full[VECTOR_COLUMN]).to_numpy().reshape(full.num_rows, -1)
+    vectors = pc.list_flatten(data[VECTOR_COLUMN]).to_numpy(zero_copy_only=False).astype(np.float32)
+    vectors = vectors.reshape(data.num_rows, -1)
+    keys = zip(data["id"].to_pylist(), pc.struct_field(data["metadata"], "embedding_model").to_pylist())
+    for row, key in enumerate(keys):
+        if key in index:
+            vectors[row] = full_vectors[index[key]]
+    column = pa.FixedSizeListArray.from_arrays(pa.array(vectors.ravel()), vectors.shape[1])
+    return data.set_column(data.schema.get_field_index(VECTOR_COLUMN), VECTOR_COLUMN, column)
+
+
+def disk_usage(path: str) -> Dict[str, int]:
+    """Bytes on disk under a .lance directory, by area and in total."""
+    usage = {area: 0 for area in DISK_AREAS}
+    usage["total"] = 0
+    for root, _, files in os.walk(path):
+        relative = os.path.relpath(root, path).split(os.sep)[0]
+        area = relative if relative in usage else None
+        for name in files:
+            size = os.path.getsize(os.path.join(root, name))
+            usage["total"] += size
+            if area:
+                usage[area] += size
+    return usage
+
+
+def table_disk_bytes(collection: str) -> Dict[str, int]:
+    from app.services.researcher import DB_URI
+    return disk_usage(os.path.join(DB_URI, f"{collection_table(collection)}.lance"))
+
+
+def full_vectors_disk_bytes(collection: str) -> int:
+    from app.services.researcher import DB_URI
+    return disk_usage(os.path.join(DB_URI, f"{full_vectors_table(collection)}.lance"))["total"]
+
+
+def storage_report(collection: str) -> Optional[dict]:
+    """Rows, precision, fragments and disk bytes of one collection, or None if it does not exist."""
+    from app.services.researcher import get_vector_store
+    from app.services.store_maintenance import store_maintenance
+    try:
+        table = get_vector_store().open_table(collection_table(collection))
+    except Exception:
+        return None
+    stats = table.stats()
+    rows = stats["num_rows"]
+    disk = table_disk_bytes(collection)
+    full_vectors = full_vectors_disk_bytes(collection)
+    total = disk["total"] + full_vectors
+    return {
+        "rows": rows,
+        "compact": is_compact(table),
+        "vector_type": str(table.schema.field(VECTOR_COLUMN).type.value_type),
+        "text_compression": (table.schema.field(TEXT_COLUMN).metadata or {})
+        .get(b"lance-encoding:compression", b"none").decode(),
+        "fragments": stats["fragment_stats"]["num_fragments"],
+        "small_fragments": stats["fragment_stats"]["num_small_fragments"],
+        "versions": len(table.list_versions()),
+        "live_bytes": stats["total_bytes"],
+        "disk_bytes": disk,
+        "full_vectors_bytes": full_vectors,
+        "total_bytes": total,
+        "bytes_per_chunk": round(total / rows, 1) if rows else None,
+        "last_compaction": store_maintenance.stats()["last_run"].get(collection),
+    }
+
+
+def rescore_stats() -> dict:
+    """Compact-table candidates rescored in float32, and those that fell back to float16."""
+    from app.services.metrics import rescore_candidates
+    float32 = int(rescore_candidates.value(vector="float32"))
+    float16 = int(rescore_candidates.value(vector="float16"))
+    total = float32 + float16
+    return {"float32": float32, "float16_fallbacks": float16,
+            "fallback_rate": round(float16 / total, 4) if total else 0.0}
+
+
+def storage_stats() -> dict:
+    """Storage reports of every collection, and the totals over all of them."""
+    from app.services.researcher import DB_URI
+    collections = {}
+    if os.path.isdir(DB_URI):
+        for entry in sorted(os.listdir(DB_URI)):
+            name = table_collection(entry[:-len(".lance")]) if entry.endswith(".lance") else None
+            report = storage_report(name) if name is not None else None
+            if report is not None:
+                collections[name] = report
+    rows = sum(r["rows"] for r in collections.values())
+    disk = sum(r["total_bytes"] for r in collections.values())
+    return {
+        "compact_storage": COMPACT_STORAGE,
+        "collections": collections,
+        "rows": rows,
+        "disk_bytes": disk,
+        "bytes_per_chunk": round(disk / rows, 1) if rows else None,
+        "rescore": rescore_stats(),
+    }
+
+
+def convert(collection: str, compact: bool = True) -> Optional[dict]:
+    """Rewrites a collection in compact (or full) storage; returns its disk bytes before and after.
+
+    Going compact first copies the float32 vectors into the side table;
+    going back to full precision restores them from it and drops the side
+    table. The rewrite is one new table version, so readers pinned to the
+    old one keep working until maintenance removes it.
+    """
+    from app.services import researcher
+    from app.services.answer_cache import answer_cache
+    from app.services.store_maintenance import store_maintenance, write_lock
+    with write_lock(researcher.DB_URI, collection):
+        table = researcher.open_write_table(collection)
+        if table is None:
+            return None
+        before = table_disk_bytes(collection)["total"] + full_vectors_disk_bytes(collection)
+        data = table.to_arrow()
+        if compact and not is_compact(table):
+            store_full_vectors(collection, data)
+        else:
+            data = _restore_full_vectors(data, collection)
+        data = data.cast(with_storage(data.schema, compact))
+        table = researcher.get_vector_store().create_table(collection_table(collection), data=data, mode="overwrite")
+        ensure_indexes(table)
+        if not compact:
+            researcher.get_vector_store().drop_table(full_vectors_table(collection), ignore_missing=True)
+    answer_cache.bump_corpus_version(collection)
+    store_maintenance.mark(collection)
+    return {"rows": data.num_rows, "compact": compact, "disk_bytes_before": before,
+            "disk_bytes_after": table_disk_bytes(collection)["total"] + full_vectors_disk_bytes(collection)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compact storage and disk footprint of the research tables")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("report")
+    convert_parser = subcommands.add_parser("convert")
+    convert_parser.add_argument("collection")
+    convert_parser.add_argument("--full", action="store_true", help="Convert back to float32 vectors and plain text")
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        print(json.dumps(storage_stats(), indent=2))
+        return
+    result = convert(args.collection, compact=not args.full)
+    if result is None:
+        parser.error(f"Collection {args.collection!r} does not exist")
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+"""End-to-end benchmarks for ingestion and research.
+
+Everything runs offline: a synthetic corpus, a local stand-in for the Groq
+chat API and a local web server for URL ingestion. See `benchmarks.run`.
+"""
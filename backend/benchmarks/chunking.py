@@ -0,0 +1,185 @@
+"""Chunk counts, split throughput and retrieval recall of each chunking engine.
+
+    python -m benchmarks.chunking --chunkers recursive structured --pdfs 4 --texts 40 --queries 100
+
+Every engine splits the same synthetic corpus (PDF pages and raw texts). The
+chunk count is the number of embeddings the engine makes ingest compute and
+store. Each engine's chunks are then embedded and searched exactly for every
+query. A chunk is relevant to a query when it contains a whole finding that
+names the query's topic and object. Reported per engine, at k: the share of
+queries with a relevant chunk in the top k (hit rate), the share of the top k
+that is relevant (precision), the share of all relevant findings the top k
+contain (finding recall) and the characters of context they take up. The
+first engine is the reference; the others also report their difference to it.
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.corpus import OBJECTS, TOPICS, generate
+from benchmarks.run import _git_commit, _rate, save
+
+_FINDING = re.compile(r"Finding \d+: (?P<topic>.+?) (?:\w+ ){1,2}(?P<object>%s) by \d+ percent\." % "|".join(OBJECTS))
+_QUERY = re.compile(r"How does (?P<topic>.+) affect (?P<object>.+)\? \(\d+\)")
+
+
+def load_documents(pdfs: int, texts: int, queries: int, seed: int = 0):
+    """Pages and texts of the synthetic corpus as Documents, with its queries."""
+    from langchain_core.documents import Document
+    from app.services.ingest_pipeline import _extract_pages, open_pdf
+    documents = []
+    with tempfile.TemporaryDirectory(prefix="rr-chunk-bench-") as tmp:
+        corpus = generate(tmp, pdfs=pdfs, texts=texts, html_pages=0, queries=queries, seed=seed)
+        for path in corpus.pdf_paths:
+            with open_pdf(path) as reader:
+                count = len(reader.pages)
+            for page, text in enumerate(_extract_pages(path, 0, count)):
+                documents.append(Document(page_content=text, metadata={"source": os.path.basename(path), "page": page}))
+    for i, text in enumerate(corpus.texts):
+        documents.append(Document(page_content=text, metadata={"source": f"text-{i}"}))
+    return documents, corpus.queries
+
+
+def findings(documents) -> Dict[Tuple[str, str], List[Tuple[int, int, int]]]:
+    """Spans (document, start, end) of every finding, by (topic, object)."""
+    spans: Dict[Tuple[str, str], List[Tuple[int, int, int]]] = {}
+    for index, doc in enumerate(documents):
+        for match in _FINDING.finditer(doc.page_content):
+            if match["topic"] in TOPICS:
+                spans.setdefault((match["topic"], match["object"]), []).append((index, match.start(), match.end()))
+    return spans
+
+
+def _covers(chunk, span) -> bool:
+    document, start, end = span
+    chunk_start = chunk.metadata["start_index"]
+    return (chunk.metadata["document"] == document and chunk_start <= start
+            and end <= chunk_start + len(chunk.page_content))
+
+
+def retrieval_quality(chunks, chunk_vectors, query_texts, query_vectors, relevant, k: int) -> dict:
+    """Hit rate, precision and finding recall of an exact top-k search over `chunks`."""
+    docs = np.asarray(chunk_vectors, dtype=np.float32)
+    docs /= np.maximum(np.linalg.norm(docs, axis=1, keepdims=True), 1e-12)
+    queries = np.asarray(query_vectors, dtype=np.float32)
+    queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    top = np.argsort(-(queries @ docs.T), axis=1)[:, :k]
+
+    hits, precision, recall, context = [], [], [], []
+    for query, ranked in zip(query_texts, top):
+        match = _QUERY.match(query)
+        spans = relevant.get((match["topic"], match["object"]), []) if match else []
+        retrieved = [chunks[i] for i in ranked]
+        found = [s for s in spans if any(_covers(c, s) for c in retrieved)]
+        useful = [c for c in retrieved if any(_covers(c, s) for s in spans)]
+        hits.append(bool(useful))
+        precision.append(len(useful) / len(retrieved) if retrieved else 0.0)
+        if spans:
+            recall.append(len(found) / len(spans))
+        context.append(sum(len(c.page_content) for c in retrieved))
+    return {
+        f"hit_rate_at_{k}": round(float(np.mean(hits)), 4),
+        f"precision_at_{k}": round(float(np.mean(precision)), 4),
+        f"finding_recall_at_{k}": round(float(np.mean(recall)) if recall else 0.0, 4),
+        "context_chars_mean": round(float(np.mean(context)), 1),
+    }
+
+
+def bench_chunker(chunker, documents, embeddings, query_texts, query_vectors, relevant, k: int) -> dict:
+    """Split throughput, chunk statistics and retrieval quality of one engine."""
+    from app.services.chunking import chunk_summary
+    started = time.perf_counter()
+    chunks = chunker.split_documents(documents)
+    split_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    vectors = embeddings.embed_documents([c.page_content for c in chunks])
+    embed_seconds = time.perf_counter() - started
+    total_chars = sum(len(d.page_content) for d in documents)
+    return {
+        "split_ms": round(1000 * split_seconds, 2),
+        "split_mb_per_second": _rate(total_chars / 1e6, split_seconds),
+        "embeddings": len(chunks),
+        "embed_seconds": round(embed_seconds, 3),
+        "stored_chars": sum(len(c.page_content) for c in chunks),
+        "chunks": chunk_summary([len(c.page_content) for c in chunks], chunker.name),
+        "retrieval": retrieval_quality(chunks, vectors, query_texts, query_vectors, relevant, k),
+    }
+
+
+def _relative(report: dict, reference: dict) -> dict:
+    delta = {"embeddings": round(report["embeddings"] / reference["embeddings"] - 1, 4)}
+    for key, value in report["retrieval"].items():
+        delta[key] = round(value - reference["retrieval"][key], 4)
+    return delta
+
+
+def run_chunking_benchmark(chunkers: List[str], pdfs: int = 2, texts: int = 20, queries: int = 50, k: int = 8,
+                           unit: str = "chars", size: Optional[int] = None, overlap: Optional[int] = None,
+                           seed: int = 0, embeddings=None) -> dict:
+    """Benchmarks each engine on the fixed corpus; the first is the reference."""
+    from app.services.chunking import load_chunker
+    if embeddings is None:
+        from app.services.embedding_backends import EMBEDDING_BACKEND, backend_key
+        from app.services.embeddings import embedding_registry
+        from app.services.researcher import EMBEDDING_MODEL
+        embeddings = embedding_registry.get(backend_key(EMBEDDING_MODEL, EMBEDDING_BACKEND))
+    documents, query_texts = load_documents(pdfs, texts, queries, seed)
+    # Chunks carry the position of their document, so findings can be located in them
+    for index, doc in enumerate(documents):
+        doc.metadata["document"] = index
+    relevant = findings(documents)
+    query_vectors = [embeddings.embed_query(q) for q in query_texts]
+
+    results: Dict[str, dict] = {}
+    reference = None
+    for name in chunkers:
+        report = bench_chunker(load_chunker(name, unit, size, overlap), documents, embeddings, query_texts, query_vectors,
+                               relevant, k)
+        if reference is None:
+            reference = report
+        else:
+            report["vs_" + chunkers[0]] = _relative(report, reference)
+        results[name] = report
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "cpus": os.cpu_count(),
+            "config": {"chunkers": chunkers, "documents": len(documents), "queries": len(query_texts), "k": k,
+                       "unit": unit, "size": size, "overlap": overlap, "seed": seed},
+        },
+        "chunkers": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chunking engine throughput, embedding count and retrieval recall")
+    parser.add_argument("--chunkers", nargs="+", default=["recursive", "structured"])
+    parser.add_argument("--pdfs", type=int, default=2)
+    parser.add_argument("--texts", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--unit", choices=["chars", "tokens"], default="chars")
+    parser.add_argument("--size", type=int, default=None, help="Chunk size in --unit (default: CHUNK_SIZE)")
+    parser.add_argument("--overlap", type=int, default=None,
+                        help="Overlap in --unit for recursive, in sentences for structured (default: scaled to --size)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Where to write the JSON result (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    result = run_chunking_benchmark(args.chunkers, args.pdfs, args.texts, args.queries, args.k, args.unit, args.size,
+                                    args.overlap, args.seed)
+    path = save(result, args.out)
+    print(json.dumps(result["chunkers"], indent=2))
+    print(f"Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
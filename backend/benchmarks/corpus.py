@@ -0,0 +1,79 @@
+"""Synthetic corpus: PDFs, raw texts, HTML pages and the questions to ask about them.
+
+Text is built from a fixed vocabulary of topics with a seeded RNG, so the
+same configuration always produces the same corpus and the same queries.
+"""
+import os
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+TOPICS = [
+    "vector indexes", "query planning", "page caches", "write-ahead logs", "bloom filters",
+    "consensus protocols", "column stores", "compression codecs", "garbage collection",
+    "thread pools", "rate limiting", "tokenizers", "cross-encoders", "cache eviction",
+    "memory allocators", "network backpressure",
+]
+VERBS = ["improves", "bounds", "reduces", "explains", "depends on", "trades off", "accelerates", "complicates"]
+OBJECTS = ["tail latency", "throughput", "recall", "disk usage", "memory pressure", "startup time",
+           "index freshness", "cost per query"]
+
+
+def sentence(rng: random.Random, topic: str, i: int) -> str:
+    return f"Finding {i}: {topic} {rng.choice(VERBS)} {rng.choice(OBJECTS)} by {rng.randint(2, 95)} percent."
+
+
+def paragraph(rng: random.Random, sentences: int) -> str:
+    topic = rng.choice(TOPICS)
+    return " ".join(sentence(rng, topic, i) for i in range(sentences))
+
+
+def write_pdf(path: str, pages: int, rng: random.Random, lines_per_page: int = 30) -> str:
+    """Writes a text PDF with `pages` pages of synthetic sentences."""
+    from pypdf import PdfWriter
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    for _ in range(pages):
+        page = writer.add_blank_page(width=612, height=792)
+        topic = rng.choice(TOPICS)
+        lines = " T* ".join(f"({sentence(rng, topic, i)}) Tj" for i in range(lines_per_page))
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 9 Tf 12 TL 30 770 Td {lines} ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        page[NameObject("/Resources")] = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
+
+
+@dataclass
+class Corpus:
+    pdf_paths: List[str] = field(default_factory=list)
+    texts: List[str] = field(default_factory=list)
+    # Path on the local web server -> HTML
+    pages: Dict[str, str] = field(default_factory=dict)
+    queries: List[str] = field(default_factory=list)
+
+
+def generate(directory: str, pdfs: int = 4, pages_per_pdf: int = 20, texts: int = 20,
+             text_sentences: int = 200, html_pages: int = 10, queries: int = 40, seed: int = 0) -> Corpus:
+    """Writes the PDFs into `directory` and returns the whole corpus."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    corpus = Corpus()
+    for i in range(pdfs):
+        corpus.pdf_paths.append(write_pdf(os.path.join(directory, f"report-{i}.pdf"), pages_per_pdf, rng))
+    for _ in range(texts):
+        corpus.texts.append("\n\n".join(paragraph(rng, 20) for _ in range(max(1, text_sentences // 20))))
+    for i in range(html_pages):
+        body = "".join(f"<p>{paragraph(rng, 15)}</p>" for _ in range(8))
+        corpus.pages[f"article-{i}.html"] = f"<html><head><title>Article {i}</title></head><body>{body}</body></html>"
+    for i in range(queries):
+        corpus.queries.append(f"How does {rng.choice(TOPICS)} affect {rng.choice(OBJECTS)}? ({i})")
+    return corpus
@@ -0,0 +1,140 @@
+"""Throughput and retrieval quality of each embedding backend.
+
+    python -m benchmarks.embeddings --backends torch torch-int8 onnx --docs 2000 --queries 200
+
+Every backend embeds the same fixed corpus (the synthetic generator with a
+fixed seed, split like ingested text). The first backend is the reference;
+every other one is compared against it: how close its vectors are (mean
+cosine similarity per text) and how many of the reference's top-k neighbours
+each query still finds (recall@k over an exact search of the corpus).
+A backend that cannot be loaded here is reported with its error.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.corpus import generate
+from benchmarks.run import _git_commit, _latency_summary, _rate, save
+
+
+def load_corpus(docs: int, queries: int, seed: int = 0):
+    """Chunk texts and queries of the synthetic corpus, the same on every run."""
+    from langchain_core.documents import Document
+    from app.services.researcher import split_text
+    with tempfile.TemporaryDirectory(prefix="rr-embed-bench-") as tmp:
+        texts = max(1, docs // 10)
+        corpus = generate(tmp, pdfs=0, texts=texts, text_sentences=120, html_pages=0, queries=queries, seed=seed)
+    chunks = split_text([Document(page_content=t, metadata={"source": str(i)}) for i, t in enumerate(corpus.texts)])
+    return [c.page_content for c in chunks][:docs], corpus.queries
+
+
+def _normalized(vectors: List[List[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+
+def _top_k(docs: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-(queries @ docs.T), axis=1)[:, :k]
+
+
+def quality(reference: dict, candidate: dict, k: int) -> dict:
+    """How far a backend's vectors and neighbours drift from the reference backend's."""
+    ref_docs, ref_queries = _normalized(reference["docs"]), _normalized(reference["queries"])
+    docs, queries = _normalized(candidate["docs"]), _normalized(candidate["queries"])
+    expected, found = _top_k(ref_docs, ref_queries, k), _top_k(docs, queries, k)
+    recall = np.mean([len(set(e) & set(f)) / len(e) for e, f in zip(expected, found)])
+    return {
+        "doc_cosine_mean": round(float(np.mean(np.sum(ref_docs * docs, axis=1))), 5),
+        "query_cosine_mean": round(float(np.mean(np.sum(ref_queries * queries, axis=1))), 5),
+        f"recall_at_{k}": round(float(recall), 4),
+    }
+
+
+def bench_backend(load: Callable[[], object], docs: List[str], queries: List[str]) -> dict:
+    """Load time, bulk throughput and single-query latency of one backend."""
+    started = time.perf_counter()
+    embeddings = load()
+    load_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    doc_vectors = embeddings.embed_documents(docs)
+    doc_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    query_vectors = embeddings.embed_queries(queries) if hasattr(embeddings, "embed_queries") \
+        else [embeddings.embed_query(q) for q in queries]
+    batch_seconds = time.perf_counter() - started
+
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append(1000 * (time.perf_counter() - started))
+
+    report = {
+        "load_seconds": round(load_seconds, 3),
+        "docs_per_second": _rate(len(docs), doc_seconds),
+        "queries_per_second_batched": _rate(len(queries), batch_seconds),
+        "query_latency": _latency_summary(latencies),
+    }
+    return {"report": report, "docs": doc_vectors, "queries": query_vectors}
+
+
+def run_embedding_benchmark(backends: List[str], docs: int = 1000, queries: int = 100, k: int = 10,
+                            model: Optional[str] = None, seed: int = 0, loader: Optional[Callable] = None) -> dict:
+    """Benchmarks each backend on the fixed corpus; the first is the quality reference."""
+    from app.services.embedding_backends import load_embeddings
+    from app.services.researcher import EMBEDDING_MODEL
+    model = model or EMBEDDING_MODEL
+    loader = loader or load_embeddings
+    doc_texts, query_texts = load_corpus(docs, queries, seed)
+
+    results: Dict[str, dict] = {}
+    reference = None
+    for backend in backends:
+        try:
+            run = bench_backend(lambda: loader(model, backend), doc_texts, query_texts)
+        except Exception as e:
+            results[backend] = {"error": f"{type(e).__name__}: {e}"}
+            continue
+        if reference is None:
+            reference = run
+        run["report"]["quality"] = quality(reference, run, k)
+        results[backend] = run["report"]
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "cpus": os.cpu_count(),
+            "config": {"model": model, "backends": backends, "docs": len(doc_texts), "queries": len(query_texts),
+                       "k": k, "seed": seed},
+        },
+        "backends": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Embedding backend throughput and retrieval quality")
+    parser.add_argument("--backends", nargs="+", default=["torch", "torch-int8", "onnx"])
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Where to write the JSON result (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    result = run_embedding_benchmark(args.backends, args.docs, args.queries, args.k, args.model, args.seed)
+    path = save(result, args.out)
+    print(json.dumps(result["backends"], indent=2))
+    print(f"Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
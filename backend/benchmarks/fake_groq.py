@@ -0,0 +1,142 @@
+"""A local stand-in for the Groq chat completions API.
+
+Answers every request with an `Answer` tool call, after a configurable
+time-to-first-token and at a configurable token rate, streamed or not.
+Point ChatGroq at it with GROQ_API_BASE=<server.url>.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+CHARS_PER_TOKEN = 4
+
+
+class FakeGroqServer:
+    """Serves /openai/v1/chat/completions on localhost in a background thread.
+
+    `low_confidence` is the fraction of questions answered with a confidence
+    below the research graph's threshold, which makes the graph retry them.
+    The answer text depends on the context size, so a retry with a wider
+    context gets a different answer and is not cut short.
+    """
+
+    def __init__(self, latency_ms: float = 300.0, tokens_per_second: float = 200.0,
+                 low_confidence: float = 0.2, port: int = 0):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.low_confidence = low_confidence
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> "FakeGroqServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-groq", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def answer_arguments(self, prompt: str) -> str:
+        question = prompt.rsplit("Question:", 1)[-1].strip()
+        context = prompt.split("Context:", 1)[-1].split("Question:", 1)[0]
+        bucket = int(hashlib.sha256(question.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+        confidence = 0.3 if bucket < self.low_confidence else 0.9
+        words = re.findall(r"\w+", context)[:40]
+        return json.dumps({
+            "answer": f"From {len(context)} characters of context: {' '.join(words)}",
+            "confidence_score": confidence,
+            "source_chunk_ids": [],
+        })
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+                arguments = server.answer_arguments(prompt)
+                time.sleep(server.latency_ms / 1000)
+                if body.get("stream"):
+                    self._stream(body, arguments)
+                else:
+                    time.sleep(len(arguments) / CHARS_PER_TOKEN / server.tokens_per_second)
+                    self._json(body, arguments)
+
+            def _completion(self, body, message_or_delta, key, finish_reason, chunk=False):
+                return {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion.chunk" if chunk else "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{"index": 0, key: message_or_delta, "finish_reason": finish_reason}],
+                    "usage": None if chunk else _usage(body, message_or_delta),
+                }
+
+            def _json(self, body, arguments):
+                message = {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [{"id": "call_0", "type": "function",
+                                    "function": {"name": "Answer", "arguments": arguments}}],
+                }
+                payload = json.dumps(self._completion(body, message, "message", "tool_calls")).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, body, arguments):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                delay = 1 / server.tokens_per_second
+                first = {"role": "assistant", "content": None, "tool_calls": [
+                    {"index": 0, "id": "call_0", "type": "function", "function": {"name": "Answer", "arguments": ""}}
+                ]}
+                self._event(self._completion(body, first, "delta", None, chunk=True))
+                for i in range(0, len(arguments), CHARS_PER_TOKEN):
+                    time.sleep(delay)
+                    delta = {"tool_calls": [{"index": 0, "function": {"arguments": arguments[i:i + CHARS_PER_TOKEN]}}]}
+                    self._event(self._completion(body, delta, "delta", None, chunk=True))
+                self._event(self._completion(body, {}, "delta", "tool_calls", chunk=True))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def _event(self, payload):
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+                self.wfile.flush()
+
+        return Handler
+
+
+def _usage(body, message) -> dict:
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // CHARS_PER_TOKEN
+    completion_tokens = len(json.dumps(message)) // CHARS_PER_TOKEN
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
@@ -0,0 +1,338 @@
+"""Runs the end-to-end benchmark and compares saved results.
+
+    python -m benchmarks.run run --pdfs 4 --pages-per-pdf 20 --queries 40 --concurrency 8
+    python -m benchmarks.run compare benchmarks/results/old.json benchmarks/results/new.json
+
+Ingestion goes through the real pipelines (streamed PDFs, bulk texts, URLs
+from a local web server through both the bulk fetcher and WebBaseLoader).
+Research runs the real graph concurrently against a local fake Groq API.
+Every run gets its own temporary database and caches, so results do not
+depend on what earlier runs stored. Use --fake-embeddings where the
+sentence-transformers model is not available.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+from benchmarks.corpus import Corpus, generate
+from benchmarks.fake_groq import FakeGroqServer
+from benchmarks.web_server import LocalWebServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+@dataclass
+class BenchmarkConfig:
+    pdfs: int = 4
+    pages_per_pdf: int = 20
+    texts: int = 20
+    text_sentences: int = 200
+    html_pages: int = 10
+    queries: int = 40
+    concurrency: int = 8
+    stream: bool = False
+    llm_latency_ms: float = 300.0
+    llm_tokens_per_second: float = 200.0
+    low_confidence: float = 0.2
+    web_latency_ms: float = 20.0
+    fake_embeddings: bool = False
+    seed: int = 0
+
+
+class RssSampler:
+    """Samples the resident set size in the background and keeps the peak."""
+
+    def __init__(self, interval: float = 0.02):
+        from app.services.embeddings import _rss_bytes
+        self._rss = _rss_bytes
+        self.interval = interval
+        self.peak = self._rss()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.peak = max(self.peak, self._rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopping.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+
+def _rate(count: float, seconds: float) -> float:
+    return round(count / seconds, 2) if seconds else 0.0
+
+
+def _latency_summary(samples_ms: List[float]) -> dict:
+    from app.services.metrics import LatencyStats
+    stats = LatencyStats(window=max(1, len(samples_ms)))
+    for value in samples_ms:
+        stats.record(value)
+    summary = stats.summary()
+    if samples_ms:
+        summary["mean_ms"] = round(sum(samples_ms) / len(samples_ms), 2)
+    return summary
+
+
+@contextmanager
+def isolated_environment(workdir: str, groq_url: str, fake_embeddings: bool):
+    """Points the research stack at a throwaway database, fresh caches and the fake Groq."""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from app.services import researcher
+    from app.services.answer_cache import AnswerCache
+    from app.services.embedding_cache import EmbeddingCache
+
+    saved = {name: getattr(researcher, name) for name in
+             ("DB_URI", "embedding_cache", "answer_cache", "ANSWER_CACHE_ENABLED", "_get_embeddings")}
+    saved_base = os.environ.get("GROQ_API_BASE")
+    researcher.DB_URI = os.path.join(workdir, "lancedb")
+    researcher.embedding_cache = EmbeddingCache(os.path.join(workdir, "embeddings.sqlite"))
+    researcher.answer_cache = AnswerCache(os.path.join(workdir, "answers.sqlite"))
+    # Every query should run the graph, not be served from the answer cache
+    researcher.ANSWER_CACHE_ENABLED = False
+    if fake_embeddings:
+        embeddings = DeterministicFakeEmbedding(size=384)
+        researcher._get_embeddings = lambda: embeddings
+    os.environ["GROQ_API_BASE"] = groq_url
+    researcher.research_engine.reset()
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(researcher, name, value)
+        if saved_base is None:
+            os.environ.pop("GROQ_API_BASE", None)
+        else:
+            os.environ["GROQ_API_BASE"] = saved_base
+        researcher.research_engine.reset()
+
+
+def bench_ingest(corpus: Corpus, web: LocalWebServer) -> dict:
+    """Ingests the corpus through each pipeline and reports its throughput."""
+    from app.services import researcher
+    from app.services.bulk_ingest import bulk_ingest
+    from app.services.fetcher import UrlFetcher
+    from app.services.ingest_pipeline import ingest_pdf
+
+    results = {}
+
+    started = time.perf_counter()
+    totals = Counter()
+    for path in corpus.pdf_paths:
+        stats = ingest_pdf(path)
+        totals.update({k: stats[k] for k in ("pages", "chunks", "added")})
+    seconds = time.perf_counter() - started
+    results["pdf"] = {
+        "documents": len(corpus.pdf_paths), "pages": totals["pages"], "chunks": totals["chunks"],
+        "seconds": round(seconds, 3), "pages_per_second": _rate(totals["pages"], seconds),
+        "chunks_per_second": _rate(totals["chunks"], seconds),
+        # Streamed ingest overlaps embedding with parsing, so this is end to end
+        "embeddings_per_second": _rate(totals["added"], seconds),
+    }
+
+    async def bulk(urls, texts, fetcher):
+        try:
+            return await bulk_ingest(urls, [], texts, fetcher=fetcher, collection="bench-bulk")
+        finally:
+            await fetcher.aclose()
+
+    for kind, urls, texts in (("text", [], corpus.texts), ("url_bulk", web.urls(), [])):
+        started = time.perf_counter()
+        stats = asyncio.run(bulk(urls, texts, UrlFetcher()))
+        seconds = time.perf_counter() - started
+        results[kind] = {
+            "documents": len(stats["sources"]), "chunks": stats["chunks"], "seconds": round(seconds, 3),
+            "chunks_per_second": _rate(stats["chunks"], seconds),
+            "embeddings_per_second": _rate(stats["added"], stats["embed_ms"] / 1000),
+            "failed": sum(1 for s in stats["sources"] if s["status"] == "failed"),
+        }
+
+    # The single-URL /ingest path, through WebBaseLoader
+    started = time.perf_counter()
+    chunks = 0
+    for url in web.urls():
+        docs = researcher.load_data(url)
+        chunks += researcher.index_documents(researcher.split_text(docs), "bench-loader")["chunks"]
+    seconds = time.perf_counter() - started
+    results["url_loader"] = {"documents": len(web.urls()), "chunks": chunks, "seconds": round(seconds, 3),
+                             "chunks_per_second": _rate(chunks, seconds)}
+    return results
+
+
+async def _research_one(query: str, stream: bool) -> dict:
+    from app.services import researcher
+    started = time.perf_counter()
+    if not stream:
+        result = await researcher.arun_research(query, "benchmark-key")
+        return {"latency_ms": 1000 * (time.perf_counter() - started), "attempts": result.get("try_count", 0)}
+    ttft_ms, attempts = None, 0
+    async for event in researcher.astream_research(query, "benchmark-key"):
+        if ttft_ms is None and event["event"] == "token":
+            ttft_ms = 1000 * (time.perf_counter() - started)
+        if event["event"] == "answer":
+            attempts = event["attempts"]
+    return {"latency_ms": 1000 * (time.perf_counter() - started), "ttft_ms": ttft_ms, "attempts": attempts}
+
+
+def bench_research(queries: List[str], concurrency: int, stream: bool = False) -> dict:
+    """Runs the queries with `concurrency` in flight and reports latency and retries."""
+
+    async def run_all():
+        slots = asyncio.Semaphore(concurrency)
+
+        async def run(query):
+            async with slots:
+                try:
+                    return await _research_one(query, stream)
+                except Exception as e:
+                    return {"error": f"{type(e).__name__}: {e}"}
+
+        return await asyncio.gather(*(run(q) for q in queries))
+
+    started = time.perf_counter()
+    runs = asyncio.run(run_all())
+    seconds = time.perf_counter() - started
+    ok = [r for r in runs if "error" not in r]
+    attempts = Counter(r["attempts"] for r in ok)
+    result = {
+        "queries": len(queries),
+        "concurrency": concurrency,
+        "errors": len(runs) - len(ok),
+        "error_samples": sorted({r["error"] for r in runs if "error" in r})[:5],
+        "seconds": round(seconds, 3),
+        "queries_per_second": _rate(len(ok), seconds),
+        "latency": _latency_summary([r["latency_ms"] for r in ok]),
+        "retries": sum(max(n - 1, 0) * count for n, count in attempts.items()),
+        "attempts_histogram": {str(n): count for n, count in sorted(attempts.items())},
+    }
+    if stream:
+        result["ttft"] = _latency_summary([r["ttft_ms"] for r in ok if r["ttft_ms"] is not None])
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(config: BenchmarkConfig, workdir: Optional[str] = None) -> dict:
+    """Runs ingestion then research and returns the full result document."""
+    with tempfile.TemporaryDirectory(prefix="rr-bench-") as tmp:
+        workdir = workdir or tmp
+        corpus = generate(os.path.join(workdir, "corpus"), config.pdfs, config.pages_per_pdf, config.texts,
+                          config.text_sentences, config.html_pages, config.queries, config.seed)
+        groq = FakeGroqServer(config.llm_latency_ms, config.llm_tokens_per_second, config.low_confidence)
+        web = LocalWebServer(corpus.pages, latency_ms=config.web_latency_ms)
+        with groq, web, isolated_environment(workdir, groq.url, config.fake_embeddings):
+            with RssSampler() as ingest_rss:
+                ingest = bench_ingest(corpus, web)
+            with RssSampler() as research_rss:
+                research = bench_research(corpus.queries, config.concurrency, config.stream)
+            research["llm_requests"] = groq.requests
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "config": asdict(config),
+        },
+        "ingest": ingest,
+        "research": research,
+        "memory": {
+            "ingest_peak_rss_bytes": ingest_rss.peak,
+            "research_peak_rss_bytes": research_rss.peak,
+            # ru_maxrss is in kilobytes on Linux
+            "process_max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        },
+    }
+
+
+def save(result: dict, path: Optional[str] = None) -> str:
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = result["meta"]["timestamp"].replace(":", "").replace("-", "")
+        path = os.path.join(RESULTS_DIR, f"{stamp}-{result['meta']['commit'] or 'nogit'}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    return path
+
+
+def _flatten(tree: dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in tree.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old: dict, new: dict) -> List[dict]:
+    """Every numeric metric present in both results, with its relative change."""
+    before = _flatten({k: v for k, v in old.items() if k != "meta"})
+    after = _flatten({k: v for k, v in new.items() if k != "meta"})
+    rows = []
+    for name in sorted(before.keys() & after.keys()):
+        change = (after[name] - before[name]) / before[name] if before[name] else None
+        rows.append({"metric": name, "old": before[name], "new": after[name],
+                     "change": round(change, 4) if change is not None else None})
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end ingestion and research benchmark")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run")
+    for name, default in asdict(BenchmarkConfig()).items():
+        flag = "--" + name.replace("_", "-")
+        if isinstance(default, bool):
+            run.add_argument(flag, action="store_true", default=default)
+        else:
+            run.add_argument(flag, type=type(default), default=default)
+    run.add_argument("--out", help="Where to write the JSON result (default: benchmarks/results/)")
+    diff = commands.add_parser("compare")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.old) as f_old, open(args.new) as f_new:
+            rows = compare(json.load(f_old), json.load(f_new))
+        print(f"{'metric':<48} {'old':>12} {'new':>12} {'change':>8}")
+        for row in rows:
+            change = f"{100 * row['change']:+.1f}%" if row["change"] is not None else "-"
+            print(f"{row['metric']:<48} {row['old']:>12} {row['new']:>12} {change:>8}")
+        return
+
+    config = BenchmarkConfig(**{k: getattr(args, k) for k in asdict(BenchmarkConfig())})
+    result = run_benchmark(config)
+    path = save(result, args.out)
+    print(json.dumps({k: result[k] for k in ("ingest", "research", "memory")}, indent=2))
+    print(f"Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""A local web server standing in for the pages WebBaseLoader and the URL fetcher read."""
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+class LocalWebServer:
+    """Serves in-memory HTML pages, with ETags so conditional fetches get 304s.
+
+    `latency_ms` delays every response, to model a remote site.
+    """
+
+    def __init__(self, pages: Dict[str, str], latency_ms: float = 0.0, port: int = 0):
+        self.pages = pages
+        self.latency_ms = latency_ms
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def urls(self) -> List[str]:
+        return [f"{self.url}/{path}" for path in self.pages]
+
+    def start(self) -> "LocalWebServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="local-web", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.latency_ms / 1000)
+                page = server.pages.get(self.path.lstrip("/"))
+                if page is None:
+                    self.send_error(404)
+                    return
+                body = page.encode("utf-8")
+                etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
@@ -0,0 +1,49 @@
+"""
+Fixtures and helpers shared by the test modules.
+"""
+
+import pytest
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import app.services.researcher as researcher
+from app.services.answer_cache import AnswerCache
+
+
+@pytest.fixture
+def empty_db(tmp_path, monkeypatch):
+    """A throwaway LanceDB directory and deterministic fake embeddings; returns the embeddings"""
+    monkeypatch.setattr(researcher, "DB_URI", str(tmp_path / "lancedb"))
+    embeddings = DeterministicFakeEmbedding(size=16)
+    monkeypatch.setattr(researcher, "_get_embeddings", lambda: embeddings)
+    return embeddings
+
+
+@pytest.fixture
+def db(empty_db, tmp_path, monkeypatch):
+    """empty_db with an answer cache of its own; returns the cache"""
+    cache = AnswerCache(str(tmp_path / "answers.sqlite"))
+    monkeypatch.setattr(researcher, "answer_cache", cache)
+    return cache
+
+
+def make_pdf(path, pages, lines_per_page=30):
+    """Writes a text PDF with `pages` pages of numbered sentences"""
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    for p in range(pages):
+        page = writer.add_blank_page(width=612, height=792)
+        lines = " T* ".join(f"(Page {p} line {i} discusses topic {(p + i) % 11}.) Tj" for i in range(lines_per_page))
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 10 Tf 12 TL 40 760 Td {lines} ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})
+        })
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
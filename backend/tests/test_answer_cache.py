@@ -0,0 +1,104 @@
+"""
+Tests for the semantic answer cache.
+"""
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import app.services.researcher as researcher
+from app.services.answer_cache import AnswerCache
+
+ANSWER = {"answer": "LanceDB stores vectors.", "confidence_score": 0.9, "source_chunk_ids": ["c1"]}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnswerCache(str(tmp_path / "answers.sqlite"), similarity=0.9)
+
+
+class TestAnswerCache:
+    """Lookup, invalidation and eviction"""
+
+    def test_exact_match_ignores_case_and_spacing(self, cache):
+        """Test that the normalized query is matched exactly"""
+        version = cache.corpus_version()
+        cache.store("What is LanceDB?", [1.0, 0.0], version, ANSWER, tokens=120)
+        hit = cache.lookup("  what is   lancedb? ", None, version)
+        assert hit["match"] == "exact"
+        assert hit["answer"] == ANSWER
+        assert cache.stats()["saved_tokens"] == 120
+
+    def test_semantic_match_above_threshold(self, cache):
+        """Test that a near-identical query vector is served, a distant one is not"""
+        version = cache.corpus_version()
+        cache.store("What is LanceDB?", [1.0, 0.0, 0.0], version, ANSWER)
+        hit = cache.lookup("Explain LanceDB", [0.99, 0.05, 0.0], version)
+        assert hit["match"] == "semantic"
+        assert hit["similarity"] > 0.9
+        assert cache.lookup("Who wrote Hamlet?", [0.0, 1.0, 0.0], version) is None
+        stats = cache.stats()
+        assert (stats["semantic_hits"], stats["misses"]) == (1, 1)
+
+    def test_ingest_invalidates_answers(self, cache):
+        """Test that bumping the corpus version drops every cached answer"""
+        version = cache.corpus_version()
+        cache.store("q", [1.0], version, ANSWER)
+        new_version = cache.bump_corpus_version()
+        assert new_version == version + 1
+        assert cache.lookup("q", [1.0], new_version) is None
+        assert cache.stats()["invalidations"] == 1
+
+    def test_answer_from_old_version_not_stored(self, cache):
+        """Test that an answer computed while an ingest ran is discarded"""
+        version = cache.corpus_version()
+        cache.bump_corpus_version()
+        cache.store("q", [1.0], version, ANSWER)
+        assert cache.stats()["entries"] == 0
+
+    def test_lru_eviction(self, tmp_path):
+        """Test that the least recently used answers are evicted"""
+        cache = AnswerCache(str(tmp_path / "answers.sqlite"), max_entries=10)
+        for i in range(11):
+            cache.store(f"q{i}", [float(i)], 0, ANSWER)
+        stats = cache.stats()
+        assert stats["entries"] == 9
+        assert stats["evictions"] == 2
+        assert cache.lookup("q0", None, 0) is None
+
+
+class TestResearchCaching:
+    """The answer cache in front of the research graph"""
+
+    def test_repeat_query_skips_graph(self, tmp_path, monkeypatch):
+        """Test that the second identical query does not run the graph"""
+        embeddings = DeterministicFakeEmbedding(size=16)
+        monkeypatch.setattr(researcher, "_get_embeddings", lambda: embeddings)
+        monkeypatch.setattr(researcher, "answer_cache", AnswerCache(str(tmp_path / "answers.sqlite")))
+        calls = []
+
+        class FakeGraph:
+            def invoke(self, inputs, config=None):
+                calls.append(inputs)
+                return {**inputs, "answer": researcher.Answer(**ANSWER)}
+
+        monkeypatch.setattr(researcher.research_engine, "graph", FakeGraph)
+        first = researcher.run_research("What is LanceDB?", "key")
+        second = researcher.run_research("What is LanceDB?", "key")
+        assert len(calls) == 1
+        assert calls[0]["query_vector"] == embeddings.embed_query("What is LanceDB?")
+        assert second["answer"] == first["answer"]
+        assert second["cached"] == "exact"
+
+    def test_writes_bump_corpus_version(self, tmp_path, monkeypatch):
+        """Test that indexing new chunks changes the corpus version"""
+        monkeypatch.setattr(researcher, "DB_URI", str(tmp_path / "lancedb"))
+        embeddings = DeterministicFakeEmbedding(size=16)
+        monkeypatch.setattr(researcher, "_get_embeddings", lambda: embeddings)
+        cache = AnswerCache(str(tmp_path / "answers.sqlite"))
+        monkeypatch.setattr(researcher, "answer_cache", cache)
+        before = cache.corpus_version()
+        researcher.index_text("Some text about vectors. " * 20, source="doc")
+        after = cache.corpus_version()
+        assert after > before
+        # Re-ingesting identical content writes nothing and keeps cached answers
+        researcher.index_text("Some text about vectors. " * 20, source="doc")
+        assert cache.corpus_version() == after
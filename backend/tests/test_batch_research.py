@@ -0,0 +1,159 @@
+"""
+Tests for batch research: batched query embedding and search, per-key token pacing and the batch endpoint.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import app.api.routes as routes
+import app.services.researcher as researcher
+from app.main import app
+from app.services.executor import BlockingExecutor
+from app.services.embedding_cache import CachedEmbeddings, EmbeddingCache
+from app.services.llm_clients import TokenRateLimiter
+from benchmarks.fake_groq import FakeGroqServer
+
+client = TestClient(app)
+
+TEXT = " ".join(f"Fact {i}: the {topic} is stored in segment {i}." for i, topic in
+                enumerate(["index", "table", "vector", "manifest", "fragment"] * 30))
+
+
+@pytest.fixture
+def db(db, monkeypatch):
+    """The shared db fixture, holding the facts text and a fresh research engine"""
+    monkeypatch.setattr(researcher, "research_engine", researcher.ResearchEngine())
+    researcher.index_text(TEXT, source="facts.txt")
+
+
+@pytest.fixture
+def groq(monkeypatch):
+    with FakeGroqServer(latency_ms=0, low_confidence=0.0) as server:
+        monkeypatch.setenv("GROQ_API_BASE", server.url)
+        yield server
+
+
+def _collect(queries, **kwargs):
+    async def run():
+        return [event async for event in researcher.abatch_research(queries, "key", **kwargs)]
+    return asyncio.run(run())
+
+
+class TestBatchedRetrieval:
+    """Queries embedded and searched together"""
+
+    def test_batch_search_matches_single_search(self, db):
+        """Test that searching together finds what searching one by one finds"""
+        queries = ["where is the index stored", "fragment segment", "vector"]
+        vectors = [researcher._get_embeddings().embed_query(q) for q in queries]
+        caches = researcher.retrieve_batch(queries, vectors)
+        for query, vector, cache in zip(queries, vectors, caches):
+            single = researcher.retrieve_for_attempt({"query": query, "query_vector": vector, "try_count": 0})
+            assert [d.id for d in cache["candidates"]] == [d.id for d in single["retrieval_cache"]["candidates"]]
+
+    def test_missing_collection_has_no_candidates(self, db):
+        """Test that a batch against an empty collection retrieves nothing"""
+        assert researcher.retrieve_batch(["a", "b"], [[0.0] * 16] * 2, "empty") == [{"candidates": []}] * 2
+
+    def test_query_misses_embedded_in_one_call(self, tmp_path):
+        """Test that cached query vectors are reused and the rest embedded together"""
+        calls = []
+        model = DeterministicFakeEmbedding(size=8)
+
+        class Model:
+            query_encode_kwargs = {}
+
+            def embed_documents(self, texts):
+                calls.append(list(texts))
+                return model.embed_documents(texts)
+
+        embeddings = CachedEmbeddings("fake", Model, EmbeddingCache(str(tmp_path / "e.sqlite")))
+        embeddings.embed_queries(["a", "b"])
+        vectors = embeddings.embed_queries(["a", "b", "c", "d"])
+        assert calls == [["a", "b"], ["c", "d"]]
+        assert vectors[2] == model.embed_query("c")
+
+
+class TestTokenRateLimiter:
+    """Per-key pacing against a tokens-per-minute budget"""
+
+    def test_waits_once_budget_spent(self):
+        """Test that calls beyond a key's minute of tokens are delayed, other keys are not"""
+        limiter = TokenRateLimiter(tokens_per_minute=600)
+        assert limiter.reserve("a", 500) == 0
+        assert limiter.reserve("a", 200) == pytest.approx(10, abs=0.5)
+        assert limiter.reserve("b", 500) == 0
+        assert limiter.stats()["delayed"] == 1
+
+    def test_unlimited_by_default(self):
+        """Test that a zero budget never delays"""
+        limiter = TokenRateLimiter(tokens_per_minute=0)
+        assert limiter.reserve("a", 10 ** 9) == 0
+
+
+class TestBatchResearch:
+    """Many queries answered in one call"""
+
+    def test_every_query_answered_once(self, db, groq):
+        """Test that each index gets a result and a repeated query is answered once"""
+        queries = ["where is the index", "what is a fragment", "where is the index"]
+        events = _collect(queries, concurrency=2)
+        assert sorted(e["index"] for e in events) == [0, 1, 2]
+        assert all(e["answer"] and e["error"] is None for e in events)
+        assert groq.requests == 2
+
+    def test_concurrency_beyond_executor_workers(self, db, groq, monkeypatch):
+        """Test that LLM calls run `concurrency` at once without filling a small blocking executor's queue"""
+        executor = BlockingExecutor(max_workers=1, max_queue=1)
+        monkeypatch.setattr(researcher, "blocking_executor", executor)
+        lock, active, peak = threading.Lock(), [0], [0]
+        answer_arguments = groq.answer_arguments
+
+        def slow_answer(prompt):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.2)
+            with lock:
+                active[0] -= 1
+            return answer_arguments(prompt)
+        monkeypatch.setattr(groq, "answer_arguments", slow_answer)
+        try:
+            events = _collect([f"where is segment {i}" for i in range(6)], concurrency=32)
+        finally:
+            executor.shutdown()
+        assert all(e["error"] is None for e in events) and len(events) == 6
+        assert executor.stats()["rejected"] == 0
+        assert peak[0] > 1
+
+    def test_cached_answers_skip_the_graph(self, db, groq):
+        """Test that a second batch is served from the answer cache"""
+        _collect(["where is the index"])
+        events = _collect(["where is the index"])
+        assert events[0]["cached"] == "exact"
+        assert groq.requests == 1
+
+
+class TestBatchEndpoint:
+    """POST /api/research/batch"""
+
+    def test_validation(self, monkeypatch):
+        """Test that missing keys, empty queries and oversized batches are rejected"""
+        assert client.post("/api/research/batch", json={"queries": ["q"]}).status_code == 401
+        headers = {"x-groq-api-key": "key"}
+        assert client.post("/api/research/batch", json={"queries": ["ok", " "]}, headers=headers).status_code == 400
+        monkeypatch.setattr(routes, "BATCH_MAX_QUERIES", 2)
+        assert client.post("/api/research/batch", json={"queries": ["a", "b", "c"]}, headers=headers).status_code == 400
+
+    def test_streams_results_then_summary(self, db, groq):
+        """Test that results stream as SSE events followed by a summary"""
+        response = client.post("/api/research/batch", json={"queries": ["index", "fragment"]},
+                               headers={"x-groq-api-key": "key"})
+        events = [line for line in response.text.splitlines() if line.startswith("event: ")]
+        assert events == ["event: result", "event: result", "event: summary"]
+        summary = json.loads(response.text.strip().splitlines()[-1][len("data: "):])
+        assert summary["answered"] == 2 and summary["failed"] == 0
@@ -0,0 +1,59 @@
+"""
+Tests for the offline benchmark suite and its Groq and web stand-ins.
+"""
+
+import httpx
+from benchmarks.corpus import generate
+from benchmarks.fake_groq import FakeGroqServer
+from benchmarks.run import BenchmarkConfig, compare, run_benchmark
+from benchmarks.web_server import LocalWebServer
+
+
+class TestStandIns:
+    """Local servers that replace Groq and the public web"""
+
+    def test_fake_groq_answers_structured_output(self):
+        """Test that ChatGroq gets a parseable Answer tool call from the fake API"""
+        from langchain_groq import ChatGroq
+        from app.services.researcher import Answer
+        with FakeGroqServer(latency_ms=0, low_confidence=0.0) as groq:
+            llm = ChatGroq(model="llama-3.3-70b-versatile", api_key="bench", base_url=groq.url)
+            answer = llm.with_structured_output(Answer).invoke("Context: storage.\n\nQuestion: what?")
+        assert answer.confidence_score == 0.9
+        assert groq.requests == 1
+
+    def test_web_server_revalidates(self, tmp_path):
+        """Test that a page fetched again with its ETag is a 304"""
+        corpus = generate(str(tmp_path), pdfs=0, texts=0, html_pages=1, queries=1)
+        with LocalWebServer(corpus.pages, latency_ms=0) as web:
+            url = web.urls()[0]
+            first = httpx.get(url)
+            second = httpx.get(url, headers={"If-None-Match": first.headers["etag"]})
+        assert first.status_code == 200
+        assert second.status_code == 304
+
+
+class TestBenchmarkRun:
+    """A small end-to-end run"""
+
+    def test_report_covers_ingest_research_and_memory(self):
+        """Test that a tiny run reports throughput, latency percentiles and retries"""
+        config = BenchmarkConfig(pdfs=1, pages_per_pdf=2, texts=2, text_sentences=20, html_pages=2,
+                                 queries=4, concurrency=2, llm_latency_ms=0, low_confidence=1.0,
+                                 web_latency_ms=0, fake_embeddings=True)
+        result = run_benchmark(config)
+        assert result["ingest"]["pdf"]["pages"] == 2
+        assert {"text", "url_bulk", "url_loader"} <= set(result["ingest"])
+        research = result["research"]
+        assert research["errors"] == 0
+        assert research["latency"]["count"] == 4
+        assert research["retries"] > 0
+        assert result["memory"]["research_peak_rss_bytes"] > 0
+
+    def test_compare_reports_relative_change(self):
+        """Test that compare lines up numeric metrics of two results"""
+        old = {"ingest": {"pdf": {"pages_per_second": 10.0}}, "research": {"errors": 0}, "memory": {}}
+        new = {"ingest": {"pdf": {"pages_per_second": 12.0}}, "research": {"errors": 1}, "memory": {}}
+        rows = {row["metric"]: row for row in compare(old, new)}
+        assert rows["ingest.pdf.pages_per_second"]["change"] == 0.2
+        assert rows["research.errors"]["change"] is None
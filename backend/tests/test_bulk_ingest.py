@@ -0,0 +1,118 @@
+"""
+Tests for bulk ingestion against a local HTTP stand-in.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import fetcher as fetcher_module
+from app.services.fetcher import UrlFetcher
+
+client = TestClient(app)
+
+PAGES = {
+    f"/page{i}": f"<html><body><h1>Page {i}</h1><p>{'Local page %d text. ' % i * 80}</p></body></html>"
+    for i in range(5)
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        _Handler.requests.append((self.path, self.headers.get("If-None-Match")))
+        body = PAGES.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag = f'"{hash(body)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    _Handler.requests = []
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+class TestUrlFetcher:
+    """Test concurrent and conditional fetching"""
+
+    async def test_conditional_refetch(self, site):
+        fetcher = UrlFetcher(per_host=2)
+        urls = [f"{site}/page{i}" for i in range(5)] + [f"{site}/missing"]
+        first = await fetcher.fetch_all(urls)
+        assert [r.status for r in first] == ["fetched"] * 5 + ["failed"]
+
+        second = await fetcher.fetch_all(urls[:5])
+        assert [r.status for r in second] == ["not_modified"] * 5
+        assert all(etag for _, etag in _Handler.requests[-5:])
+        await fetcher.aclose()
+
+    async def test_oversized_body_aborted_while_streaming(self, monkeypatch):
+        """Test that a body without a length stops being read once it passes the limit"""
+        monkeypatch.setattr(fetcher_module, "FETCH_MAX_BYTES", 1000)
+        sent = []
+
+        async def body():
+            for _ in range(100):
+                sent.append(100)
+                yield b"x" * 100
+
+        fetcher = UrlFetcher(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=body())))
+        result = await fetcher.fetch("http://example.test/big")
+        assert result.status == "failed" and "larger than 1000 bytes" in result.error
+        assert sum(sent) <= 1100
+        small = UrlFetcher(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=b"ok")))
+        assert (await small.fetch("http://example.test/small")).content == b"ok"
+        await fetcher.aclose()
+        await small.aclose()
+
+
+class TestBulkIngestEndpoint:
+    """Test the bulk ingest API"""
+
+    def test_validation_empty(self):
+        response = client.post("/api/ingest/bulk", json={})
+        assert response.status_code == 400
+
+    def test_validation_bad_url(self):
+        response = client.post("/api/ingest/bulk", json={"urls": ["ftp://example.com"]})
+        assert response.status_code == 400
+
+    def test_bulk_ingest_reports_per_source(self, site, empty_db):
+        body = {"urls": [f"{site}/page{i}" for i in range(3)] + [f"{site}/missing"], "texts": ["A short note."]}
+        response = client.post("/api/ingest/bulk", json=body)
+        assert response.status_code == 200
+        data = response.json()
+        by_source = {s["source"]: s for s in data["sources"]}
+        assert by_source[f"{site}/page0"]["status"] == "ingested"
+        assert by_source[f"{site}/page0"]["chunks"] > 0
+        assert by_source[f"{site}/missing"]["status"] == "failed"
+        assert data["chunks_added"] == sum(s["added"] for s in data["sources"])
+
+        again = client.post("/api/ingest/bulk", json=body).json()
+        statuses = {s["source"]: s["status"] for s in again["sources"]}
+        assert statuses[f"{site}/page1"] == "unchanged"
+        assert again["chunks_added"] == 0
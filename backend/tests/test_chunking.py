@@ -0,0 +1,171 @@
+"""
+Tests for the chunking engines, their per-ingest statistics and their benchmark.
+"""
+
+import random
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import app.services.researcher as researcher
+from app.services import chunking
+from app.services.chunking import (
+    RecursiveChunker, StructuredChunker, TokenLengths, chunking_stats, load_chunker, pack,
+)
+from benchmarks.chunking import run_chunking_benchmark
+from benchmarks.corpus import paragraph
+
+DOCUMENT = """# Overview
+The store keeps every chunk once. Readers pin a version! Writers append fragments?
+
+2.1 Compaction Rules
+Fragments are merged in the background. Old versions are removed after a while. """ + \
+    " ".join(f"Sentence {i} explains why compaction keeps the fragment count low." for i in range(40)) + \
+    "\fA new page begins here. It has two sentences."
+
+
+@pytest.fixture(scope="module")
+def tokenizer(tmp_path_factory):
+    """A word-piece tokenizer over a tiny vocabulary; unknown words are one token each."""
+    from transformers import BertTokenizerFast
+    vocab = tmp_path_factory.mktemp("vocab") / "vocab.txt"
+    vocab.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "sentence", "compaction", "."]))
+    return BertTokenizerFast(vocab_file=str(vocab))
+
+
+class TestPack:
+    """Greedy packing of unit lengths against prefix sums"""
+
+    def test_ranges_fit_size(self):
+        """Test that ranges stay within the size, and an oversized unit gets its own"""
+        assert pack(np.array([3, 3, 3, 9, 2, 2]), 6) == [(0, 2), (2, 3), (3, 4), (4, 6)]
+
+    def test_overlap_repeats_units(self):
+        """Test that each range restarts `overlap` units back, always moving forward"""
+        assert pack(np.array([2, 2, 2, 2, 2]), 4, overlap=1) == [(0, 2), (1, 3), (2, 4), (3, 5)]
+        assert pack(np.array([5, 5, 5]), 4, overlap=2) == [(0, 1), (1, 2), (2, 3)]
+
+
+class TestStructuredChunker:
+    """Chunks cut at headings, pages and sentence ends"""
+
+    def test_chunks_are_exact_slices_within_size(self):
+        """Test that every chunk is the source text at its start_index, within the size"""
+        chunks = StructuredChunker(size=300).split_documents([Document(page_content=DOCUMENT, metadata={"source": "a"})])
+        for chunk in chunks:
+            start = chunk.metadata["start_index"]
+            assert DOCUMENT[start:start + len(chunk.page_content)] == chunk.page_content
+            assert len(chunk.page_content) <= 300
+            assert chunk.metadata["source"] == "a"
+
+    def test_headings_and_pages_start_chunks(self):
+        """Test that no chunk spans a heading or a page break"""
+        texts = [t for _, t in StructuredChunker(size=2000).split_text(DOCUMENT)]
+        assert texts[0].startswith("# Overview") and texts[0].endswith("fragments?")
+        assert texts[1].startswith("2.1 Compaction Rules")
+        assert texts[-1] == "A new page begins here. It has two sentences."
+        assert not any("\f" in t for t in texts)
+
+    def test_sentences_are_not_cut(self):
+        """Test that chunks end at sentence ends and do not overlap by default"""
+        chunks = StructuredChunker(size=200).split_text(DOCUMENT)
+        assert all(text[-1] in ".!?" or text.endswith("Rules") for _, text in chunks)
+        ends = [start + len(text) for start, text in chunks]
+        assert all(start >= end for (start, _), end in zip(chunks[1:], ends))
+
+    def test_sentence_overlap(self):
+        """Test that overlap repeats whole sentences at the start of the next chunk"""
+        chunks = StructuredChunker(size=200, overlap=1).split_text(DOCUMENT)
+        body = [text for _, text in chunks if text.startswith("Sentence")]
+        assert body[1].split(". ")[0] + "." == body[0].split(". ")[-1]
+
+    def test_long_sentence_cut_at_words(self):
+        """Test that a sentence longer than the size is split between words"""
+        text = " ".join(["word"] * 200)
+        chunks = StructuredChunker(size=100).split_text(text)
+        assert all(len(t) <= 100 and t.startswith("word") for _, t in chunks)
+        assert sum(len(t.split()) for _, t in chunks) == 200
+
+    def test_fewer_chunks_than_recursive(self):
+        """Test that dropping the overlap yields fewer chunks for the same text"""
+        docs = [Document(page_content="\n\n".join(paragraph(random.Random(i), 20) for _ in range(5)),
+                         metadata={"source": str(i)}) for i in range(5)]
+        assert len(StructuredChunker().split_documents(docs)) < len(RecursiveChunker().split_documents(docs))
+
+
+class TestTokenSizing:
+    """Chunk sizes counted in tokens of the embedding model's tokenizer"""
+
+    def test_bulk_token_counts(self, tokenizer):
+        """Test that many texts are counted in one call, without special tokens"""
+        lengths = TokenLengths(tokenizer)(["sentence.", "compaction keeps sentence", ""])
+        assert lengths.tolist() == [2, 3, 0]
+
+    def test_chunks_fit_token_budget(self, tokenizer):
+        """Test that chunks measured in tokens stay within the token size"""
+        count = TokenLengths(tokenizer)
+        for chunker in (StructuredChunker(size=64, length=count), RecursiveChunker(size=64, overlap=8, length=count)):
+            chunks = chunker.split_documents([Document(page_content=DOCUMENT, metadata={})])
+            assert count([c.page_content for c in chunks]).max() <= 64
+
+
+class TestEngineSelection:
+    """The configured engine is used for every ingest"""
+
+    def test_unknown_engine(self):
+        """Test that an unknown engine or unit is refused"""
+        with pytest.raises(ValueError):
+            load_chunker("semantic")
+        with pytest.raises(ValueError):
+            load_chunker("structured", unit="words")
+
+    def test_overlap_scales_with_small_sizes(self, monkeypatch):
+        """Test that a size below the configured overlap gets a proportional overlap"""
+        monkeypatch.setattr(chunking, "CHUNK_UNIT", "chars")
+        monkeypatch.setattr(chunking, "CHUNK_SIZE", 1000)
+        monkeypatch.setattr(chunking, "CHUNK_OVERLAP", 200)
+        chunker = load_chunker("recursive", "chars", 150)
+        assert (chunker.size, chunker.overlap) == (150, 30)
+        chunks = chunker.split_documents([Document(page_content=DOCUMENT, metadata={})])
+        assert max(len(c.page_content) for c in chunks) <= 150
+        assert load_chunker("recursive", "chars", 150, overlap=10).overlap == 10
+        assert load_chunker("structured", "chars", 150).overlap == 0
+
+    def test_token_unit_has_token_defaults(self, tokenizer, monkeypatch):
+        """Test that tokens use token-sized defaults while CHUNK_UNIT counts characters"""
+        monkeypatch.setattr(chunking, "CHUNK_UNIT", "chars")
+        monkeypatch.setattr(chunking, "embedding_tokenizer", lambda: tokenizer)
+        chunker = load_chunker("recursive", "tokens")
+        assert (chunker.size, chunker.overlap) == (256, 50)
+        chunker = load_chunker("recursive", "tokens", 64)
+        assert (chunker.size, chunker.overlap) == (64, 12)
+        chunks = chunker.split_documents([Document(page_content=DOCUMENT, metadata={})])
+        assert TokenLengths(tokenizer)([c.page_content for c in chunks]).max() <= 64
+
+    def test_split_text_records_stats(self):
+        """Test that splitting is counted per engine"""
+        before = chunking_stats.summary().get("structured", {}).get("chunks", 0)
+        chunks = researcher.split_text([Document(page_content=DOCUMENT, metadata={"source": "a"})],
+                                       load_chunker("structured"))
+        assert chunking_stats.summary()["structured"]["chunks"] == before + len(chunks)
+
+    def test_ingest_reports_chunking(self, db):
+        """Test that an ingest reports its chunk count and length distribution"""
+        chunks = researcher.split_text([Document(page_content=DOCUMENT, metadata={"source": "a"})])
+        stats = researcher.index_documents(chunks)
+        assert stats["chunking"]["chunks"] == len(chunks)
+        assert stats["chunking"]["chars_max"] <= 1000
+
+
+class TestChunkingBenchmark:
+    """The benchmark compares each engine with the reference"""
+
+    def test_report_per_chunker(self):
+        """Test that embeddings, chunk statistics and retrieval are reported per engine"""
+        result = run_chunking_benchmark(["recursive", "structured"], pdfs=1, texts=3, queries=5, k=4,
+                                        embeddings=DeterministicFakeEmbedding(size=16))
+        recursive, structured = result["chunkers"]["recursive"], result["chunkers"]["structured"]
+        assert recursive["embeddings"] == recursive["chunks"]["chunks"] > structured["embeddings"]
+        assert 0.0 <= structured["retrieval"]["hit_rate_at_4"] <= 1.0
+        assert structured["vs_recursive"]["embeddings"] < 0
+        assert result["meta"]["config"]["documents"] > 3
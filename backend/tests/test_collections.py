@@ -0,0 +1,149 @@
+"""
+Tests for multi-tenant collections: isolation of data, caches and read handles.
+"""
+
+from io import BytesIO
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+import app.api.routes as routes
+import app.services.researcher as researcher
+from app.main import app
+from app.services.collection_names import collection_table, table_collection, validate_collection
+from app.services.fetcher import UrlFetcher
+
+client = TestClient(app)
+
+ANSWER = {"answer": "Stored in LanceDB.", "confidence_score": 0.9, "source_chunk_ids": []}
+
+
+def _chunks(text, source):
+    return researcher.split_text([Document(page_content=text, metadata={"source": source})])
+
+
+def _search(collection, query):
+    state = {"query": query, "try_count": 0, "collection": collection}
+    return researcher.retrieve_for_attempt(state)["documents"]
+
+
+class TestCollectionNames:
+    """Mapping between collection names and LanceDB tables"""
+
+    def test_default_keeps_original_table(self):
+        """Test that existing databases are read as the default collection"""
+        assert collection_table("default") == "research_docs"
+        assert table_collection("research_docs") == "default"
+        assert table_collection(collection_table("team-a")) == "team-a"
+        assert table_collection("something_else") is None
+
+    def test_invalid_names_rejected(self):
+        """Test that names that could escape the database directory are refused"""
+        for name in ["", "../etc", "a/b", "x" * 65, "-leading", "abc\n"]:
+            with pytest.raises(ValueError):
+                validate_collection(name)
+
+
+class TestCollectionIsolation:
+    """Collections are searched, cleared and cached independently"""
+
+    def test_search_sees_only_own_collection(self, db):
+        """Test that retrieval never returns another collection's chunks"""
+        researcher.index_documents(_chunks("Apples grow on trees in orchards.", "fruit.txt"), "fruit")
+        researcher.index_documents(_chunks("Rust has a borrow checker.", "code.txt"), "code")
+        assert {d.metadata["source"] for d in _search("fruit", "apples")} == {"fruit.txt"}
+        assert {d.metadata["source"] for d in _search("code", "apples")} == {"code.txt"}
+
+    def test_clear_drops_only_own_collection(self, db):
+        """Test that a replace-mode clear empties only its own collection"""
+        researcher.index_documents(_chunks("First tenant text.", "a.txt"), "a")
+        researcher.index_documents(_chunks("Second tenant text.", "b.txt"), "b")
+        researcher.clear_database("a")
+        names = {c["name"]: c["rows"] for c in researcher.list_collections()}
+        assert names == {"a": 0, "b": 1}
+        assert _search("a", "tenant") == []
+
+    def test_same_source_upserted_per_collection(self, db):
+        """Test that one source name in two collections is two independent documents"""
+        researcher.index_documents(_chunks("Version one of the doc.", "doc.txt"), "a")
+        stats = researcher.index_documents(_chunks("Version two of the doc.", "doc.txt"), "b")
+        assert stats["deleted"] == 0
+        assert _search("a", "doc")[0].page_content == "Version one of the doc."
+
+    def test_answer_cache_versions_per_collection(self, db):
+        """Test that ingesting into one collection keeps the other's cached answers"""
+        researcher.index_documents(_chunks("Shared text.", "doc.txt"), "a")
+        version = db.corpus_version("b")
+        db.store("question", [1.0], version, ANSWER, collection="b")
+        researcher.index_documents(_chunks("More text for a.", "more.txt"), "a")
+        assert db.lookup("question", [1.0], db.corpus_version("b"), "b") is not None
+        assert db.lookup("question", [1.0], db.corpus_version("a"), "a") is None
+
+    def test_validators_namespaced(self):
+        """Test that a page fetched for one collection is not a 304 for another"""
+        fetcher = UrlFetcher()
+        fetcher._validators["a\0http://x/page"] = {"If-None-Match": "etag"}
+        fetcher._validators["b\0http://x/page"] = {"If-None-Match": "etag"}
+        fetcher.forget(namespace="a")
+        assert list(fetcher._validators) == ["b\0http://x/page"]
+
+
+class TestCollectionReaders:
+    """Warm read handles kept per collection"""
+
+    def test_handles_cached_per_collection(self, db):
+        """Test that each collection keeps its own handle until it changes"""
+        researcher.index_documents(_chunks("Alpha text.", "a.txt"), "a")
+        researcher.index_documents(_chunks("Beta text.", "b.txt"), "b")
+        engine = researcher.ResearchEngine()
+        _, table_a = engine.reader("a")
+        _, table_b = engine.reader("b")
+        assert table_a is not table_b
+        assert engine.reader("a")[1] is table_a
+
+        researcher.index_documents(_chunks("Gamma text.", "b2.txt"), "b")
+        assert engine.reader("a")[1] is table_a
+        assert engine.reader("b")[1] is not table_b
+
+    def test_least_recently_used_evicted(self, db, monkeypatch):
+        """Test that handles beyond the limit are closed, oldest first"""
+        monkeypatch.setattr(researcher, "COLLECTION_CACHE_SIZE", 2)
+        engine = researcher.ResearchEngine()
+        for name in ["a", "b", "a", "c"]:
+            engine.reader(name)
+        assert list(engine._readers) == ["a", "c"]
+        assert engine.stats()["readers"]["evictions"] == 1
+
+    def test_idle_handles_evicted(self, db, monkeypatch):
+        """Test that a handle unused for longer than the idle timeout is closed"""
+        engine = researcher.ResearchEngine()
+        engine.reader("a")
+        monkeypatch.setattr(researcher, "COLLECTION_IDLE_SECONDS", 0)
+        engine.reader("b")
+        assert list(engine._readers) == []
+
+
+class TestCollectionEndpoints:
+    """Collection names at the API"""
+
+    def test_invalid_collection_rejected(self):
+        """Test that a malformed collection name is a validation error"""
+        response = client.post("/api/ingest/text", json={"text": "hello", "collection": "../x"})
+        assert response.status_code == 422
+
+    def test_invalid_form_collection_rejected(self):
+        """Test that the upload endpoints refuse a malformed collection form field"""
+        routes.limiter.reset()
+        for url in ("/api/ingest/file", "/api/jobs/ingest/file"):
+            for name in ("../x", "abc\n"):
+                response = client.post(url, data={"collection": name},
+                                       files={"file": ("doc.pdf", BytesIO(b"%PDF-1.4"), "application/pdf")})
+                assert response.status_code == 400, (url, name)
+                assert "Invalid collection name" in response.json()["detail"]
+
+    def test_list_collections(self, db):
+        """Test that the collections endpoint lists every table with its size"""
+        researcher.index_documents(_chunks("Alpha text.", "a.txt"), "alpha")
+        researcher.index_documents(_chunks("Default text.", "d.txt"))
+        response = client.get("/api/collections")
+        assert response.status_code == 200
+        assert response.json()["collections"] == [{"name": "alpha", "rows": 1}, {"name": "default", "rows": 1}]
@@ -0,0 +1,68 @@
+"""
+Tests for context assembly: merging, deduplication and token budgeting.
+"""
+
+from langchain_core.documents import Document
+from app.services.context_packing import build_context, deduplicate, estimate_tokens, merge_adjacent, pack, Passage
+
+TEXT = " ".join(f"Sentence {i} explains part {i} of the design." for i in range(200))
+
+
+def _chunk(start, length, source="doc.txt", chunk_id=None):
+    return Document(id=chunk_id, page_content=TEXT[start:start + length],
+                    metadata={"source": source, "start_index": start})
+
+
+class TestMergeAdjacent:
+    """Test that overlapping chunks become one passage"""
+
+    def test_overlap_kept_once(self):
+        docs = [_chunk(800, 1000, chunk_id="b"), _chunk(0, 1000, chunk_id="a")]
+        passages = merge_adjacent(docs)
+        assert len(passages) == 1
+        assert passages[0].text == TEXT[0:1800]
+        assert passages[0].rank == 0
+        assert sorted(passages[0].chunk_ids) == ["a", "b"]
+
+    def test_other_sources_and_gaps_stay_separate(self):
+        docs = [_chunk(0, 500), _chunk(2000, 500), _chunk(100, 500, source="other.txt")]
+        assert len(merge_adjacent(docs)) == 3
+
+    def test_contained_chunk_adds_nothing(self):
+        passages = merge_adjacent([_chunk(0, 1000), _chunk(200, 300)])
+        assert passages[0].text == TEXT[0:1000]
+
+
+class TestDeduplicate:
+    """Test near-duplicate removal"""
+
+    def test_near_copy_dropped(self):
+        original = Passage(TEXT[:1000], 0)
+        copy = Passage(TEXT[:1000].replace("design", "design!", 1), 1)
+        other = Passage(TEXT[3000:4000], 2)
+        assert deduplicate([original, copy, other]) == [original, other]
+
+
+class TestPack:
+    """Test the token budget"""
+
+    def test_best_ranked_passages_fit_budget(self):
+        passages = [Passage("a" * 400, 0), Passage("b" * 4000, 1), Passage("c" * 400, 2)]
+        packed = pack(passages, budget=250)
+        assert [p.rank for p in packed] == [0, 2]
+
+    def test_oversized_best_passage_truncated(self):
+        packed = pack([Passage("x" * 10000, 0)], budget=100)
+        assert estimate_tokens(packed[0].text) == 100
+
+
+class TestBuildContext:
+    """Test the full assembly and its reported token counts"""
+
+    def test_overlapping_retrieval_shrinks(self):
+        docs = [_chunk(start, 1000) for start in (0, 800, 1600, 2400)] + [_chunk(0, 1000)]
+        context, stats = build_context(docs, budget=10000)
+        assert context == TEXT[0:3400]
+        assert stats["tokens_after"] < stats["tokens_before"]
+        assert stats["merged"] == 4
+        assert stats["passages"] == 1
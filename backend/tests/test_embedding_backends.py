@@ -0,0 +1,105 @@
+"""
+Tests for the pluggable embedding backends and their benchmark.
+"""
+
+import importlib.util
+import numpy as np
+import pytest
+from app.services.embedding_backends import (
+    SentenceTransformerEmbeddings, backend_key, length_buckets, load_backend_key, load_embeddings,
+)
+from benchmarks.embeddings import run_embedding_benchmark
+
+WORDS = "the index table vector manifest fragment is stored in segment where what fact a of".split()
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """A small random BERT saved locally, so backends load without the network."""
+    from transformers import BertConfig, BertModel, BertTokenizer
+    path = tmp_path_factory.mktemp("tiny-bert")
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS + [chr(c) for c in range(97, 123)]
+    (path / "vocab.txt").write_text("\n".join(vocab))
+    BertTokenizer(str(path / "vocab.txt")).save_pretrained(str(path))
+    config = BertConfig(vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                        intermediate_size=64, max_position_embeddings=128)
+    BertModel(config).save_pretrained(str(path))
+    return str(path)
+
+
+def _cosine(a, b):
+    a, b = np.asarray(a), np.asarray(b)
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+class TestLengthBuckets:
+    """Batching texts of similar length together"""
+
+    def test_sorted_and_capped_by_count(self):
+        """Test that batches hold similar lengths, longest first, at most batch_size each"""
+        assert length_buckets([5, 50, 6, 48, 7], batch_size=2, batch_tokens=10_000) == [[1, 3], [4, 2], [0]]
+
+    def test_padded_token_budget(self):
+        """Test that long texts get smaller batches than short ones under the same budget"""
+        batches = length_buckets([100] * 4 + [10] * 20, batch_size=64, batch_tokens=200)
+        assert [len(b) for b in batches] == [2, 2, 20]
+
+    def test_order_restored(self):
+        """Test that vectors come back in input order whatever the batching"""
+        sizes = []
+
+        class Client:
+            max_seq_length = 128
+
+            def encode(self, texts, batch_size, **kwargs):
+                sizes.append(batch_size)
+                return np.array([[float(len(t))] for t in texts])
+
+        embeddings = SentenceTransformerEmbeddings(Client(), batch_size=2)
+        texts = ["a" * n for n in (3, 40, 8, 20, 1)]
+        assert embeddings.embed_documents(texts) == [[3.0], [40.0], [8.0], [20.0], [1.0]]
+        assert sizes == [2, 2, 1]
+
+
+class TestBackends:
+    """Loading one model on each runtime"""
+
+    def test_int8_close_to_full_precision(self, tiny_model):
+        """Test that the quantized backend replaces Linear layers and keeps vectors close"""
+        full = load_embeddings(tiny_model, "torch")
+        quantized = load_embeddings(tiny_model, "torch-int8")
+        assert any(type(m).__module__.startswith("torch.ao.nn.quantized") for m in quantized.client.modules())
+        text = "the index is stored in a segment"
+        assert _cosine(full.embed_query(text), quantized.embed_query(text)) > 0.99
+        assert full.embed_queries([text, "vector"])[0] == pytest.approx(full.embed_query(text), abs=1e-5)
+
+    def test_unknown_backend_rejected(self):
+        """Test that a typo in EMBEDDING_BACKEND fails loudly"""
+        with pytest.raises(ValueError):
+            load_embeddings("model", "tensorrt")
+
+    @pytest.mark.skipif(importlib.util.find_spec("onnxruntime") is not None, reason="onnxruntime installed")
+    def test_onnx_needs_optional_dependency(self):
+        """Test that the onnx backend explains what to install"""
+        with pytest.raises(ImportError, match="optimum"):
+            load_embeddings("model", "onnx")
+
+    def test_keys(self, tiny_model):
+        """Test that the default backend keeps the bare model name as its key"""
+        assert backend_key("all-MiniLM-L6-v2") == "all-MiniLM-L6-v2"
+        assert backend_key("all-MiniLM-L6-v2", "onnx") == "all-MiniLM-L6-v2@onnx"
+        assert load_backend_key(backend_key(tiny_model, "torch-int8")).backend == "torch-int8"
+
+
+class TestEmbeddingBenchmark:
+    """Throughput and quality report per backend"""
+
+    def test_report_per_backend(self, tiny_model):
+        """Test that each backend is measured against the first, and unavailable ones report why"""
+        result = run_embedding_benchmark(["torch", "torch-int8", "missing"], docs=40, queries=10, k=5,
+                                         model=tiny_model)
+        backends = result["backends"]
+        assert backends["torch"]["quality"]["recall_at_5"] == 1.0
+        assert backends["torch-int8"]["docs_per_second"] > 0
+        assert backends["torch-int8"]["quality"]["doc_cosine_mean"] > 0.99
+        assert "ValueError" in backends["missing"]["error"]
@@ -0,0 +1,52 @@
+"""
+Tests for the persistent embedding cache.
+"""
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from app.services.embedding_cache import EmbeddingCache, CachedEmbeddings
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+class TestEmbeddingCache:
+    """Test cache hits, persistence and eviction"""
+
+    def test_cached_texts_skip_the_model(self, tmp_path):
+        """Test that repeated and reflowed texts are served from the cache"""
+        model = CountingEmbedding(size=8)
+        cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+        embeddings = CachedEmbeddings("fake", lambda: model, cache)
+
+        first = embeddings.embed_documents(["legal footer", "page one"])
+        second = embeddings.embed_documents(["legal   footer", "page two"])
+        assert model.embedded == 3
+        assert second[0] == pytest.approx(first[0], rel=1e-6)
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 3
+
+    def test_cache_survives_reopen(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite")
+        CachedEmbeddings("fake", lambda: CountingEmbedding(size=8), EmbeddingCache(path)).embed_documents(["text"])
+
+        def no_model():
+            raise AssertionError("model should not be loaded")
+        vectors = CachedEmbeddings("fake", no_model, EmbeddingCache(path)).embed_documents(["text"])
+        assert len(vectors[0]) == 8
+
+    def test_lru_eviction(self, tmp_path):
+        """Test that the least recently used entries are evicted first"""
+        cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_entries=10)
+        cache.put_many("fake", {f"h{i}": [float(i)] for i in range(10)})
+        cache.get_many("fake", ["h0"])
+        cache.put_many("fake", {"h10": [10.0]})
+        assert cache.stats()["entries"] <= 10
+        assert cache.stats()["evictions"] > 0
+        assert "h0" in cache.get_many("fake", ["h0", "h1"])
+        assert "h1" not in cache.get_many("fake", ["h1"])
@@ -0,0 +1,44 @@
+"""
+Tests for the process-wide embedding model registry.
+"""
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from app.services.embeddings import EmbeddingRegistry
+
+
+def _counting_loader(calls):
+    def loader(model_name):
+        calls.append(model_name)
+        return DeterministicFakeEmbedding(size=8)
+    return loader
+
+
+class TestEmbeddingRegistry:
+    """Test model loading and reuse"""
+
+    def test_model_loaded_once(self):
+        """Test that repeated lookups share one instance"""
+        calls = []
+        registry = EmbeddingRegistry(loader=_counting_loader(calls))
+        first = registry.get("model-a")
+        second = registry.get("model-a")
+        assert first is second
+        assert calls == ["model-a"]
+
+    def test_warm_and_stats(self):
+        """Test that warmed models report load statistics"""
+        registry = EmbeddingRegistry(loader=_counting_loader([]))
+        registry.warm(["model-a", "model-b"])
+        stats = registry.stats()
+        assert set(stats["models"]) == {"model-a", "model-b"}
+        assert stats["models"]["model-a"]["load_seconds"] >= 0
+        assert registry.is_loaded("model-b")
+
+    def test_clear_forces_reload(self):
+        """Test that clearing a model reloads it on next use"""
+        calls = []
+        registry = EmbeddingRegistry(loader=_counting_loader(calls))
+        registry.get("model-a")
+        registry.clear("model-a")
+        registry.get("model-a")
+        assert calls == ["model-a", "model-a"]
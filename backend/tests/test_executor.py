@@ -0,0 +1,38 @@
+"""
+Tests for the bounded executor that keeps blocking work off the event loop.
+"""
+
+import asyncio
+import threading
+import pytest
+from app.services.executor import BlockingExecutor, ExecutorSaturated
+
+
+class TestBlockingExecutor:
+    """Test offloading and saturation accounting"""
+
+    async def test_runs_off_event_loop(self):
+        """Test that work runs on a pool thread and returns its result"""
+        executor = BlockingExecutor(max_workers=2, max_queue=4)
+        loop_thread = threading.get_ident()
+        result = await executor.run(lambda x: (x * 2, threading.get_ident()), 21)
+        assert result[0] == 42
+        assert result[1] != loop_thread
+        stats = executor.stats()
+        assert stats["completed"] == 1
+        assert stats["active"] == 0 and stats["queued"] == 0
+
+    async def test_rejects_when_queue_full(self):
+        """Test that tasks beyond the queue bound are rejected"""
+        executor = BlockingExecutor(max_workers=1, max_queue=1)
+        release = threading.Event()
+        running = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        waiting = asyncio.ensure_future(executor.run(lambda: None))
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(lambda: None)
+        assert executor.stats()["saturation"] == 1.0
+        release.set()
+        await asyncio.gather(running, waiting)
+        assert executor.stats()["rejected"] == 1
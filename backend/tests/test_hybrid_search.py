@@ -0,0 +1,64 @@
+"""
+Tests for hybrid BM25 + vector retrieval.
+"""
+
+import pytest
+from langchain_core.documents import Document
+import app.services.researcher as researcher
+from app.services.hybrid_search import hybrid_search, reciprocal_rank_fusion
+from app.services.vector_index import _fts_index_name
+
+
+@pytest.fixture
+def corpus(empty_db):
+    """Indexes notes where one chunk holds a rare identifier"""
+    docs = [
+        Document(page_content=f"Note {i} covers routine maintenance of pump {i}.", metadata={"source": f"note{i}.txt"})
+        for i in range(40)
+    ]
+    docs.append(Document(page_content="Fault code XK-4471 means the relay overheated.", metadata={"source": "faults.txt"}))
+    researcher.index_documents(researcher.split_text(docs))
+    return empty_db
+
+
+class TestReciprocalRankFusion:
+    """Test the fusion arithmetic"""
+
+    def test_items_in_both_lists_win(self):
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]], k=60)
+        assert fused[0][0] == "c"
+        assert fused[0][1] == pytest.approx(1 / 63 + 1 / 61)
+        assert [item for item, _ in fused][:2] == ["c", "a"]
+        assert len(fused) == 4
+
+
+class TestHybridSearch:
+    """Test retrieval over a real LanceDB table"""
+
+    def test_index_documents_builds_fts_index(self, corpus):
+        _, table = researcher.research_engine.reader()
+        assert _fts_index_name(table) is not None
+
+    def test_exact_identifier_is_retrieved(self, corpus):
+        """Test that a rare term found by BM25 makes it into the results"""
+        query = "What does XK-4471 mean?"
+        _, table = researcher.research_engine.reader()
+        rows, timings = hybrid_search(table, query, corpus.embed_query(query), k=4)
+        assert any("XK-4471" in text for text in rows["text"].to_pylist())
+        assert len(rows) == 4
+        assert timings["vector_ms"] >= 0 and timings["fts_ms"] >= 0
+
+    def test_falls_back_to_vectors_when_fts_fails(self, corpus, monkeypatch):
+        def broken(*args):
+            raise RuntimeError("index corrupted")
+        monkeypatch.setattr("app.services.hybrid_search.search_text", broken)
+        _, table = researcher.research_engine.reader()
+        rows, timings = hybrid_search(table, "pump", corpus.embed_query("pump"), k=4)
+        assert len(rows) == 4
+        assert timings["fts_ms"] is None
+
+    def test_retrieval_reports_timings(self, corpus):
+        state = {"query": "XK-4471", "try_count": 0}
+        result = researcher.retrieve_for_attempt(state)
+        assert any("XK-4471" in d.page_content for d in result["documents"])
+        assert set(result["retrieval_cache"]["timings"]) == {"vector_ms", "fts_ms", "fusion_ms"}
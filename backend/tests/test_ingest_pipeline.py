@@ -0,0 +1,123 @@
+"""
+Tests for the streaming PDF ingestion pipeline.
+"""
+
+import os
+import threading
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import app.services.researcher as researcher
+from app.services import ingest_pipeline
+from tests.conftest import make_pdf
+
+
+class TestIngestPdf:
+    """Test page streaming, batching and upserts"""
+
+    def test_pages_parsed_in_order(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(ingest_pipeline, "PAGES_PER_TASK", 2)
+        monkeypatch.setattr(ingest_pipeline, "PARSE_WORKERS", 2)
+        path = make_pdf(tmp_path / "doc.pdf", pages=7)
+        pages = list(ingest_pipeline.iter_pdf_pages(path, "doc.pdf"))
+        assert [p.metadata["page"] for p in pages] == list(range(7))
+        assert all(f"Page {i} line 0" in p.page_content for i, p in enumerate(pages))
+
+    def test_streamed_in_batches_and_reingest_is_free(self, tmp_path, empty_db):
+        path = make_pdf(tmp_path / "doc.pdf", pages=6)
+        stats = ingest_pipeline.ingest_pdf(path, "doc.pdf", batch_size=4)
+        assert stats["pages"] == 6
+        assert stats["added"] == stats["chunks"] > 4
+        assert stats["batches"] == -(-stats["added"] // 4)
+
+        table = researcher.open_write_table()
+        starts = sorted(m["start_index"] for m in researcher.stored_chunks(table, "doc.pdf"))
+        assert len(set(starts)) == len(starts)
+
+        again = ingest_pipeline.ingest_pdf(path, "doc.pdf", batch_size=4)
+        assert again["added"] == 0 and again["skipped"] == stats["chunks"]
+
+    def test_stage_failure_is_raised(self, tmp_path, empty_db, monkeypatch):
+        """Test that an embedding error stops the pipeline instead of hanging"""
+        class Broken(DeterministicFakeEmbedding):
+            def embed_documents(self, texts):
+                raise RuntimeError("model crashed")
+        monkeypatch.setattr(researcher, "_get_embeddings", lambda: Broken(size=16))
+        path = make_pdf(tmp_path / "doc.pdf", pages=3)
+        with pytest.raises(RuntimeError, match="model crashed"):
+            ingest_pipeline.ingest_pdf(path, "doc.pdf", batch_size=2)
+
+    def test_readers_never_see_a_partial_document(self, tmp_path, db):
+        """Test that a reader opened mid-ingest sees the collection as it was, and the corpus changes once"""
+        before = ingest_pipeline.ingest_pdf(make_pdf(tmp_path / "a.pdf", pages=1), "a.pdf")["chunks"]
+        version = researcher.answer_cache.corpus_version()
+        seen = []
+
+        def on_progress(stage, stats):
+            if stage == "embedding":
+                _, table = researcher.ResearchEngine().reader()
+                seen.append((table.count_rows(), researcher.answer_cache.corpus_version()))
+        stats = ingest_pipeline.ingest_pdf(make_pdf(tmp_path / "b.pdf", pages=6), "b.pdf", batch_size=4,
+                                           on_progress=on_progress)
+        assert stats["batches"] > 1
+        assert seen == [(before, version)] * stats["batches"]
+        assert researcher.answer_cache.corpus_version() == version + 1
+        _, table = researcher.ResearchEngine().reader()
+        assert table.count_rows() == before + stats["added"]
+        assert researcher.list_collections() == [{"name": "default", "rows": before + stats["added"]}]
+
+    def test_other_writers_not_held_up(self, tmp_path, empty_db):
+        """Test that the collection takes other writes while a document is parsed and embedded"""
+        from langchain_core.documents import Document
+        written = []
+
+        def on_progress(stage, stats):
+            if stage == "embedding" and not written:
+                writer = threading.Thread(target=lambda: written.append(researcher.index_documents(
+                    [Document(page_content="Notes.", metadata={"source": "notes.txt"})])))
+                writer.start()
+                writer.join(timeout=10)
+                assert written, "index_documents waited for the streamed ingest"
+        stats = ingest_pipeline.ingest_pdf(make_pdf(tmp_path / "doc.pdf", pages=4), "doc.pdf", batch_size=4,
+                                           on_progress=on_progress)
+        assert researcher.open_write_table().count_rows() == stats["added"] + 1
+
+    def test_concurrent_ingests_of_one_source(self, tmp_path, empty_db):
+        """Test that two ingests of the same document at once store each chunk once"""
+        path = make_pdf(tmp_path / "doc.pdf", pages=4)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(ingest_pipeline.ingest_pdf(path, "doc.pdf",
+                                                                                             batch_size=4)))
+                   for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(r["added"] for r in results) == [0, results[0]["chunks"]]
+        assert researcher.open_write_table().count_rows() == results[0]["chunks"]
+
+    def test_interrupted_ingest_resumes_from_stage(self, tmp_path, empty_db, monkeypatch):
+        """Test that a re-run embeds only the chunks an interrupted run did not stage"""
+        embedded = []
+
+        class Counting(DeterministicFakeEmbedding):
+            def embed_documents(self, texts):
+                embedded.extend(texts)
+                return super().embed_documents(texts)
+        monkeypatch.setattr(researcher, "_get_embeddings", lambda: Counting(size=16))
+        path = make_pdf(tmp_path / "doc.pdf", pages=6)
+
+        def interrupt(stage, stats):
+            if stats["batches"] == 2:
+                raise KeyboardInterrupt
+        with pytest.raises(KeyboardInterrupt):
+            ingest_pipeline.ingest_pdf(path, "doc.pdf", batch_size=4, on_progress=interrupt)
+        assert researcher.open_write_table() is None
+        # Two batches were staged; the embed stage may have run ahead of them
+        staged = 2 * 4
+        assert len(embedded) >= staged
+
+        embedded.clear()
+        stats = ingest_pipeline.ingest_pdf(path, "doc.pdf", batch_size=4)
+        assert stats["resumed"] == staged and len(embedded) == stats["chunks"] - staged
+        assert researcher.open_write_table().count_rows() == stats["added"] == stats["chunks"]
+        assert not [e for e in os.listdir(researcher.DB_URI) if e.startswith("ingest_staging__")]
@@ -0,0 +1,213 @@
+"""
+Tests for the persistent background ingestion job queue.
+"""
+
+import functools
+import os
+import time
+from concurrent.futures import CancelledError
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import app.services.researcher as researcher
+from app.main import app
+from app.services import ingest_pipeline, jobs
+from app.services.jobs import JobQueue, JobWorkers
+from tests.conftest import make_pdf
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"))
+    monkeypatch.setattr(jobs, "job_queue", queue)
+    monkeypatch.setattr("app.api.routes.job_queue", queue)
+    return queue
+
+
+def wait_for(queue, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+class TestJobQueue:
+    """Queue records and restart behaviour"""
+
+    def test_jobs_persist_across_instances(self, tmp_path):
+        """A new queue on the same file sees earlier jobs"""
+        path = str(tmp_path / "jobs.sqlite")
+        job_id = JobQueue(path).submit("ingest_source", {"source": "a.pdf"})
+        job = JobQueue(path).get(job_id)
+        assert job["status"] == "queued"
+        assert job["payload"] == {"source": "a.pdf"}
+
+    def test_claim_is_fifo_and_exclusive(self, queue):
+        """Jobs are claimed oldest first, and only once"""
+        first = queue.submit("k", {})
+        second = queue.submit("k", {})
+        assert queue.claim_next()["id"] == first
+        assert queue.claim_next()["id"] == second
+        assert queue.claim_next() is None
+
+    def test_interrupted_jobs_are_requeued(self, queue):
+        """Running jobs from a dead process go back to the queue, keeping their progress"""
+        job_id = queue.submit("k", {})
+        queue.claim_next()
+        queue.update(job_id, "embedding", {"added": 64})
+        assert queue.requeue_interrupted() == 1
+        job = queue.claim_next()
+        assert job["id"] == job_id
+        assert job["progress"] == {"added": 64}
+        assert job["attempts"] == 2
+
+    def test_job_interrupted_too_often_fails(self, tmp_path, queue):
+        """A job that keeps being interrupted is failed at startup and its upload removed"""
+        path = tmp_path / "upload.pdf"
+        path.write_bytes(b"%PDF-1.4")
+        job_id = queue.submit("ingest_file", {"path": str(path), "filename": "doc.pdf"})
+        workers = JobWorkers(queue, {}, workers=0, max_attempts=2)
+        queue.claim_next()
+        workers.start()
+        assert queue.get(job_id)["status"] == "queued"
+        queue.claim_next()
+        workers.stop()
+        workers.start()
+        job = queue.get(job_id)
+        assert job["status"] == "failed"
+        assert "after 2 attempts" in job["error"]
+        assert not path.exists()
+
+    def test_handler_errors_are_recorded(self, queue):
+        """A failing handler marks the job failed with its error"""
+        def boom(payload, progress, report):
+            raise RuntimeError("model crashed")
+
+        workers = JobWorkers(queue, {"k": boom})
+        job_id = queue.submit("k", {})
+        workers.run_job(queue.claim_next())
+        job = queue.get(job_id)
+        assert job["status"] == "failed"
+        assert "model crashed" in job["error"]
+
+
+class TestIngestJobs:
+    """Ingestion through the job workers"""
+
+    def test_pdf_job_reports_progress(self, tmp_path, queue, empty_db, monkeypatch):
+        """A PDF job records each batch and finishes with the ingest stats"""
+        # Tiny embed batches so several progress updates happen
+        monkeypatch.setattr(ingest_pipeline, "ingest_pdf", functools.partial(ingest_pipeline.ingest_pdf, batch_size=4))
+        path = make_pdf(tmp_path / "doc.pdf", pages=4)
+        stages = []
+        workers = JobWorkers(queue, jobs.JOB_HANDLERS)
+        original_update = queue.update
+        monkeypatch.setattr(queue, "update", lambda i, s, p: (stages.append((s, p)), original_update(i, s, p)))
+
+        job_id = queue.submit("ingest_source", {"source": path, "mode": "upsert"})
+        workers.run_job(queue.claim_next())
+
+        job = queue.get(job_id)
+        assert job["status"] == "succeeded", job["error"]
+        assert job["stage"] == "done"
+        assert job["result"]["added"] == job["result"]["chunks"] > 0
+        embedded = [p["added"] for s, p in stages if s == "embedding"]
+        assert len(embedded) > 1 and embedded == sorted(embedded)
+
+    def test_resumed_job_skips_committed_batches(self, tmp_path, queue, empty_db):
+        """Running an interrupted job again only adds what was not yet written"""
+        path = make_pdf(tmp_path / "doc.pdf", pages=3)
+        workers = JobWorkers(queue, jobs.JOB_HANDLERS)
+        first = queue.submit("ingest_source", {"source": path, "mode": "upsert"})
+        workers.run_job(queue.claim_next())
+        total = queue.get(first)["result"]["chunks"]
+
+        # Same source again, as after a restart: everything is already stored
+        second = queue.submit("ingest_source", {"source": path, "mode": "upsert"})
+        workers.run_job(queue.claim_next())
+        result = queue.get(second)["result"]
+        assert result["added"] == 0
+        assert result["skipped"] == total
+
+    def test_interrupted_file_job_resumes_from_upload(self, tmp_path, queue, empty_db, monkeypatch):
+        """A file job cut short by shutdown keeps its upload, and completes after a restart"""
+        path = make_pdf(tmp_path / "upload.pdf", pages=2)
+        job_id = queue.submit("ingest_file", {"path": path, "filename": "doc.pdf", "mode": "upsert"})
+        workers = JobWorkers(queue, jobs.JOB_HANDLERS)
+
+        def interrupted(*args, **kwargs):
+            # What a shutdown looks like from inside the job: the parse-pool future is cancelled
+            workers._stopping.set()
+            raise CancelledError()
+        monkeypatch.setattr(ingest_pipeline, "ingest_pdf", interrupted)
+        workers.run_job(queue.claim_next())
+        assert queue.get(job_id)["status"] == "running"
+        assert os.path.exists(path)
+
+        monkeypatch.undo()
+        monkeypatch.setattr(researcher, "DB_URI", str(tmp_path / "lancedb"))
+        monkeypatch.setattr(researcher, "_get_embeddings", lambda: DeterministicFakeEmbedding(size=16))
+        restarted = JobWorkers(queue, jobs.JOB_HANDLERS, workers=1)
+        restarted.start()
+        threads = list(restarted._threads)
+        try:
+            job = wait_for(queue, job_id)
+        finally:
+            restarted.stop()
+        # The upload is removed just after the job is marked done
+        for thread in threads:
+            thread.join(timeout=10)
+        assert job["status"] == "succeeded", job["error"]
+        assert job["result"]["added"] > 0
+        assert not os.path.exists(path)
+
+    def test_failed_file_job_removes_upload(self, tmp_path, queue):
+        """An upload is deleted once its job has failed for good"""
+        path = tmp_path / "broken.pdf"
+        path.write_bytes(b"not a pdf")
+        job_id = queue.submit("ingest_file", {"path": str(path), "filename": "broken.pdf", "mode": "upsert"})
+        JobWorkers(queue, jobs.JOB_HANDLERS).run_job(queue.claim_next())
+        assert queue.get(job_id)["status"] == "failed"
+        assert not path.exists()
+
+    def test_replace_clears_only_once(self, queue, monkeypatch):
+        """A resumed replace job does not wipe the chunks it already wrote"""
+        cleared = []
+        monkeypatch.setattr(researcher, "clear_database", lambda collection: cleared.append(collection))
+        report = lambda stage, progress: None
+        progress = jobs._clear_once({"mode": "replace"}, {}, report)
+        assert progress["cleared"] is True
+        jobs._clear_once({"mode": "replace"}, progress, report)
+        assert len(cleared) == 1
+
+    def test_job_endpoints(self, tmp_path, queue, empty_db):
+        """Submitting returns 202 with an id that can be polled"""
+        path = make_pdf(tmp_path / "doc.pdf", pages=2)
+        response = client.post("/api/jobs/ingest", json={"source": path})
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        workers = JobWorkers(queue, jobs.JOB_HANDLERS, workers=1)
+        workers.start()
+        try:
+            wait_for(queue, job_id)
+        finally:
+            workers.stop()
+
+        data = client.get(f"/api/jobs/{job_id}").json()
+        assert data["status"] == "succeeded"
+        assert data["progress"]["pages"] == 2
+        assert "chunks_per_second" in data["throughput"]
+        assert client.get("/api/jobs/missing").status_code == 404
+
+    def test_job_endpoint_validation(self, queue):
+        """Invalid sources are rejected before anything is queued"""
+        response = client.post("/api/jobs/ingest", json={"source": "not-a-url"})
+        assert response.status_code == 400
+        assert queue.counts() == {}
+
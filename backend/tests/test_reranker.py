@@ -0,0 +1,79 @@
+"""
+Tests for the cross-encoder rerank stage.
+A keyword-counting stand-in replaces the cross-encoder model.
+"""
+
+import time
+import pytest
+from langchain_core.documents import Document
+import app.services.researcher as researcher
+from app.services import reranker
+
+
+class KeywordCrossEncoder:
+    """Scores a pair by how often the query's last word occurs in the passage"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = 0
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.batches += 1
+        time.sleep(self.delay)
+        return [passage.lower().count(query.lower().split()[-1]) for query, passage in pairs]
+
+
+def _docs(texts):
+    return [Document(page_content=t, metadata={}) for t in texts]
+
+
+class TestRerank:
+    """Test ordering and the latency budget"""
+
+    def test_orders_by_score(self):
+        docs = _docs(["no match", "pumps pumps", "one pump"])
+        reranked, stats = reranker.rerank("which pump", docs, model=KeywordCrossEncoder())
+        assert [d.page_content for d in reranked] == ["pumps pumps", "one pump", "no match"]
+        assert stats["reranked"] == 3
+
+    def test_budget_stops_scoring(self):
+        """Test that unscored candidates keep their order after the scored ones"""
+        model = KeywordCrossEncoder(delay=0.05)
+        docs = _docs(["a", "b pump", "c", "d pump"])
+        reranked, stats = reranker.rerank("pump", docs, model=model, batch_size=2, budget_ms=10)
+        assert model.batches == 1
+        assert stats["reranked"] == 2
+        assert [d.page_content for d in reranked] == ["b pump", "a", "c", "d pump"]
+
+
+@pytest.fixture
+def corpus(empty_db, monkeypatch):
+    monkeypatch.setattr(researcher, "RERANK_ENABLED", True)
+    monkeypatch.setattr(reranker.reranker_registry, "get", lambda name: KeywordCrossEncoder())
+    docs = [Document(page_content=f"Note {i} about valves.", metadata={"source": f"n{i}"}) for i in range(30)]
+    docs.append(Document(page_content="The turbine turbine manual.", metadata={"source": "manual"}))
+    researcher.index_documents(researcher.split_text(docs))
+
+
+class TestRerankNode:
+    """Test the graph's rerank node"""
+
+    def test_overfetches_and_reorders_once(self, corpus):
+        state = {"query": "where is the turbine", "try_count": 0, "api_key": "k"}
+        state.update(researcher.node_retrieve(state))
+        assert len(state["retrieval_cache"]["candidates"]) == reranker.RERANK_CANDIDATES
+
+        state.update(researcher.node_rerank(state))
+        assert state["documents"][0].page_content == "The turbine turbine manual."
+        assert len(state["documents"]) == researcher.RETRY_STRATEGIES[0]["k"]
+        assert "rerank_ms" in state["retrieval_cache"]["timings"]
+
+        # A retry reuses the reranked order without scoring again
+        state["try_count"] = 1
+        state.update(researcher.node_retrieve(state))
+        assert researcher.node_rerank(state) == {}
+        assert state["documents"][0].page_content == "The turbine turbine manual."
+
+    def test_graph_has_rerank_node_only_when_enabled(self):
+        assert "rerank" in researcher.build_graph(rerank_enabled=True).nodes
+        assert "rerank" not in researcher.build_graph(rerank_enabled=False).nodes
@@ -0,0 +1,157 @@
+"""
+Tests for the research graph's retrieval and retry logic.
+Uses a temporary LanceDB directory and deterministic fake embeddings.
+"""
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import app.services.researcher as researcher
+from app.services.researcher import Answer
+
+
+@pytest.fixture
+def corpus(empty_db):
+    """Indexes a small corpus into a throwaway database"""
+    text = " ".join(f"Sentence number {i} about topic {i % 7}." for i in range(400))
+    chunks = researcher.split_text([Document(page_content=text, metadata={"source": "doc.txt"})])
+    researcher.index_documents(chunks)
+    return chunks
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """Fake embeddings that count how many texts were embedded"""
+    embedded: int = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def empty_db(empty_db, monkeypatch):
+    """The shared empty_db, counting the texts embedded"""
+    embeddings = CountingEmbedding(size=16)
+    monkeypatch.setattr(researcher, "_get_embeddings", lambda: embeddings)
+    return embeddings
+
+
+def _doc_chunks(text, source):
+    return researcher.split_text([Document(page_content=text, metadata={"source": source})])
+
+
+def _answer(text, confidence=0.5):
+    return Answer(answer=text, confidence_score=confidence, source_chunk_ids=[])
+
+
+class TestRetrieveForAttempt:
+    """Test that retries change the context without searching again"""
+
+    def test_retries_widen_context(self, corpus, monkeypatch):
+        """Test that each attempt gets more context than the previous one"""
+        state = {"query": "topic 3", "try_count": 0}
+        first = researcher.retrieve_for_attempt(state)
+        assert len(first["documents"]) == 4
+
+        # Later attempts must not embed or search again
+        def fail(*args, **kwargs):
+            raise AssertionError("retry re-ran the search")
+        monkeypatch.setattr(researcher, "_get_embeddings", fail)
+
+        state.update(first, try_count=1)
+        second = researcher.retrieve_for_attempt(state)
+        assert len(second["documents"]) == 8
+        assert second["documents"][:4] == first["documents"]
+
+    def test_neighbours_added_on_last_attempt(self, corpus):
+        """Test that the final attempt adds adjacent chunks from the source"""
+        state = {"query": "topic 3", "try_count": 0}
+        state.update(researcher.retrieve_for_attempt(state), try_count=2)
+        third = researcher.retrieve_for_attempt(state)
+        assert len(third["documents"]) > 8
+        keys = [(d.metadata["source"], d.metadata["start_index"]) for d in third["documents"]]
+        assert len(keys) == len(set(keys))
+
+
+class TestIncrementalIndexing:
+    """Test hash-based upserts into the research table"""
+
+    def test_reingest_unchanged_source_embeds_nothing(self, empty_db):
+        text = " ".join(f"Paragraph {i} of the report." for i in range(300))
+        first = researcher.index_documents(_doc_chunks(text, "report.pdf"))
+        assert first["added"] == first["chunks"] > 1
+        embedded = empty_db.embedded
+
+        second = researcher.index_documents(_doc_chunks(text, "report.pdf"))
+        assert second["sources"] == {"report.pdf": {"chunks": first["chunks"], "added": 0, "skipped": first["chunks"], "deleted": 0}}
+        assert empty_db.embedded == embedded
+
+    def test_reingest_replaces_only_that_source(self, empty_db):
+        """Test that changed chunks are swapped and other sources are kept"""
+        old = " ".join(f"Old paragraph {i}." for i in range(200))
+        researcher.index_documents(_doc_chunks(old, "a.pdf"))
+        other = researcher.index_documents(_doc_chunks("Unrelated notes on b.", "b.pdf"))
+
+        new = " ".join(f"New paragraph {i}." for i in range(100))
+        result = researcher.index_documents(_doc_chunks(new, "a.pdf"))
+        assert result["deleted"] > 0 and result["added"] > 0
+
+        table = researcher.open_write_table()
+        assert len(researcher.stored_chunks(table, "a.pdf")) == result["chunks"]
+        assert len(researcher.stored_chunks(table, "b.pdf")) == other["chunks"]
+
+    def test_duplicate_chunks_stored_once(self, empty_db):
+        chunks = _doc_chunks("Same footer text.", "c.pdf") * 3
+        assert researcher.index_documents(chunks)["added"] == 1
+
+
+class TestNodeGrade:
+    """Test the grading decisions between attempts"""
+
+    def test_confident_answer_ends(self):
+        assert researcher.node_grade({"answer": _answer("a", 0.9), "try_count": 1}) == "end"
+
+    def test_low_confidence_retries(self):
+        assert researcher.node_grade({"answer": _answer("a"), "try_count": 1, "previous_answer": None}) == "retry"
+
+    def test_repeated_answer_stops_early(self):
+        """Test that two identical answers in a row end the loop"""
+        state = {"answer": _answer("The answer."), "try_count": 2, "previous_answer": "the  answer."}
+        assert researcher.node_grade(state) == "end"
+
+    def test_max_tries_ends(self):
+        state = {"answer": _answer("b"), "try_count": researcher.MAX_TRIES, "previous_answer": "a"}
+        assert researcher.node_grade(state) == "end"
+
+
+class TestResearchEngine:
+    """Test that per-request setup is reused"""
+
+    def test_graph_compiled_once(self):
+        engine = researcher.ResearchEngine()
+        assert engine.graph() is engine.graph()
+        assert engine.stats()["setup"]["graph"]["count"] == 2
+
+    def test_llm_clients_pooled_per_key(self, monkeypatch):
+        """Test that clients are built once per API key and the oldest key is evicted"""
+        built = []
+        pool = researcher.LLMClientPool(lambda key: built.append(key) or object(), max_clients=2)
+        first = pool.get("key-a")
+        assert pool.get("key-a") is first
+        pool.get("key-b")
+        pool.get("key-c")
+        pool.get("key-a")
+        assert built == ["key-a", "key-b", "key-c", "key-a"]
+        assert pool.stats()["evictions"] == 2
+
+    def test_reader_reopened_after_write(self, corpus):
+        """Test that the table handle is kept until the corpus changes"""
+        engine = researcher.ResearchEngine()
+        store, table = engine.reader()
+        assert engine.reader()[1] is table
+        count = table.count_rows()
+
+        researcher.index_documents(_doc_chunks("A brand new paragraph.", "new.txt"))
+        _, reopened = engine.reader()
+        assert reopened is not table
+        assert reopened.count_rows() == count + 1
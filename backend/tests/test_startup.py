@@ -0,0 +1,81 @@
+"""
+Tests for background warm-up, the readiness probe and lazy imports.
+"""
+
+import subprocess
+import sys
+from fastapi.testclient import TestClient
+import app.main as main
+import app.services.researcher as researcher
+from app.services.startup import StartupProfile, warm
+
+client = TestClient(main.app)
+
+
+class TestStartupProfile:
+    """Readiness tracking of the warm-up steps"""
+
+    def test_ready_once_every_step_done(self):
+        """Test that readiness needs every step, and skipped ones count as done"""
+        profile = StartupProfile(steps=("embeddings", "vector_store"))
+        assert not profile.ready
+        profile.mark_skipped("embeddings")
+        assert not profile.ready
+        profile.mark_ready("vector_store")
+        report = profile.report()
+        assert report["ready"] and report["skipped"] == ["embeddings"]
+        assert report["ready_after_ms"] is not None
+
+    def test_failed_step_keeps_not_ready(self, monkeypatch):
+        """Test that a failed warm-up step is reported and blocks readiness"""
+        monkeypatch.setattr(researcher, "warm_up", lambda: (_ for _ in ()).throw(OSError("no network")))
+        monkeypatch.setattr(researcher.research_engine, "reader", lambda: None)
+        monkeypatch.setattr(researcher.research_engine, "graph", lambda: None)
+        profile = StartupProfile()
+        warm(profile=profile, retries=2, delay=0)
+        report = profile.report()
+        assert report["pending"] == ["embeddings"]
+        assert "no network" in report["failed"]["embeddings"]
+        assert {"warm_vector_store", "warm_graph"} <= set(report["phases_ms"])
+
+    def test_failed_step_retried(self, monkeypatch):
+        """Test that a step failing at first is retried until it succeeds, and the server becomes ready"""
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OSError("no network")
+        monkeypatch.setattr(researcher, "warm_up", flaky)
+        monkeypatch.setattr(researcher.research_engine, "reader", lambda: None)
+        monkeypatch.setattr(researcher.research_engine, "graph", lambda: None)
+        profile = StartupProfile()
+        warm(profile=profile, retries=5, delay=0)
+        report = profile.report()
+        assert len(calls) == 3
+        assert report["ready"] and report["failed"] == {}
+
+
+class TestReadinessProbe:
+    """The /ready endpoint"""
+
+    def test_ready_endpoint(self, monkeypatch):
+        """Test that /ready is 503 while warming and 200 afterwards"""
+        profile = StartupProfile(steps=("embeddings",))
+        monkeypatch.setattr(main, "startup_profile", profile)
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["pending"] == ["embeddings"]
+        profile.mark_ready("embeddings")
+        assert client.get("/ready").status_code == 200
+
+
+class TestLazyImports:
+    """Importing the app must not load the heavy libraries"""
+
+    def test_heavy_modules_not_imported(self):
+        """Test that vector store, LLM and graph libraries load on first use"""
+        heavy = ["lancedb", "langgraph", "langchain_groq", "langchain_community", "sentence_transformers"]
+        code = f"import sys, app.main; print([m for m in {heavy!r} if m in sys.modules])"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        assert output.stdout.strip() == "[]"
@@ -0,0 +1,101 @@
+"""
+Tests for snapshot-isolated reads, serialized writes and background compaction.
+"""
+
+import os
+import shutil
+import threading
+import pytest
+from langchain_core.documents import Document
+import app.services.researcher as researcher
+from app.services.store_maintenance import StoreMaintenance
+
+
+def _text(source, sentences=60):
+    text = " ".join(f"Sentence {i} of {source} about storage." for i in range(sentences))
+    return researcher.split_text([Document(page_content=text, metadata={"source": source})])
+
+
+class TestSnapshotReads:
+    """Readers keep the table version they started with"""
+
+    def test_reader_pinned_while_ingest_commits(self, db):
+        """Test that a handle does not see rows written after it was opened"""
+        researcher.index_documents(_text("first.txt"))
+        engine = researcher.ResearchEngine()
+        _, table = engine.reader()
+        count = table.count_rows()
+        researcher.index_documents(_text("second.txt"))
+        assert table.count_rows() == count
+        assert engine.reader()[1].count_rows() > count
+
+    def test_old_snapshot_readable_by_version(self, db):
+        """Test that an earlier version can be read again after a clear"""
+        researcher.index_documents(_text("first.txt"))
+        engine = researcher.ResearchEngine()
+        _, table = engine.reader()
+        version, count = table.version, table.count_rows()
+        researcher.clear_database()
+        assert engine.reader()[1].count_rows() == 0
+        assert engine.reader(version=version)[1].count_rows() == count
+
+    def test_retries_read_the_same_snapshot(self, db, monkeypatch):
+        """Test that a clear between attempts does not empty a running research"""
+        monkeypatch.setattr(researcher, "research_engine", researcher.ResearchEngine())
+        researcher.index_documents(_text("doc.txt", sentences=400))
+        state = {"query": "storage", "try_count": 0}
+        first = researcher.retrieve_for_attempt(state)
+        researcher.clear_database()
+        last = researcher.retrieve_for_attempt({**state, **first, "try_count": researcher.MAX_TRIES - 1})
+        assert len(last["documents"]) > len(first["documents"])
+
+
+class TestSerializedWrites:
+    """Writers of one collection run one at a time"""
+
+    def test_concurrent_upserts_do_not_duplicate(self, db):
+        """Test that two ingests of the same source store its chunks once"""
+        chunks = _text("same.txt")
+        researcher.index_documents(chunks[:1])
+        threads = [threading.Thread(target=researcher.index_documents, args=(_text("same.txt"),)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        table = researcher.open_write_table()
+        assert table.count_rows() == len(chunks)
+
+    def test_unreadable_table_is_kept(self, db):
+        """Test that a table that cannot be opened fails the write and keeps its files"""
+        researcher.index_documents(_text("doc.txt", sentences=5))
+        versions = os.path.join(researcher.DB_URI, "research_docs.lance", "_versions")
+        shutil.rmtree(versions)
+        with pytest.raises(Exception):
+            researcher.index_documents(_text("other.txt", sentences=5))
+        assert os.listdir(os.path.join(researcher.DB_URI, "research_docs.lance", "data"))
+        assert researcher.open_write_table("missing") is None
+
+
+class TestStoreMaintenance:
+    """Compaction and clean-up of written collections"""
+
+    def test_compacts_and_expires_versions(self, db):
+        """Test that many small appends end up as one fragment and one version"""
+        for i in range(5):
+            researcher.index_documents(_text(f"doc{i}.txt", sentences=5))
+        maintenance = StoreMaintenance(retention=0)
+        result = maintenance.maintain("default")
+        assert result["fragments_before"] > result["fragments_after"] == 1
+        assert result["versions_before"] > result["versions_after"] == 1
+        assert researcher.open_write_table().count_rows() == 5
+
+    def test_only_written_collections_maintained(self, db, monkeypatch):
+        """Test that a pass skips collections nothing was written to"""
+        maintenance = StoreMaintenance(retention=0)
+        monkeypatch.setattr(researcher, "store_maintenance", maintenance)
+        researcher.index_documents(_text("a.txt", sentences=5), "a")
+        researcher.index_documents(_text("b.txt", sentences=5), "b")
+        maintenance._dirty.discard("b")
+        assert list(maintenance.run_once()) == ["a"]
+        assert maintenance.run_once() == {}
+        assert maintenance.stats()["compacted"] == 1
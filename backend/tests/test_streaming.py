@@ -0,0 +1,87 @@
+"""
+Tests for the Server-Sent Events research endpoint.
+The LLM and retrieval are replaced with local stand-ins.
+"""
+
+import json
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.messages import AIMessageChunk
+from langchain_core.runnables import RunnableGenerator
+import app.services.researcher as researcher
+from app.main import app
+from app.services.answer_cache import AnswerCache
+
+client = TestClient(app)
+
+ANSWER_ARGS = ['{"answer": "Lance', 'DB stores', ' vectors.", "confidence_score": 0.9, ', '"source_chunk_ids": ["c1"]}']
+
+
+@pytest.fixture
+def fake_pipeline(tmp_path, monkeypatch):
+    embeddings = DeterministicFakeEmbedding(size=16)
+    monkeypatch.setattr(researcher, "_get_embeddings", lambda: embeddings)
+    monkeypatch.setattr(researcher, "answer_cache", AnswerCache(str(tmp_path / "answers.sqlite")))
+
+    def retrieve(state):
+        docs = [Document(id="c1", page_content="LanceDB stores vectors.", metadata={"source": "s"})]
+        return {"documents": docs, "query_vector": [0.0], "retrieval_cache": {}}
+
+    async def stream_tool_call(_input):
+        async for _ in _input:
+            pass
+        for fragment in ANSWER_ARGS:
+            yield AIMessageChunk(content="", tool_call_chunks=[{"name": None, "args": fragment, "id": None, "index": 0}])
+
+    monkeypatch.setattr(researcher, "retrieve_for_attempt", retrieve)
+    monkeypatch.setattr(researcher, "_get_streaming_chain", lambda api_key: RunnableGenerator(stream_tool_call))
+
+
+def _events(response):
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        name_line, data_line = block.split("\n")
+        events.append((name_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+class TestResearchStream:
+    """Test the streaming research endpoint"""
+
+    def test_requires_api_key(self):
+        response = client.post("/api/research/stream", json={"query": "What is LanceDB?"})
+        assert response.status_code == 401
+
+    def test_stream_events_in_order(self, fake_pipeline):
+        """Test that chunk ids, tokens, the answer and metrics are streamed"""
+        response = client.post(
+            "/api/research/stream",
+            json={"query": "What is LanceDB?"},
+            headers={"x-groq-api-key": "test-key"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _events(response)
+        names = [name for name, _ in events]
+        assert names[0] == "retrieval" and events[0][1]["chunk_ids"] == ["c1"]
+        assert names[-2:] == ["answer", "metrics"]
+
+        tokens = "".join(data["text"] for name, data in events if name == "token")
+        assert tokens == "LanceDB stores vectors."
+        assert events[-2][1]["confidence_score"] == 0.9
+        assert events[-1][1]["ttft_ms"] >= events[-1][1]["ttfb_ms"]
+
+    def test_repeated_query_served_from_cache(self, fake_pipeline):
+        """Test that a repeated query streams only the cached answer"""
+        for _ in range(2):
+            response = client.post(
+                "/api/research/stream",
+                json={"query": "What is LanceDB?"},
+                headers={"x-groq-api-key": "test-key"}
+            )
+        events = _events(response)
+        assert [name for name, _ in events] == ["answer", "metrics"]
+        assert events[0][1]["answer"] == "LanceDB stores vectors."
+        assert events[0][1]["cached"] == "exact"
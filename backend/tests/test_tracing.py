@@ -0,0 +1,119 @@
+"""
+Tests for per-stage tracing spans and the Prometheus /metrics export.
+"""
+
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+import app.services.researcher as researcher
+from app.main import app
+from app.services.executor import BlockingExecutor
+from app.services.ingest_pipeline import ingest_pdf
+from app.services.metrics import (
+    Counter, Histogram, llm_tokens, research_retries, stage_seconds,
+)
+from app.services.tracing import current_request_id, current_trace, request_context, span
+from benchmarks.corpus import generate
+from benchmarks.fake_groq import FakeGroqServer
+
+client = TestClient(app)
+
+
+def _stages():
+    return {entry["stage"] for entry in current_trace()}
+
+
+class TestPrometheusFormat:
+    """Text exposition of counters and histograms"""
+
+    def test_counter_series_per_label(self):
+        """Test that each label value is its own series"""
+        counter = Counter("demo_total", "Demo.", ["kind"])
+        counter.inc(2, kind="a")
+        counter.inc(kind="b")
+        assert counter.render() == ['demo_total{kind="a"} 2', 'demo_total{kind="b"} 1']
+
+    def test_histogram_buckets_cumulative(self):
+        """Test that bucket counts include every smaller bucket"""
+        histogram = Histogram("demo_seconds", "Demo.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value)
+        assert histogram.render() == [
+            'demo_seconds_bucket{le="0.1"} 1',
+            'demo_seconds_bucket{le="1"} 2',
+            'demo_seconds_bucket{le="+Inf"} 3',
+            "demo_seconds_sum 5.55",
+            "demo_seconds_count 3",
+        ]
+
+
+class TestSpans:
+    """Spans carry the request id wherever the work runs"""
+
+    def test_span_recorded_with_request_id(self):
+        """Test that a span is traced, exported, and marked as failed on error"""
+        before = stage_seconds.count(stage="demo")
+        with request_context("req-1"):
+            with pytest.raises(ValueError):
+                with span("demo"):
+                    raise ValueError("boom")
+            assert current_trace()[0]["request_id"] == "req-1"
+            assert current_trace()[0]["status"] == "error"
+        assert stage_seconds.count(stage="demo") == before + 1
+
+    def test_context_follows_blocking_pool(self):
+        """Test that work handed to the blocking executor keeps the request id"""
+        executor = BlockingExecutor(max_workers=1)
+
+        async def run():
+            with request_context("req-2"):
+                return await executor.run(current_request_id)
+
+        assert asyncio.run(run()) == "req-2"
+        executor.shutdown()
+
+    def test_ingest_stages_traced(self, db, tmp_path):
+        """Test that a streamed PDF ingest records its stages, including those on its threads"""
+        corpus = generate(str(tmp_path / "corpus"), pdfs=1, pages_per_pdf=2, texts=0, html_pages=0, queries=0)
+        with request_context("req-3"):
+            ingest_pdf(corpus.pdf_paths[0])
+            assert {"load", "split", "embed", "write", "index"} <= _stages()
+            assert {entry["request_id"] for entry in current_trace()} == {"req-3"}
+
+
+class TestResearchMetrics:
+    """Research stages, tokens and retries"""
+
+    def test_research_traced_and_counted(self, db, monkeypatch):
+        """Test that a research run records its stages, tokens and retries"""
+        monkeypatch.setattr(researcher, "ANSWER_CACHE_ENABLED", False)
+        researcher.index_text("LanceDB stores vectors on disk. " * 40, source="doc")
+        retries, tokens = research_retries.value(), llm_tokens.value(direction="in")
+        with FakeGroqServer(latency_ms=0, low_confidence=1.0) as groq:
+            monkeypatch.setenv("GROQ_API_BASE", groq.url)
+            monkeypatch.setattr(researcher, "research_engine", researcher.ResearchEngine())
+            with request_context("req-4"):
+                result = asyncio.run(researcher.arun_research("Where are vectors stored?", "key"))
+                assert {"query_embed", "search", "llm", "grade"} <= _stages()
+        assert research_retries.value() == retries + result["try_count"] - 1 > retries
+        assert llm_tokens.value(direction="in") > tokens
+
+
+class TestMetricsEndpoint:
+    """The /metrics scrape target and request ids over HTTP"""
+
+    def test_metrics_exposition(self):
+        """Test that /metrics serves the stage histogram in the Prometheus text format"""
+        with span("demo"):
+            pass
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# TYPE researcher_stage_seconds histogram" in response.text
+        assert 'researcher_stage_seconds_count{stage="demo"}' in response.text
+
+    def test_request_id_echoed(self):
+        """Test that a sane client request id is kept and a malformed one replaced"""
+        assert client.get("/metrics", headers={"X-Request-ID": "abc-123"}).headers["x-request-id"] == "abc-123"
+        replaced = client.get("/metrics", headers={"X-Request-ID": "bad id\n"}).headers["x-request-id"]
+        assert replaced != "bad id\n" and len(replaced) == 32
@@ -0,0 +1,102 @@
+"""
+Tests for streamed uploads and the short-circuit for uploads already indexed.
+"""
+
+import hashlib
+import os
+from io import BytesIO
+import pytest
+from fastapi.testclient import TestClient
+import app.services.researcher as researcher
+from app.api import routes
+from app.main import app
+from app.services import jobs
+from app.services.uploads import UploadRegistry, UploadTooLarge, save_upload
+from tests.conftest import make_pdf
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    registry = UploadRegistry(str(tmp_path / "uploads.sqlite"))
+    monkeypatch.setattr(routes, "upload_registry", registry)
+    monkeypatch.setattr("app.services.uploads.upload_registry", registry)
+    return registry
+
+
+class TestSaveUpload:
+    """Uploads are copied in pieces, hashed and size-checked on the way"""
+
+    def test_unique_files_and_hash(self, tmp_path):
+        """Test that two uploads of the same bytes get their own files and the same hash"""
+        data = os.urandom(10_000)
+        first = save_upload(BytesIO(data), str(tmp_path), chunk_bytes=1024)
+        second = save_upload(BytesIO(data), str(tmp_path), chunk_bytes=1024)
+        assert first.path != second.path
+        assert first.size == len(data)
+        assert first.sha256 == second.sha256 == hashlib.sha256(data).hexdigest()
+        with open(first.path, "rb") as f:
+            assert f.read() == data
+
+    def test_too_large_leaves_no_file(self, tmp_path):
+        """Test that an upload over the limit is refused and its partial file removed"""
+        with pytest.raises(UploadTooLarge):
+            save_upload(BytesIO(b"x" * 5000), str(tmp_path), max_bytes=4096, chunk_bytes=1024)
+        assert os.listdir(tmp_path) == []
+
+
+class TestUploadRegistry:
+    """A recorded upload is valid while its chunks are stored unchanged"""
+
+    def test_hit_until_source_changes(self, db, registry, tmp_path):
+        """Test that clearing the collection invalidates a recorded upload"""
+        from app.services.ingest_pipeline import ingest_pdf
+        stats = ingest_pdf(make_pdf(tmp_path / "doc.pdf", pages=2), "doc.pdf")
+        assert registry.lookup("default", "doc.pdf", "abc") is None
+        registry.record("default", "doc.pdf", "abc", stats["chunks"])
+        assert registry.lookup("default", "doc.pdf", "abc")["chunks"] == stats["chunks"]
+        assert registry.lookup("default", "doc.pdf", "other") is None
+        researcher.clear_database()
+        assert registry.lookup("default", "doc.pdf", "abc") is None
+        assert registry.stats()["hits"] == 1
+
+    def test_job_skips_unchanged_upload(self, db, registry, tmp_path, monkeypatch):
+        """Test that a file job for an indexed upload does not parse it again"""
+        path = make_pdf(tmp_path / "doc.pdf", pages=2)
+        payload = {"path": path, "filename": "doc.pdf", "content_hash": "abc"}
+        first = jobs.run_ingest_file(dict(payload), {}, lambda stage, progress: None)
+
+        def no_parse(*args, **kwargs):
+            raise AssertionError("unchanged upload should not be parsed")
+        monkeypatch.setattr(jobs, "_ingest_pdf_job", no_parse)
+        path = make_pdf(tmp_path / "doc.pdf", pages=2)
+        second = jobs.run_ingest_file({**payload, "path": path}, {}, lambda stage, progress: None)
+        assert second["chunks"] == first["chunks"] and second["added"] == 0
+
+
+class TestIngestFileEndpoint:
+    """The upload endpoint streams, and skips uploads it has already indexed"""
+
+    def test_identical_upload_short_circuits(self, db, registry, tmp_path, monkeypatch):
+        """Test that the same bytes uploaded again are neither parsed nor embedded"""
+        routes.limiter.reset()
+        client = TestClient(app)
+        with open(make_pdf(tmp_path / "doc.pdf", pages=2), "rb") as f:
+            data = f.read()
+        first = client.post("/api/ingest/file", files={"file": ("doc.pdf", BytesIO(data), "application/pdf")})
+        assert first.status_code == 200 and first.json()["chunks_added"] > 0
+
+        def no_ingest(*args, **kwargs):
+            raise AssertionError("unchanged upload should not be parsed")
+        monkeypatch.setattr(routes, "ingest_pdf", no_ingest)
+        second = client.post("/api/ingest/file", files={"file": ("doc.pdf", BytesIO(data), "application/pdf")})
+        assert second.status_code == 200
+        assert second.json()["chunks_count"] == first.json()["chunks_count"]
+        assert second.json()["chunks_added"] == 0
+
+    def test_too_large_upload(self, db, registry):
+        """Test that an upload over the limit is refused"""
+        routes.limiter.reset()
+        data = b"%PDF-" + b"0" * (10 * 1024 * 1024)
+        response = TestClient(app).post("/api/ingest/file", files={"file": ("big.pdf", BytesIO(data), "application/pdf")})
+        assert response.status_code == 400
+        assert "too large" in response.json()["detail"].lower()
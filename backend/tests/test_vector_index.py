@@ -0,0 +1,51 @@
+"""
+Tests for ANN index creation, incremental reindexing and the recall report.
+"""
+
+import lancedb
+import numpy as np
+import pytest
+from app.services import vector_index
+
+
+def _rows(count, offset=0, dim=16):
+    rng = np.random.default_rng(offset)
+    return [
+        {"vector": rng.random(dim).astype("float32"), "id": str(offset + i), "text": f"chunk {offset + i}"}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def table(tmp_path):
+    db = lancedb.connect(str(tmp_path))
+    return db.create_table("research_docs", data=_rows(600))
+
+
+class TestEnsureVectorIndex:
+    """Test threshold-based index management"""
+
+    def test_small_table_stays_flat(self, table):
+        assert vector_index.ensure_vector_index(table, min_rows=1000) == "none"
+        assert vector_index.vector_index_stats(table) is None
+
+    def test_index_created_then_optimized(self, table):
+        """Test that appends past the reindex fraction are folded into the index"""
+        assert vector_index.ensure_vector_index(table, min_rows=500) == "created"
+        assert vector_index.vector_index_stats(table)["num_indexed_rows"] == 600
+
+        table.add(_rows(100, offset=600))
+        assert vector_index.ensure_vector_index(table, min_rows=500) == "optimized"
+        assert vector_index.vector_index_stats(table)["num_unindexed_rows"] == 0
+
+    def test_search_and_report(self, table):
+        """Test tuned search and the recall-vs-latency report"""
+        vector_index.ensure_vector_index(table, min_rows=500)
+        query = table.search().limit(1).to_arrow()["vector"][0].as_py()
+        rows = vector_index.search_vectors(table, query, k=5, nprobes=10, refine_factor=5)
+        assert len(rows) == 5
+
+        report = vector_index.recall_latency_report(table, num_queries=5, k=5, nprobes_grid=(1, 50), refine_grid=(0, 10))
+        assert report[0]["nprobes"] is None
+        assert len(report) == 5
+        assert all(0.0 <= row["recall"] <= 1.0 for row in report)
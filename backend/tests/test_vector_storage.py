@@ -0,0 +1,144 @@
+"""
+Tests for compact vector storage, full-precision rescoring and the storage report.
+"""
+
+import numpy as np
+import pyarrow as pa
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+import app.services.researcher as researcher
+from app.main import app
+from app.services.vector_index import RESCORE_FACTOR, rescore, search_vectors
+from app.services.vector_storage import convert, full_precision_vectors, storage_report, storage_stats
+
+
+def _index(monkeypatch, collection, compact, sources=8):
+    monkeypatch.setattr(researcher, "COMPACT_STORAGE", compact)
+    for s in range(sources):
+        text = " ".join(f"Sentence {i} of report {s} about storage footprints." for i in range(80))
+        researcher.index_documents(researcher.split_text([Document(page_content=text, metadata={"source": f"{s}.txt"})]),
+                                   collection)
+    return researcher.open_write_table(collection)
+
+
+class TestCompactStorage:
+    """Compact tables store less and rank like full-precision ones"""
+
+    def test_compact_schema(self, db, monkeypatch):
+        """Test that a compact table has float16 vectors and zstd-compressed text"""
+        table = _index(monkeypatch, "small", compact=True, sources=1)
+        assert table.schema.field("vector").type.value_type == pa.float16()
+        assert table.schema.field("text").metadata[b"lance-encoding:compression"] == b"zstd"
+        report = storage_report("small")
+        assert report["compact"] and report["text_compression"] == "zstd"
+        assert report["rows"] == table.count_rows()
+
+    def test_rescored_ranking_matches_full_precision(self, db, monkeypatch):
+        """Test that the rescored top k of a compact table equals the float32 table's"""
+        full = _index(monkeypatch, "full", compact=False)
+        compact = _index(monkeypatch, "compact", compact=True)
+        for query in ("report 3 storage", "sentence 12", "footprints of report 7"):
+            vector = researcher._get_embeddings().embed_query(query)
+            expected = search_vectors(full, vector, 8)
+            found = search_vectors(compact, vector, 8, full_vectors=researcher._full_vectors("compact"))
+            assert found["id"].to_pylist() == expected["id"].to_pylist()
+            assert found["_distance"].to_pylist() == pytest.approx(expected["_distance"].to_pylist(), rel=1e-4)
+
+    def test_compact_table_is_smaller(self, db, monkeypatch):
+        """Test that compact storage takes fewer bytes on disk"""
+        _index(monkeypatch, "full", compact=False)
+        _index(monkeypatch, "compact", compact=True)
+        full, compact = storage_report("full"), storage_report("compact")
+        assert full["rows"] == compact["rows"]
+        assert compact["disk_bytes"]["data"] < full["disk_bytes"]["data"]
+        # The float32 copies are part of the compact collection's footprint
+        assert full["full_vectors_bytes"] == 0 and compact["full_vectors_bytes"] > 0
+        assert compact["total_bytes"] == compact["disk_bytes"]["total"] + compact["full_vectors_bytes"]
+
+    def test_convert_keeps_rows(self, db, monkeypatch):
+        """Test that converting a collection both ways restores its exact float32 vectors"""
+        table = _index(monkeypatch, "docs", compact=False, sources=2)
+        original = table.to_arrow().sort_by("id")
+        result = convert("docs", compact=True)
+        assert result["rows"] == original.num_rows and storage_report("docs")["compact"]
+        convert("docs", compact=False)
+        table = researcher.open_write_table("docs")
+        assert table.schema.field("vector").type.value_type == pa.float32()
+        restored = table.to_arrow().sort_by("id")
+        assert restored["id"].to_pylist() == original["id"].to_pylist()
+        assert restored["vector"].to_pylist() == original["vector"].to_pylist()
+        assert storage_report("docs")["full_vectors_bytes"] == 0
+        assert convert("missing") is None
+
+    def test_stale_chunks_lose_their_full_vectors(self, db, monkeypatch):
+        """Test that the float32 copies of deleted chunks are deleted with them"""
+        table = _index(monkeypatch, "docs", compact=True, sources=2)
+        ids = table.to_arrow()["id"].to_pylist()
+        assert len(full_precision_vectors("docs", researcher.EMBEDDING_MODEL, ids)) == len(ids)
+        researcher.index_documents([Document(page_content="Only this now.", metadata={"source": "0.txt"})], "docs")
+        table = researcher.open_write_table("docs")
+        remaining = table.to_arrow()["id"].to_pylist()
+        assert set(full_precision_vectors("docs", researcher.EMBEDDING_MODEL, ids + remaining)) == set(remaining)
+
+
+class TestRescore:
+    """Rescoring reorders candidates by full-precision distance"""
+
+    def test_keeps_best_k_per_query(self):
+        """Test that each query of a batch keeps its own k nearest candidates"""
+        rows = pa.table({
+            "vector": pa.array([[0.0, 0.0]] * 6, pa.list_(pa.float16(), 2)),
+            "id": ["3", "1", "2", "9", "7", "8"],
+            "text": ["3", "1", "2", "9", "7", "8"],
+            "query_index": pa.array([0, 0, 0, 1, 1, 1], pa.int32()),
+            "_distance": pa.array([0.0] * 6, pa.float32()),
+        })
+        result = rescore(rows, [[0.0, 0.0], [10.0, 0.0]], k=2,
+                         full_vectors=lambda ids: {i: [float(i), 0.0] for i in ids})
+        assert result["text"].to_pylist() == ["1", "2", "9", "8"]
+        assert result["_distance"].to_pylist() == pytest.approx([1.0, 4.0, 1.0, 4.0])
+
+    def test_falls_back_to_stored_vectors(self):
+        """Test that candidates without a float32 vector use their stored one"""
+        rows = pa.table({
+            "vector": pa.array([[2.0], [1.0]], pa.list_(pa.float16(), 1)),
+            "id": ["a", "b"],
+            "text": ["a", "b"],
+            "_distance": pa.array([0.0, 0.0], pa.float32()),
+        })
+        result = rescore(rows, np.zeros(1), k=1, full_vectors=lambda ids: {})
+        assert result["text"].to_pylist() == ["b"]
+
+    def test_side_table_used_without_embedding_cache(self, db, monkeypatch):
+        """Test that searches of a compact table rescore in float32 from its side table alone"""
+        table = _index(monkeypatch, "compact", compact=True)
+        before = storage_stats()["rescore"]
+        state = researcher.retrieve_for_attempt({"query": "report 1", "collection": "compact", "try_count": 0})
+        after = storage_stats()["rescore"]
+        assert state["retrieval_cache"]["candidates"]
+        assert after["float16_fallbacks"] == before["float16_fallbacks"]
+        assert after["float32"] - before["float32"] >= min(RESCORE_FACTOR, table.count_rows())
+
+    def test_fallbacks_counted(self, db, monkeypatch):
+        """Test that a search without float32 vectors falls back to float16, and the report counts it"""
+        table = _index(monkeypatch, "compact", compact=True)
+        before = storage_stats()["rescore"]
+        found = search_vectors(table, researcher._get_embeddings().embed_query("report 1"), 4)
+        after = storage_stats()["rescore"]
+        assert found.num_rows == 4
+        assert after["float32"] == before["float32"]
+        assert after["float16_fallbacks"] - before["float16_fallbacks"] == min(4 * RESCORE_FACTOR, table.count_rows())
+        assert after["fallback_rate"] > 0
+
+
+class TestStorageEndpoint:
+    """The storage endpoint reports every collection"""
+
+    def test_reports_collections(self, db, monkeypatch):
+        """Test that bytes per chunk and fragment counts are reported"""
+        _index(monkeypatch, "docs", compact=True, sources=1)
+        body = TestClient(app).get("/api/storage").json()
+        docs = body["collections"]["docs"]
+        assert docs["compact"] and docs["fragments"] >= 1
+        assert body["rows"] == docs["rows"] and body["bytes_per_chunk"] > 0